@@ -1,15 +1,24 @@
 # Created By Saniya Prem Atharva Manaswi (SPAM)
-import pandas as pd
 import tkinter as tk
 from tkinter import filedialog, messagebox
-from openpyxl import Workbook, load_workbook
-from openpyxl.utils.dataframe import dataframe_to_rows
-from openpyxl.styles import PatternFill, Font, Border, Side, Alignment
-from openpyxl.formatting.rule import CellIsRule
-import win32com.client as win32
 import os
 from datetime import datetime
-import shutil
+import sys
+
+# Make the shared helpers in common/ importable when run as a standalone script
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from common.cache import load_cached_frame
+from common.csv_reader import read_schema_csv_filtered
+from common.dates import (
+    ATOMBERG_DATE_FORMATS, ATOMBERG_DATE_SOURCE, load_format_order, parse_dates_cascade, save_format_order
+)
+from common.excel_writer import (
+    ATOMBERG_DATA_STYLES, ATOMBERG_HEADER, ATOMBERG_STYLES, SheetSpec, get_excel_backend, write_report
+)
+from common.layout import SheetLayout, apply_layout, finish_layout, get_layout_engine
+from common.pivots import PivotTableSpec, pivot_counts, pivot_tables, summary_sheet
+from common.remarks import import_tracker_remarks, join_remarks, load_remark_index, peek_lookup_sheet
+from common.schemas import ATOMBERG_FEED_REMARK_SCHEMA
 
 # ===============================
 # Welcome Message
@@ -20,7 +29,7 @@ print("""
 =======================================
 This script converts a CSV file to a styled Excel file with two sheets:
 - Sheet1: Processed data with SLA calculations
-- Sheet2: Pivot table summarizing Case Numbers by Technician and SLA
+- Sheet2: Summary table counting Case Numbers by Technician and SLA
 Please follow the prompts to select your input CSV file and output Excel file location.
 =======================================
 """)
@@ -72,23 +81,20 @@ def validate_lookup_file(lookup_file_path):
         if not os.path.exists(lookup_file_path):
             return False, f"Lookupwine Lookup file not found at: {lookup_file_path}"
 
-        # Load the lookup file
-        lookup_wb = load_workbook(lookup_file_path, data_only=True)
-        lookup_ws = lookup_wb.active
+        # Read only the header row and the first data rows
+        header, sample_rows, data_rows = peek_lookup_sheet(lookup_file_path)
+        if data_rows is None:
+            data_rows = "an unknown number of"
 
         # Check if there's data
-        if lookup_ws.max_row < 2:
+        if not sample_rows:
             return False, "Lookup file appears to be empty or has no data rows"
 
         # Get headers (first row)
-        headers = []
-        for col in range(1, lookup_ws.max_column + 1):
-            header = lookup_ws.cell(row=1, column=col).value
-            if header:
-                headers.append(str(header).strip())
+        headers = [str(value).strip() for value in header if value]
 
         print(f"Lookup file headers: {headers}")
-        print(f"Lookup file has {lookup_ws.max_row - 1} data rows")
+        print(f"Lookup file has {data_rows} data rows")
 
         # Check if we have at least 10 columns (for VLOOKUP index 10)
         if len(headers) < 10:
@@ -97,9 +103,9 @@ def validate_lookup_file(lookup_file_path):
         # Sample some data to verify Case Numbers and Remarks exist
         case_numbers = []
         remarks_sample = []
-        for row in range(2, min(6, lookup_ws.max_row + 1)):  # Check first 5 rows
-            case_num = lookup_ws.cell(row=row, column=1).value
-            remarks = lookup_ws.cell(row=row, column=10).value if lookup_ws.max_column >= 10 else None
+        for row in sample_rows:  # Check first 5 rows
+            case_num = row[0]
+            remarks = row[9] if len(row) >= 10 else None
             if case_num:
                 case_numbers.append(str(case_num))
                 remarks_sample.append(str(remarks) if remarks else "No Remarks")
@@ -107,15 +113,15 @@ def validate_lookup_file(lookup_file_path):
         print(f"Sample Case Numbers in lookup file: {case_numbers}")
         print(f"Sample Remarks in lookup file: {remarks_sample}")
 
-        return True, f"Validation successful. Found {len(headers)} columns and {lookup_ws.max_row - 1} data rows"
+        return True, f"Validation successful. Found {len(headers)} columns and {data_rows} data rows"
 
     except Exception as e:
         return False, f"Error validating lookup file: {str(e)}"
 
 
-def apply_vlookup_with_excel_com(workbook_path, lookup_file_path):
-    """Applies VLOOKUP using Excel COM to ensure proper execution."""
-    print("Applying VLOOKUP formulas using Excel COM...")
+def join_lookup_remarks(df_sheet1, lookup_file_path):
+    """Fills the Remarks column from the lookup file (column J), joined on Case Number."""
+    print("Looking up Remarks from the lookup file...")
 
     # First validate the lookup file
     is_valid, message = validate_lookup_file(lookup_file_path)
@@ -125,8 +131,35 @@ def apply_vlookup_with_excel_com(workbook_path, lookup_file_path):
         print(f"VLOOKUP cancelled: {message}")
         return False
 
+    try:
+        value_columns = {'Feed Remarks': 10}
+        import_tracker_remarks('Atomberg', lookup_file_path, value_columns)
+        remarks, stats = join_remarks(df_sheet1['Case Number'],
+                                      load_remark_index('Atomberg', df_sheet1['Case Number'], value_columns),
+                                      value_columns)
+    except Exception as e:
+        print(f"Error applying lookup: {str(e)}")
+        return False
+
+    df_sheet1['Remarks'] = remarks['Feed Remarks']
+    if stats['matched'] == 0:
+        print("Warning: No Case Numbers were found in the lookup file. Please check if Case Numbers match between files.")
+    return stats['matched'] > 0
+
+
+def apply_vlookup_with_excel_com(workbook_path, lookup_file_path, row_count):
+    """Links the Remarks column to the lookup file with VLOOKUP formulas using Excel COM.
+
+    The remarks are already joined in as values; the formula is written to the
+    whole column in one assignment, so the file stays linked to the lookup file.
+    """
+    print("Linking Remarks to the lookup file with VLOOKUP formulas using Excel COM...")
+
     excel = None
     try:
+        # pywin32 is only needed for this step
+        import win32com.client as win32
+
         # Start Excel application
         excel = win32.gencache.EnsureDispatch('Excel.Application')
         excel.Visible = False
@@ -136,69 +169,33 @@ def apply_vlookup_with_excel_com(workbook_path, lookup_file_path):
         main_wb = excel.Workbooks.Open(os.path.abspath(workbook_path))
         lookup_wb = excel.Workbooks.Open(os.path.abspath(lookup_file_path))
 
-        # Get the main worksheet
         main_ws = main_wb.Sheets("Sheet1")
         lookup_ws = lookup_wb.Sheets(1)  # First sheet of lookup file
 
-        # Get the lookup file name for formula
-        lookup_filename = os.path.basename(lookup_file_path)
-
         # Determine the range of lookup data
+        lookup_filename = os.path.basename(lookup_file_path)
         lookup_last_row = lookup_ws.UsedRange.Rows.Count
         lookup_last_col = lookup_ws.UsedRange.Columns.Count
-
         print(f"Lookup range: A1:{chr(64 + lookup_last_col)}{lookup_last_row}")
 
-        # Add Remarks header if not exists
-        if main_ws.Cells(1, 10).Value != "Remarks":
-            main_ws.Cells(1, 10).Value = "Remarks"
-
-        # Find the last row with data in main worksheet
-        main_last_row = main_ws.UsedRange.Rows.Count
-
-        successful_lookups = 0
-        failed_lookups = 0
-
-        # Apply VLOOKUP to each row
-        for row in range(2, main_last_row + 1):
-            case_number = main_ws.Cells(row, 1).Value
-            if case_number:
-                # Create VLOOKUP formula using external reference (index 10 for Remarks)
-                lookup_range = f"'[{lookup_filename}]Sheet1'!$A$1:${chr(64 + lookup_last_col)}${lookup_last_row}"
-                formula = f"=IFERROR(VLOOKUP(A{row},{lookup_range},10,FALSE),\"Not Found\")"
-
-                # Apply the formula
-                main_ws.Cells(row, 10).Formula = formula
-
-                # Check if the formula resolved successfully
-                result_value = main_ws.Cells(row, 10).Value
-                if result_value and result_value != "Not Found":
-                    successful_lookups += 1
-                else:
-                    failed_lookups += 1
-
-        print(f"VLOOKUP Results: {successful_lookups} successful, {failed_lookups} failed")
-
-        # Save the main workbook
-        main_wb.Save()
+        # One assignment for all rows; Excel shifts A2 to each row's Case Number
+        lookup_range = f"'[{lookup_filename}]Sheet1'!$A$1:${chr(64 + lookup_last_col)}${lookup_last_row}"
+        main_ws.Range(f"J2:J{row_count + 1}").Formula = (
+            f'=IF(A2="","",IFERROR(VLOOKUP(A2,{lookup_range},10,FALSE),"Not Found"))'
+        )
 
-        # Close workbooks
+        # Save and close workbooks
         lookup_wb.Close(False)  # Don't save lookup file
         main_wb.Close(True)  # Save main file
 
         excel.Quit()
         excel = None
-
-        if successful_lookups > 0:
-            print("VLOOKUP formulas applied successfully")
-            return True
-        else:
-            print(
-                "Warning: All VLOOKUP formulas returned 'Not Found'. Please check if Case Numbers match between files.")
-            return False
+        print("VLOOKUP formulas applied successfully")
+        return True
 
     except Exception as e:
-        print(f"Error applying VLOOKUP: {str(e)}")
+        print(f"Error applying VLOOKUP formulas: {str(e)}")
+        print("Remarks are kept as values")
         if excel:
             try:
                 excel.Quit()
@@ -207,59 +204,6 @@ def apply_vlookup_with_excel_com(workbook_path, lookup_file_path):
         return False
 
 
-def apply_vlookup_direct_data(workbook_path, lookup_file_path):
-    """Alternative method: Directly copy data from lookup file instead of using formulas."""
-    print("Applying direct data lookup (alternative to VLOOKUP formulas)...")
-
-    try:
-        # Load lookup data
-        lookup_wb = load_workbook(lookup_file_path, data_only=True)
-        lookup_ws = lookup_wb.active
-
-        # Create a dictionary for fast lookup
-        lookup_dict = {}
-        for row in range(2, lookup_ws.max_row + 1):
-            case_num = lookup_ws.cell(row=row, column=1).value
-            remarks = lookup_ws.cell(row=row, column=10).value if lookup_ws.max_column >= 10 else None
-            if case_num:
-                lookup_dict[str(case_num).strip()] = remarks if remarks else "No Remarks"
-
-        print(f"Loaded {len(lookup_dict)} lookup entries")
-
-        # Load main workbook
-        main_wb = load_workbook(workbook_path)
-        main_ws = main_wb["Sheet1"]
-
-        # Add Remarks header if not exists
-        if main_ws.cell(row=1, column=10).value != "Remarks":
-            main_ws.cell(row=1, column=10, value="Remarks")
-
-        # Apply lookups
-        successful_lookups = 0
-        failed_lookups = 0
-
-        for row in range(2, main_ws.max_row + 1):
-            case_num = main_ws.cell(row=row, column=1).value
-            if case_num:
-                case_num_str = str(case_num).strip()
-                if case_num_str in lookup_dict:
-                    main_ws.cell(row=row, column=10, value=lookup_dict[case_num_str])
-                    successful_lookups += 1
-                else:
-                    main_ws.cell(row=row, column=10, value="Not Found")
-                    failed_lookups += 1
-
-        # Save changes
-        main_wb.save(workbook_path)
-
-        print(f"Direct lookup results: {successful_lookups} successful, {failed_lookups} failed")
-        return successful_lookups > 0
-
-    except Exception as e:
-        print(f"Error applying direct lookup: {str(e)}")
-        return False
-
-
 def get_vlookup_choice(converted_file_path):
     """Gets user choice for VLOOKUP operation with improved options."""
     root = tk.Tk()
@@ -305,6 +249,117 @@ def get_vlookup_choice(converted_file_path):
     return lookup_file, save_option, method_choice
 
 
+# ===============================
+# CSV Loading Functions
+# ===============================
+REQUIRED_COLUMNS = [
+    'Created Date', 'Customer Name', 'Street',
+    'Zip/Postal Code', 'Customer Complaint', 'Product Description',
+    'LineItem Status', 'Technician Name', 'Case Number', 'WO Status'
+]
+
+
+def prepare_new_rows(df, created_dates):
+    """Validates a block of rows, keeps WO Status 'New' and parses Created Date."""
+    missing_columns = [col for col in REQUIRED_COLUMNS if col not in df.columns]
+    if missing_columns:
+        raise ValueError(f"Missing required columns: {', '.join(missing_columns)}")
+    df = df[df['WO Status'] == 'New'].copy()
+    created_dates['non_empty'] += int(df['Created Date'].notna().sum())
+    if len(created_dates['sample']) < 5:
+        created_dates['sample'].extend(df['Created Date'].head(5 - len(created_dates['sample'])).tolist())
+    df['Created Date'] = parse_dates_cascade(df['Created Date'], created_dates['formats'], created_dates['counts'])
+    return df
+
+
+def load_new_rows(input_path):
+    """Reads and validates the CSV, keeping only 'New' WO Status rows with dates parsed."""
+    # Each row is parsed with the first format that fits it, dominant format first
+    created_dates = {
+        'sample': [], 'non_empty': 0, 'counts': {},
+        'formats': load_format_order(ATOMBERG_DATE_SOURCE, ATOMBERG_DATE_FORMATS)
+    }
+    print("Reading CSV file...")
+    print("Filtering rows where WO Status is 'New'...")
+    # Large files are streamed chunk by chunk
+    df = read_schema_csv_filtered(
+        input_path, ATOMBERG_FEED_REMARK_SCHEMA,
+        lambda rows: prepare_new_rows(rows, created_dates), low_memory=False
+    )
+    if df.empty:
+        raise ValueError("No rows found with 'WO Status' as 'New'.")
+
+    # Validate 'Created Date' column
+    if created_dates['non_empty'] == 0:
+        raise ValueError("The 'Created Date' column is missing or completely empty.")
+
+    print("Processing dates...")
+    if df['Created Date'].isna().all():
+        raise ValueError(
+            f"Failed to parse 'Created Date' column with any supported format. "
+            f"Sample values: {created_dates['sample']}. "
+            f"Supported formats: {', '.join(ATOMBERG_DATE_FORMATS)}. "
+            "Please check the date format in the CSV file."
+        )
+    save_format_order(ATOMBERG_DATE_SOURCE, created_dates['counts'])
+    return df
+
+
+# ===============================
+# Styled Excel Output
+# ===============================
+# Sheet1 rows are sized to their wrapped text
+SHEET1_LAYOUT = SheetLayout(fit_rows=True)
+
+
+def create_styled_excel(df_sheet1, output_path):
+    """Writes Sheet1 and the SLA summary (with its pivot table) to output_path."""
+    print("Creating styled Excel file...")
+    # Column widths for Sheet1
+    column_widths_sheet1 = {
+        'A': 12,  # Case Number
+        'B': 8,   # SLA
+        'C': 15,  # Customer Name
+        'D': 60,  # Street
+        'E': 12,  # Zip/Postal Code
+        'F': 15,  # Customer Complaint
+        'G': 35,  # Product Description
+        'H': 12,  # LineItem Status
+        'I': 15,  # Technician Name
+        'J': 15   # Remarks
+    }
+
+    # Conditional formatting for SLA column
+    sla_rules = [
+        ('B', {'operator': 'equal', 'value': '0', 'fill': '00FF00'}),
+        ('B', {'operator': 'equal', 'value': '1', 'fill': 'FFA500'}),
+        ('B', {'operator': 'greaterThan', 'value': '1', 'fill': 'FF0000'}),
+    ]
+
+    # Sheet2 counts the New cases per technician and SLA (formerly the SLA_Pivot pivot table)
+    new_cases = df_sheet1[df_sheet1['LineItem Status'] == 'New']
+    sla_summary = pivot_counts(new_cases, 'Technician Name', 'Case Number', columns='SLA')
+    sla_sheet = summary_sheet("Sheet2", sla_summary, ATOMBERG_HEADER, 'Atomberg Data', 'Atomberg Total',
+                              data_caption='Count of Cases', columns_caption='SLA',
+                              filters=[('LineItem Status', 'New')])
+    layout_engine = get_layout_engine('atomberg')
+    # The summary also becomes a PivotTable, refreshed from Sheet1 when opened in Excel
+    write_report(output_path, [
+        apply_layout(SheetSpec("Sheet1", df_sheet1, ATOMBERG_HEADER, ATOMBERG_DATA_STYLES,
+                               column_widths=column_widths_sheet1, header_height=30,
+                               conditional_formats=sla_rules),
+                     SHEET1_LAYOUT, layout_engine),
+        sla_sheet,
+    ], ATOMBERG_STYLES, get_excel_backend('atomberg'), pivot_tables([
+        PivotTableSpec("SLA_Pivot", sla_sheet, "Sheet1", df_sheet1, 'Technician Name', 'Case Number',
+                       columns='SLA', data_caption='Count of Cases',
+                       page_fields=[('LineItem Status', ['New'])]),
+    ]))
+    print("SLA summary written to Sheet2")
+    if not finish_layout(output_path, {"Sheet1": SHEET1_LAYOUT}, layout_engine):
+        print("Warning: Failed to auto-fit rows")
+
+
 # ===============================
 # Main Data Processing Function
 # ===============================
@@ -315,69 +370,13 @@ def process_file(input_path, output_path):
         # --------------------------------
         # Read and Validate CSV File
         # --------------------------------
-        print("Reading CSV file...")
-        try:
-            df = pd.read_csv(input_path, encoding='utf-8', low_memory=False)
-        except UnicodeDecodeError:
-            print("UTF-8 encoding failed, trying Latin-1...")
-            try:
-                df = pd.read_csv(input_path, encoding='latin-1', low_memory=False)
-            except UnicodeDecodeError:
-                print("Latin-1 encoding failed, trying Windows-1252...")
-                df = pd.read_csv(input_path, encoding='windows-1252', low_memory=False)
-
-        # Validate required columns
-        required_columns = [
-            'Created Date', 'Customer Name', 'Street',
-            'Zip/Postal Code', 'Customer Complaint', 'Product Description',
-            'LineItem Status', 'Technician Name', 'Case Number', 'WO Status'
-        ]
-        missing_columns = [col for col in required_columns if col not in df.columns]
-        if missing_columns:
-            raise ValueError(f"Missing required columns: {', '.join(missing_columns)}")
-
-        # Filter for 'New' WO Status
-        print("Filtering rows where WO Status is 'New'...")
-        df = df[df['WO Status'] == 'New']
-        if df.empty:
-            raise ValueError("No rows found with 'WO Status' as 'New'.")
-
-        # Validate 'Created Date' column
-        if 'Created Date' not in df.columns or df['Created Date'].isna().all():
-            raise ValueError("The 'Created Date' column is missing or completely empty.")
-
-        raw_dates_sample = df['Created Date'].head(5).tolist()
-        if not raw_dates_sample:
-            raise ValueError("The 'Created Date' column is empty after filtering for 'WO Status' = 'New'.")
+        # Reuses the parsed rows if this exact export was processed before
+        df = load_cached_frame(input_path, ATOMBERG_FEED_REMARK_SCHEMA, lambda: load_new_rows(input_path))
 
         # --------------------------------
         # Process Data for Sheet1
         # --------------------------------
-        print("Processing dates and calculating SLA...")
-        # Supported date formats
-        date_formats = [
-            "%d-%m-%Y", "%Y-%m-%d", "%d/%m/%Y", "%m/%d/%Y",
-            "%d-%b-%Y", "%Y/%m/%d", "%d.%m.%Y", "%b %d %Y"
-        ]
-        parsed_dates = None
-        for date_format in date_formats:
-            try:
-                parsed_dates = pd.to_datetime(df['Created Date'], format=date_format, dayfirst=True, errors='coerce')
-                if parsed_dates.notna().any():
-                    break
-            except ValueError:
-                continue
-
-        if parsed_dates is None or parsed_dates.isna().all():
-            raise ValueError(
-                f"Failed to parse 'Created Date' column with any supported format. "
-                f"Sample values: {raw_dates_sample}. "
-                f"Supported formats: {', '.join(date_formats)}. "
-                "Please check the date format in the CSV file."
-            )
-
-        df['Created Date'] = parsed_dates
-
+        print("Calculating SLA...")
         # Calculate SLA (days since Created Date)
         today = datetime.today()
         df['SLA'] = (today - df['Created Date']).dt.days.fillna(-1).astype(int)
@@ -392,169 +391,35 @@ def process_file(input_path, output_path):
         df_sheet1['Remarks'] = ''  # Add empty Remarks column
 
         # --------------------------------
-        # Create Excel File with Styling
-        # --------------------------------
-        print("Creating styled Excel file...")
-        workbook = Workbook()
-        sheet1 = workbook.active
-        sheet1.title = "Sheet1"
-
-        # Write Sheet1 data
-        for row in dataframe_to_rows(df_sheet1, index=False, header=True):
-            sheet1.append(row)
-
-        # Define styles
-        header_fill = PatternFill(start_color="4CAF50", end_color="4CAF50", fill_type="solid")
-        header_font = Font(bold=True, color="FFFFFF", size=12)
-        data_font = Font(size=11)
-        thin_border = Border(
-            left=Side(style='thin'),
-            right=Side(style='thin'),
-            top=Side(style='thin'),
-            bottom=Side(style='thin')
-        )
-        wrap_alignment = Alignment(wrap_text=True, vertical='center', horizontal='center')
-        alternate_fill = PatternFill(start_color="F5F5F5", end_color="F5F5F5", fill_type="solid")
-
-        # Style Sheet1
-        for row in sheet1.iter_rows(min_row=1, max_row=sheet1.max_row, min_col=1, max_col=sheet1.max_column):
-            for cell in row:
-                cell.border = thin_border
-                cell.alignment = wrap_alignment
-                if cell.row == 1:
-                    cell.fill = header_fill
-                    cell.font = header_font
-                else:
-                    cell.font = data_font
-                    if cell.row % 2 == 0:
-                        cell.fill = alternate_fill
-
-        # Conditional formatting for SLA column
-        red_fill = PatternFill(start_color="FF0000", end_color="FF0000", fill_type="solid")
-        green_fill = PatternFill(start_color="00FF00", end_color="00FF00", fill_type="solid")
-        orange_fill = PatternFill(start_color="FFA500", end_color="FFA500", fill_type="solid")
-        sheet1.conditional_formatting.add('B2:B' + str(sheet1.max_row),
-                                          CellIsRule(operator='equal', formula=['0'], fill=green_fill))
-        sheet1.conditional_formatting.add('B2:B' + str(sheet1.max_row),
-                                          CellIsRule(operator='equal', formula=['1'], fill=orange_fill))
-        sheet1.conditional_formatting.add('B2:B' + str(sheet1.max_row),
-                                          CellIsRule(operator='greaterThan', formula=['1'], fill=red_fill))
-
-        # Adjust column widths for Sheet1
-        column_widths_sheet1 = {
-            'A': 12,  # Case Number
-            'B': 8,   # SLA
-            'C': 15,  # Customer Name
-            'D': 60,  # Street
-            'E': 12,  # Zip/Postal Code
-            'F': 15,  # Customer Complaint
-            'G': 35,  # Product Description
-            'H': 12,  # LineItem Status
-            'I': 15,  # Technician Name
-            'J': 15   # Remarks
-        }
-        for col_letter, width in column_widths_sheet1.items():
-            sheet1.column_dimensions[col_letter].width = width
-
-        # Adjust row heights for Sheet1
-        for row in range(1, sheet1.max_row + 1):
-            sheet1.row_dimensions[row].height = 30 if row == 1 else 50
-
-        sheet1.auto_filter.ref = sheet1.dimensions
-
-        # Create Sheet2 placeholder
-        workbook.create_sheet(title="Sheet2")
-        workbook.save(output_path)
-
-        # --------------------------------
-        # Create Pivot Table with Excel COM
+        # VLOOKUP Operation (IMPROVED)
         # --------------------------------
-        print("Creating pivot table using Excel COM...")
-        excel = win32.gencache.EnsureDispatch('Excel.Application')
-        excel.Visible = False
-        excel.DisplayAlerts = False
-
-        try:
-            wb = excel.Workbooks.Open(os.path.abspath(output_path))
-            sheet1_excel = wb.Sheets("Sheet1")
-            sheet2 = wb.Sheets("Sheet2")
-
-            # Create pivot cache
-            pivot_cache = wb.PivotCaches().Create(
-                SourceType=win32.constants.xlDatabase,
-                SourceData=sheet1_excel.UsedRange
-            )
-
-            # Create pivot table
-            pivot_table = pivot_cache.CreatePivotTable(
-                TableDestination=sheet2.Range("A3"),
-                TableName="SLA_Pivot"
-            )
-
-            # Configure pivot table fields
-            pivot_table.PivotFields("LineItem Status").Orientation = win32.constants.xlPageField
-            pivot_table.PivotFields("LineItem Status").CurrentPage = "New"
-
-            pivot_table.PivotFields("Technician Name").Orientation = win32.constants.xlRowField
-            pivot_table.PivotFields("Technician Name").Position = 1
-
-            pivot_table.PivotFields("SLA").Orientation = win32.constants.xlColumnField
-            pivot_table.PivotFields("SLA").Position = 1
-
-            pivot_table.AddDataField(
-                pivot_table.PivotFields("Case Number"),
-                "Count of Cases",
-                win32.constants.xlCount
+        # Remarks are joined into Sheet1 before it is written
+        lookup_file, save_option, method_choice = get_vlookup_choice(output_path)
+        remarks_output = output_path
+        if lookup_file and save_option == 'yes':  # Save as new file
+            remarks_output = filedialog.asksaveasfilename(
+                title="Save Enhanced File As",
+                defaultextension=".xlsx",
+                filetypes=[("Excel files", "*.xlsx")]
             )
-
-            # Apply number formatting
-            pivot_table.PivotFields("Count of Cases").NumberFormat = "#,##0"
-
-            # AutoFit columns
-            sheet2.UsedRange.Columns.AutoFit()
-
-            # Apply basic styling
-            header_range = sheet2.Range("A3:C3")
-            header_range.Interior.Color = 0x4CAF50  # Green
-            header_range.Font.Bold = True
-            header_range.Font.Color = 0xFFFFFF  # White
-
-            # Save and close
-            wb.Save()
-            wb.Close()
-            excel.Quit()
-
-            print(f"Pivot table successfully created in Sheet2")
-
-        except Exception as com_error:
-            excel.Quit()
-            raise RuntimeError(f"Excel COM error: {str(com_error)}") from com_error
+            if not remarks_output:
+                print("VLOOKUP operation cancelled by user")
+                create_styled_excel(df_sheet1, output_path)
+                return
 
         # --------------------------------
-        # VLOOKUP Operation (IMPROVED)
+        # Create Excel File with Styling
         # --------------------------------
-        lookup_file, save_option, method_choice = get_vlookup_choice(output_path)
+        if not lookup_file or remarks_output != output_path:
+            create_styled_excel(df_sheet1, output_path)
 
         if lookup_file:
-            if save_option == 'yes':  # Save as new file
-                new_output = filedialog.asksaveasfilename(
-                    title="Save Enhanced File As",
-                    defaultextension=".xlsx",
-                    filetypes=[("Excel files", "*.xlsx")]
-                )
-                if new_output:
-                    # Copy original file to new location
-                    shutil.copy2(output_path, new_output)
-                    output_path = new_output
-                else:
-                    print("VLOOKUP operation cancelled by user")
-                    return
-
-            # Apply VLOOKUP using chosen method
-            if method_choice == 'yes':  # Use Excel formulas
-                success = apply_vlookup_with_excel_com(output_path, lookup_file)
-            else:  # Copy data directly
-                success = apply_vlookup_direct_data(output_path, lookup_file)
+            success = join_lookup_remarks(df_sheet1, lookup_file)
+            create_styled_excel(df_sheet1, remarks_output)
+            output_path = remarks_output
+
+            if method_choice == 'yes':  # Link the remarks to the lookup file with formulas
+                success = apply_vlookup_with_excel_com(output_path, lookup_file, len(df_sheet1)) and success
 
             if success:
                 print("VLOOKUP operation completed successfully")
@@ -2,13 +2,19 @@
 import pandas as pd
 import tkinter as tk
 from tkinter import filedialog, messagebox
-from openpyxl import Workbook
-from openpyxl.utils.dataframe import dataframe_to_rows
-from openpyxl.styles import PatternFill, Font, Border, Side, Alignment
-import win32com.client as win32
+from openpyxl.utils import get_column_letter
 import os
-import shutil
-from openpyxl.formatting.rule import CellIsRule
+import sys
+
+# Make the shared helpers in common/ importable when run as a standalone script
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from common.cache import load_cached_frame
+from common.csv_reader import read_schema_csv
+from common.excel_writer import SheetSpec, get_excel_backend, write_report
+from common.layout import SheetLayout, apply_layout, finish_layout, get_layout_engine
+from common.pivots import PivotTableSpec, pivot_counts, pivot_tables, summary_sheet
+from common.remarks import import_tracker_remarks, join_remarks, load_remark_index
+from common.schemas import ATOMBERG_VOC_VOT_SCHEMA
 
 print("""
 =======================================
@@ -16,7 +22,7 @@ print("""
 =======================================
 This script converts a CSV file to a styled Excel file with two sheets:
 - Sheet1: Filtered customer data with additional remark columns
-- Sheet2: Pivot table summarizing cases by Closing Date
+- Sheet2: Summary table counting cases by Closing Date
 =======================================
 """)
 
@@ -53,86 +59,111 @@ def get_vlookup_choice(converted_file_path):
     root.destroy()
     return lookup_file, save_option
 
-def apply_vlookup_with_excel_com(workbook_path, lookup_file_path):
-    print("Applying VLOOKUP formulas...")
-    excel = None
-    try:
-        excel = win32.gencache.EnsureDispatch('Excel.Application')
-        excel.Visible = False
-        excel.DisplayAlerts = False
-
-        main_wb = excel.Workbooks.Open(os.path.abspath(workbook_path))
-        lookup_wb = excel.Workbooks.Open(os.path.abspath(lookup_file_path))
-
-        main_ws = main_wb.Sheets("Sheet1")
-        lookup_ws = lookup_wb.Sheets(1)
-
-        lookup_filename = os.path.basename(lookup_file_path)
-        lookup_last_row = lookup_ws.UsedRange.Rows.Count
-        lookup_last_col = lookup_ws.UsedRange.Columns.Count
-        main_last_row = main_ws.UsedRange.Rows.Count
-
-        header_map = {}
-        for col in range(1, lookup_last_col + 1):
-            val = lookup_ws.Cells(1, col).Value
-            if val:
-                header_map[str(val).strip()] = col
-
-        field_map = {
-            'Calling Remarks': 14,
-            'VOC Remarks': 15,
-            'VOT Remarks': 16
-        }
-
-        for field_name, main_col in field_map.items():
-            main_ws.Cells(1, main_col).Value = field_name
-            if field_name not in header_map:
-                print(f"⚠️  Column '{field_name}' not found in lookup file.")
-                continue
-
-            lookup_col_index = header_map[field_name]
-            col_letter = chr(64 + lookup_last_col)
-            lookup_range = f"'[{lookup_filename}]Sheet1'!$A$1:${col_letter}${lookup_last_row}"
-
-            for row in range(2, main_last_row + 1):
-                formula = f'=IFERROR(VLOOKUP(A{row},{lookup_range},{lookup_col_index},FALSE),"")'
-                main_ws.Cells(row, main_col).Formula = formula
-
-        main_wb.Save()
-        lookup_wb.Close(False)
-        main_wb.Close(True)
-        excel.Quit()
-        print("✅ VLOOKUP completed successfully.")
-        return True
+# Remark columns of Sheet1, looked up by the same header in the lookup file
+REMARK_FIELDS = ['Calling Remarks', 'VOC Remarks', 'VOT Remarks']
 
+def join_lookup_remarks(df_sheet1, lookup_file_path):
+    print("Looking up remarks...")
+    try:
+        value_columns = {field: field for field in REMARK_FIELDS}
+        import_tracker_remarks('Atomberg', lookup_file_path, value_columns)
+        remarks, stats = join_remarks(df_sheet1['Case Number'],
+                                      load_remark_index('Atomberg', df_sheet1['Case Number'], value_columns),
+                                      value_columns, missing='', blank='')
     except Exception as e:
-        print(f"❌ Error during VLOOKUP: {str(e)}")
-        if excel:
-            excel.Quit()
+        print(f"❌ Error during lookup: {str(e)}")
         return False
+    for field in REMARK_FIELDS:
+        df_sheet1[field] = remarks[field]
+    print("✅ Lookup completed successfully.")
+    return stats['matched'] > 0
+
+def load_rows_with_end_date(input_path):
+    print("Reading CSV file...")
+    df = read_schema_csv(input_path, ATOMBERG_VOC_VOT_SCHEMA, low_memory=False)
+
+    required_columns = [
+        'Case Number', 'Created Date', 'Customer Name',
+        'Street', 'Zip/Postal Code', 'Customer Complaint', 'LineItem Status',
+        'End Date', 'Product Description', 'Warranty Status', 'Technician Name'
+    ]
+    missing_columns = [col for col in required_columns if col not in df.columns]
+    if missing_columns:
+        raise ValueError(f"Missing required columns: {', '.join(missing_columns)}")
+
+    df = df.dropna(subset=['LineItem Status', 'End Date'])
+
+    df['End Date'] = pd.to_datetime(df['End Date'], format='%d-%m-%Y', errors='coerce')
+    df['Created Date'] = pd.to_datetime(df['Created Date'], format='%d-%m-%Y', errors='coerce')
+    return df.dropna(subset=['End Date'])
+
+# Closing months counted in the Sheet2 summary
+SUMMARY_CLOSING_MONTHS = ["Apr-25", "May-25", "Jun-25"]
+
+# Sheet1 rows are sized to their wrapped text (11pt throughout)
+SHEET1_LAYOUT = SheetLayout(fit_rows=True, header_font_size=11)
+
+def create_styled_excel(df_sheet1, output_path):
+    print("Creating Excel file...")
+    # Rows are streamed to disk already styled (write-only workbook)
+    styles = {
+        'VOC Header': {'font': {'name': 'Calibri', 'bold': True, 'color': 'FFFFFF', 'size': 11},
+                       'fill': '4CAF50', 'border': True,
+                       'alignment': {'wrap_text': True, 'vertical': 'center', 'horizontal': 'center'}},
+        'VOC Data': {'font': {'name': 'Calibri', 'size': 11}, 'border': True,
+                     'alignment': {'wrap_text': True, 'vertical': 'center', 'horizontal': 'left'}},
+        'VOC Total': {'font': {'name': 'Calibri', 'bold': True, 'size': 11}, 'border': True,
+                      'alignment': {'wrap_text': True, 'vertical': 'center', 'horizontal': 'left'}},
+    }
+
+    # Conditional formatting for SLA column
+    sla_rules = [
+        ('B', {'operator': 'equal', 'value': '0', 'fill': '00FF00'}),
+        ('B', {'operator': 'equal', 'value': '1', 'fill': 'FFA500'}),
+        ('B', {'operator': 'greaterThan', 'value': '1', 'fill': 'FF0000'}),
+    ]
+
+    # Sheet2 counts the completed cases per closing date (formerly the Customer_Pivot
+    # pivot table). Closing Date and Closing Month take the values of the Sheet1 formulas.
+    sheet1_values = df_sheet1.assign(**{
+        'Closing Date': df_sheet1['End Date'].str[:10],
+        'Closing Month': pd.to_datetime(df_sheet1['End Date'], format='%d-%m-%Y').dt.strftime('%b-%y'),
+    })
+    closing = sheet1_values[(sheet1_values['LineItem Status'] == 'Completed') &
+                            sheet1_values['Closing Month'].isin(SUMMARY_CLOSING_MONTHS)]
+    closing_summary = pivot_counts(
+        closing, 'Closing Date', 'Case Number',
+        row_sort_key=lambda label: pd.to_datetime(label, format='%d-%m-%Y')
+    )
+
+    closing_sheet = summary_sheet("Sheet2", closing_summary, 'VOC Header', 'VOC Data', 'VOC Total',
+                                  filters=[('LineItem Status', 'Completed'),
+                                           ('Closing Month', ', '.join(SUMMARY_CLOSING_MONTHS))])
+
+    # Closing Date (I) and Closing Month (J) are formulas on End Date (H); the
+    # summary also becomes a PivotTable, refreshed from Sheet1 when opened in Excel
+    layout_engine = get_layout_engine('atomberg')
+    write_report(output_path, [
+        apply_layout(SheetSpec("Sheet1", df_sheet1, 'VOC Header', ['VOC Data'],
+                               column_widths={get_column_letter(i): 20 for i in range(1, len(df_sheet1.columns) + 1)},
+                               header_height=40,
+                               column_formulas={'Closing Date': '=LEFT(H{row}, 10)',
+                                                'Closing Month': '=TEXT(I{row}, "MMM-YY")'},
+                               conditional_formats=sla_rules),
+                     SHEET1_LAYOUT, layout_engine),
+        closing_sheet,
+    ], styles, get_excel_backend('atomberg'), pivot_tables([
+        PivotTableSpec("Customer_Pivot", closing_sheet, "Sheet1", sheet1_values, 'Closing Date',
+                       'Case Number', page_fields=[('LineItem Status', ['Completed']),
+                                                  ('Closing Month', SUMMARY_CLOSING_MONTHS)]),
+    ]))
+    print("Closing date summary written to Sheet2")
+    if not finish_layout(output_path, {"Sheet1": SHEET1_LAYOUT}, layout_engine):
+        print("Warning: Failed to auto-fit rows")
 
 def process_file(input_path, output_path):
     try:
-        print("Reading CSV file...")
-        try:
-            df = pd.read_csv(input_path, encoding='utf-8', low_memory=False)
-        except UnicodeDecodeError:
-            df = pd.read_csv(input_path, encoding='latin-1', low_memory=False)
-
-        required_columns = [
-            'Case Number', 'Created Date', 'Customer Name',
-            'Street', 'Zip/Postal Code', 'Customer Complaint', 'LineItem Status',
-            'End Date', 'Product Description', 'Warranty Status', 'Technician Name'
-        ]
-        missing_columns = [col for col in required_columns if col not in df.columns]
-        if missing_columns:
-            raise ValueError(f"Missing required columns: {', '.join(missing_columns)}")
-
-        df = df.dropna(subset=['LineItem Status', 'End Date'])
-
-        df['End Date'] = pd.to_datetime(df['End Date'], format='%d-%m-%Y', errors='coerce')
-        df['Created Date'] = pd.to_datetime(df['Created Date'], format='%d-%m-%Y', errors='coerce')
-        df = df.dropna(subset=['End Date'])
+        df = load_cached_frame(input_path, ATOMBERG_VOC_VOT_SCHEMA, lambda: load_rows_with_end_date(input_path))
 
         df = df[
             (df['LineItem Status'] == 'Completed') &
@@ -160,105 +191,27 @@ def process_file(input_path, output_path):
         df_sheet1['Created Date'] = df_sheet1['Created Date'].dt.strftime('%d-%m-%Y')
         df_sheet1['End Date'] = df_sheet1['End Date'].dt.strftime('%d-%m-%Y')
 
-        print("Creating Excel file...")
-        workbook = Workbook()
-        sheet1 = workbook.active
-        sheet1.title = "Sheet1"
-
-        for row in dataframe_to_rows(df_sheet1, index=False, header=True):
-            sheet1.append(row)
-
-        header_fill = PatternFill(start_color="4CAF50", end_color="4CAF50", fill_type="solid")
-        header_font = Font(name='Calibri', bold=True, color="FFFFFF", size=11)
-        data_font = Font(name='Calibri', size=11)
-        thin_border = Border(left=Side(style='thin'), right=Side(style='thin'),
-                             top=Side(style='thin'), bottom=Side(style='thin'))
-        header_alignment = Alignment(wrap_text=True, vertical='center', horizontal='center')
-        data_alignment = Alignment(wrap_text=True, vertical='center', horizontal='left')
-
-        for row in sheet1.iter_rows(min_row=1, max_row=sheet1.max_row,
-                                    min_col=1, max_col=sheet1.max_column):
-            for cell in row:
-                cell.border = thin_border
-                cell.alignment = header_alignment if cell.row == 1 else data_alignment
-                cell.font = header_font if cell.row == 1 else data_font
-                if cell.row == 1:
-                    cell.fill = header_fill
-
-        for col in sheet1.iter_cols(min_row=1, max_row=1):
-            sheet1.column_dimensions[col[0].column_letter].width = 20
-        for r in range(1, sheet1.max_row + 1):
-            sheet1.row_dimensions[r].height = 40
-
-        # Conditional formatting for SLA column
-        red_fill = PatternFill(start_color="FF0000", end_color="FF0000", fill_type="solid")
-        green_fill = PatternFill(start_color="00FF00", end_color="00FF00", fill_type="solid")
-        orange_fill = PatternFill(start_color="FFA500", end_color="FFA500", fill_type="solid")
-        sheet1.conditional_formatting.add('B2:B' + str(sheet1.max_row),
-                                          CellIsRule(operator='equal', formula=['0'], fill=green_fill))
-        sheet1.conditional_formatting.add('B2:B' + str(sheet1.max_row),
-                                          CellIsRule(operator='equal', formula=['1'], fill=orange_fill))
-        sheet1.conditional_formatting.add('B2:B' + str(sheet1.max_row),
-                                          CellIsRule(operator='greaterThan', formula=['1'], fill=red_fill))
-
-        # Insert formulas
-        for i in range(2, sheet1.max_row + 1):
-            sheet1[f'J{i}'] = f'=LEFT(H{i}, 10)'
-            sheet1[f'K{i}'] = f'=TEXT(J{i}, "MMM-YY")'
-
-        sheet1.auto_filter.ref = sheet1.dimensions
-        workbook.create_sheet(title="Sheet2")
-        workbook.save(output_path)
-
-        print("Creating pivot table...")
-        excel = win32.gencache.EnsureDispatch('Excel.Application')
-        excel.Visible = False
-        excel.DisplayAlerts = False
-
-        wb = excel.Workbooks.Open(os.path.abspath(output_path))
-        sheet1_excel = wb.Sheets("Sheet1")
-        sheet2 = wb.Sheets("Sheet2")
-
-        pivot_cache = wb.PivotCaches().Create(SourceType=win32.constants.xlDatabase,
-                                              SourceData=sheet1_excel.UsedRange)
-        pivot_table = pivot_cache.CreatePivotTable(TableDestination=sheet2.Range("A5"),
-                                                   TableName="Customer_Pivot")
-
-        pivot_table.PivotFields("LineItem Status").Orientation = win32.constants.xlPageField
-        pivot_table.PivotFields("LineItem Status").CurrentPage = "Completed"
-
-        pivot_table.PivotFields("Closing Month").Orientation = win32.constants.xlPageField
-        pivot_table.PivotFields("Closing Month").EnableMultiplePageItems = True
-        for month in ["Apr-25", "May-25", "Jun-25"]:
-            try:
-                pivot_table.PivotFields("Closing Month").PivotItems(month).Visible = True
-            except:
-                pass
-
-        pivot_table.PivotFields("Closing Date").Orientation = win32.constants.xlRowField
-        pivot_table.AddDataField(pivot_table.PivotFields("Case Number"), "Count of Case Number", win32.constants.xlCount)
-        pivot_table.PivotFields("Count of Case Number").NumberFormat = "#,##0"
-
-        sheet2.UsedRange.Columns.AutoFit()
-        wb.Save()
-        wb.Close()
-        excel.Quit()
-
+        # Remarks are joined into Sheet1 before it is written
         lookup_file, save_option = get_vlookup_choice(output_path)
+        remarks_output = output_path
+        if lookup_file and save_option == 'yes':
+            remarks_output = filedialog.asksaveasfilename(
+                title="Save Enhanced File As",
+                defaultextension=".xlsx",
+                filetypes=[("Excel files", "*.xlsx")]
+            )
+            if not remarks_output:
+                print("VLOOKUP operation cancelled")
+                create_styled_excel(df_sheet1, output_path)
+                return
+
+        if not lookup_file or remarks_output != output_path:
+            create_styled_excel(df_sheet1, output_path)
         if lookup_file:
-            if save_option == 'yes':
-                new_output = filedialog.asksaveasfilename(
-                    title="Save Enhanced File As",
-                    defaultextension=".xlsx",
-                    filetypes=[("Excel files", "*.xlsx")]
-                )
-                if new_output:
-                    shutil.copy2(output_path, new_output)
-                    output_path = new_output
-                else:
-                    print("VLOOKUP operation cancelled")
-                    return
-            if apply_vlookup_with_excel_com(output_path, lookup_file):
+            success = join_lookup_remarks(df_sheet1, lookup_file)
+            create_styled_excel(df_sheet1, remarks_output)
+            output_path = remarks_output
+            if success:
                 print("VLOOKUP operation completed successfully")
             else:
                 print("VLOOKUP operation completed with warnings")
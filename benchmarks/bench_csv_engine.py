@@ -0,0 +1,49 @@
+"""Compares the default C engine with the multithreaded pyarrow engine.
+
+Both engines go through the shared schema reader, so the timings include
+column projection and dtype pinning exactly as the pipelines use them.
+
+    python benchmarks/bench_csv_engine.py [rows]
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from benchmarks.synthetic import atomberg_frame, orient_frame
+from common.csv_reader import read_schema_csv
+from common.schemas import ATOMBERG_GENERAL_SCHEMA, ORIENT_SCHEMA
+
+
+def time_read(csv_path, schema, engine):
+    start = time.perf_counter()
+    df = read_schema_csv(csv_path, schema, engine=engine, low_memory=False)
+    return time.perf_counter() - start, df
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    exports = [
+        ('Atomberg', atomberg_frame, ATOMBERG_GENERAL_SCHEMA),
+        ('Orient', orient_frame, ORIENT_SCHEMA),
+    ]
+    results = []
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for name, make_frame, schema in exports:
+            csv_path = os.path.join(temp_dir, f'{name}.csv')
+            make_frame(rows).to_csv(csv_path, index=False)
+            size_mb = os.path.getsize(csv_path) / 1e6
+            c_seconds, c_df = time_read(csv_path, schema, 'c')
+            arrow_seconds, arrow_df = time_read(csv_path, schema, 'pyarrow')
+            assert c_df.shape == arrow_df.shape
+            results.append((name, size_mb, c_seconds, arrow_seconds))
+
+    print(f"\n{rows} rows per export, {os.cpu_count()} CPUs")
+    for name, size_mb, c_seconds, arrow_seconds in results:
+        print(f"{name:9s} {size_mb:7.1f} MB   c: {c_seconds:6.2f}s   "
+              f"pyarrow: {arrow_seconds:6.2f}s   ({c_seconds / arrow_seconds:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""Compares the old UTF-8 -> Latin-1 retry chain with the single-pass reader.
+
+The worst case for the old chain is a single non-UTF-8 byte near the end of
+the file: pandas parses almost everything before failing and starting over.
+
+    python benchmarks/bench_csv_reader.py [rows]
+"""
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from benchmarks.synthetic import atomberg_frame
+from common.csv_reader import read_csv_once
+
+
+def legacy_read(input_path):
+    """The retry chain the scripts used before common.csv_reader."""
+    parses = 1
+    try:
+        df = pd.read_csv(input_path, encoding='utf-8', low_memory=False)
+    except UnicodeDecodeError:
+        parses += 1
+        try:
+            df = pd.read_csv(input_path, encoding='latin-1', low_memory=False)
+        except UnicodeDecodeError:
+            parses += 1
+            df = pd.read_csv(input_path, encoding='windows-1252', low_memory=False)
+    return df, parses
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    with tempfile.TemporaryDirectory() as temp_dir:
+        csv_path = os.path.join(temp_dir, 'export.csv')
+        df = atomberg_frame(rows)
+        # Everything else is ASCII, so this puts one Windows-1252 byte in the last row
+        df.loc[df.index[-1], 'Customer Name'] = 'Ren\u00e9e'
+        df.to_csv(csv_path, index=False, encoding='windows-1252')
+        print(f"{rows} rows, {os.path.getsize(csv_path) / 1e6:.1f} MB, bad byte in the last row")
+
+        start = time.perf_counter()
+        _, parses = legacy_read(csv_path)
+        print(f"legacy retry chain : {time.perf_counter() - start:6.2f}s ({parses} parses)")
+
+        start = time.perf_counter()
+        read_csv_once(csv_path, low_memory=False)
+        print(f"read_csv_once      : {time.perf_counter() - start:6.2f}s (1 parse)")
+
+
+if __name__ == "__main__":
+    main()
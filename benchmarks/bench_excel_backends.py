@@ -0,0 +1,103 @@
+"""Compares time and peak memory of the openpyxl and XlsxWriter report backends.
+
+Each backend writes the Atomberg Sheet1 and the Orient Processed Data report
+in a fresh process, so the peak RSS of one run does not hide the other's.
+Peak RSS is read with the resource module (Linux and macOS).
+
+    python benchmarks/bench_excel_backends.py [rows]
+"""
+import importlib.util
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT_DIR)
+from benchmarks.synthetic import atomberg_frame, orient_frame
+from common.excel_writer import (
+    ATOMBERG_DATA_STYLES, ATOMBERG_HEADER, ATOMBERG_STYLES, SheetSpec, write_report
+)
+
+ATOMBERG_COLUMNS = ['Case Number', 'SLA', 'Customer Name', 'Customer Phone', 'Street', 'Zip/Postal Code',
+                    'Customer Complaint', 'Product Description', 'LineItem Status', 'Technician Name', 'Remarks']
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+
+def load_orient():
+    spec = importlib.util.spec_from_file_location('orient_script', os.path.join(ROOT_DIR, 'orient', 'orient.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def write_atomberg(rows, backend, output_path):
+    df = atomberg_frame(rows, filler_columns=0)
+    df['SLA'] = (df.index % 4).astype(int)
+    df['Remarks'] = ''
+    rules = [('B', {'operator': 'equal', 'value': '0', 'fill': '00FF00'}),
+             ('B', {'operator': 'greaterThan', 'value': '1', 'fill': 'FF0000'})]
+    widths = dict(zip('ABCDEFGHIJK', [12, 8, 15, 12, 60, 12, 15, 35, 12, 15, 15]))
+    start_rss = peak_rss_mb()
+    start = time.perf_counter()
+    write_report(output_path, [
+        SheetSpec("Sheet1", df[ATOMBERG_COLUMNS], ATOMBERG_HEADER, ATOMBERG_DATA_STYLES,
+                  column_widths=widths, header_height=30, row_height=50, conditional_formats=rules),
+        SheetSpec("Sheet2"),
+    ], ATOMBERG_STYLES, backend)
+    return time.perf_counter() - start, start_rss
+
+
+def write_orient(rows, backend, output_path):
+    orient = load_orient()
+    orient.get_excel_backend = lambda company: backend
+    csv_path = output_path + '.csv'
+    orient_frame(rows, filler_columns=0).to_csv(csv_path, index=False)
+    df = orient.extract_required_columns(csv_path)
+    df['REMARK'] = ''
+    df['SO_NUMBER'] = ''
+    start_rss = peak_rss_mb()
+    start = time.perf_counter()
+    assert orient.create_formatted_excel(df, output_path)
+    return time.perf_counter() - start, start_rss
+
+
+def run_child(report, rows, backend):
+    with tempfile.TemporaryDirectory() as temp_dir:
+        write = write_atomberg if report == 'atomberg' else write_orient
+        seconds, start_rss = write(rows, backend, os.path.join(temp_dir, 'report.xlsx'))
+    print(f"RESULT {seconds:.3f} {start_rss:.1f} {peak_rss_mb():.1f}")
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == '--child':
+        run_child(sys.argv[2], int(sys.argv[3]), sys.argv[4])
+        return
+
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    results = []
+    for report in ('atomberg', 'orient'):
+        for backend in ('openpyxl', 'xlsxwriter'):
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--child', report, str(rows), backend],
+                capture_output=True, text=True, check=True
+            ).stdout
+            result_line = next(line for line in output.splitlines() if line.startswith('RESULT '))
+            seconds, start_rss, peak_rss = map(float, result_line.split()[1:])
+            results.append((report, backend, seconds, start_rss, peak_rss))
+
+    print(f"\n{rows} rows")
+    print(f"{'report':<10}{'backend':<12}{'time':>9}{'RSS before':>13}{'peak RSS':>11}")
+    for report, backend, seconds, start_rss, peak_rss in results:
+        print(f"{report:<10}{backend:<12}{seconds:8.2f}s{start_rss:11.0f}MB{peak_rss:9.0f}MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Compares the old lookup workbook readers with the header peek and streaming index.
+
+The old path validated the tracker by loading it in full (every cell as a
+Cell object) and then read the whole sheet into a frame for the join. The
+new path reads the header and first rows for validation and streams the
+sheet as values, keeping only the key and Remarks columns. Both read the
+same synthetic tracker; the cache is not involved.
+
+    python benchmarks/bench_lookup_reader.py [rows]
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+from openpyxl import Workbook, load_workbook
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT_DIR)
+from common.remarks import peek_lookup_sheet, read_lookup_index
+
+LOOKUP_COLUMNS = 20
+
+
+def write_lookup(rows, path):
+    """Writes a tracker with a Case Number, filler columns and a remark in column J."""
+    workbook = Workbook()  # not write_only, so the sheet records its dimension as Excel does
+    worksheet = workbook.active
+    worksheet.append(['Case Number'] + [f'Column {i}' for i in range(2, LOOKUP_COLUMNS + 1)])
+    for row_idx in range(rows):
+        row = [10_000_000 + row_idx] + [f'value {row_idx % 97}'] * (LOOKUP_COLUMNS - 1)
+        row[9] = f'Remark {row_idx}'
+        worksheet.append(row)
+    workbook.save(path)
+
+
+def legacy_read(path):
+    """validate_lookup_file and the full-sheet read as they were before the streaming reader."""
+    lookup_ws = load_workbook(path, data_only=True).active
+    headers = [lookup_ws.cell(row=1, column=col).value for col in range(1, lookup_ws.max_column + 1)]
+    sample = [lookup_ws.cell(row=row, column=1).value for row in range(2, min(6, lookup_ws.max_row + 1))]
+    lookup = pd.read_excel(path, sheet_name=0, dtype=object)
+    return headers, sample, len(lookup)
+
+
+def streaming_read(path):
+    header, sample, data_rows = peek_lookup_sheet(path)
+    index = read_lookup_index(path, {'Remarks': 10})
+    return header, sample, len(index)
+
+
+def measure(read, path):
+    """Returns the seconds and peak traced memory (MB) of read(path), from separate runs."""
+    start = time.perf_counter()
+    read(path)
+    seconds = time.perf_counter() - start
+    tracemalloc.start()
+    read(path)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak / 1e6
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        lookup_path = os.path.join(temp_dir, 'lookup.xlsx')
+        write_lookup(rows, lookup_path)
+        size = os.path.getsize(lookup_path)
+        legacy_seconds, legacy_peak = measure(legacy_read, lookup_path)
+        streaming_seconds, streaming_peak = measure(streaming_read, lookup_path)
+
+    print(f"\n{rows} rows x {LOOKUP_COLUMNS} columns ({size / 1e6:.1f}MB)")
+    print(f"full load + read_excel : {legacy_seconds:6.2f}s  peak {legacy_peak:7.1f}MB")
+    print(f"peek + streaming index : {streaming_seconds:6.2f}s  peak {streaming_peak:7.1f}MB")
+
+
+if __name__ == "__main__":
+    main()
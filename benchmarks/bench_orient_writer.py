@@ -0,0 +1,123 @@
+"""Compares the old iterrows Orient Excel writer with the columnar streaming writer.
+
+Both write the same processed frame (formula output mode) to a temporary
+workbook; the old writer is kept here as it was in orient.py.
+
+    python benchmarks/bench_orient_writer.py [rows ...]
+"""
+import importlib.util
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+from openpyxl import Workbook
+from openpyxl.formatting.rule import FormulaRule
+from openpyxl.styles import Alignment, Border, Font, PatternFill, Side
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT_DIR)
+from benchmarks.synthetic import orient_frame
+
+
+def load_orient():
+    spec = importlib.util.spec_from_file_location('orient_script', os.path.join(ROOT_DIR, 'orient', 'orient.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def legacy_write(df, output_path):
+    """create_formatted_excel as orient.py wrote it before the columnar writer."""
+    workbook = Workbook()
+    worksheet = workbook.active
+    worksheet.title = "Processed Data"
+    widths = [20, 12, 10, 0, 15, 20, 12, 25, 15, 15, 20, 30, 10, 15, 20, 15, 15, 20, 15]
+    for col_letter, width in zip('ABCDEFGHIJKLMNOPQRS', widths):
+        worksheet.column_dimensions[col_letter].width = width
+    for col_idx, header in enumerate(df.columns, 1):
+        worksheet.cell(row=1, column=col_idx, value=header)
+
+    center_middle_alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
+    call_id_alignment = Alignment(horizontal='center', vertical='center', wrap_text=False)
+    for row_idx, (_, row) in enumerate(df.iterrows(), 2):
+        for col_idx, (col_name, value) in enumerate(row.items(), 1):
+            cell = worksheet.cell(row=row_idx, column=col_idx)
+            cell.alignment = call_id_alignment if col_name == 'CALL ID' else center_middle_alignment
+            if col_name == 'DATE' and pd.notna(value):
+                cell.value = value.to_pydatetime()
+                cell.number_format = 'DD-MM-YYYY'
+            elif col_name == 'TIME' and pd.notna(value):
+                cell.value = value.total_seconds() / 86400
+                cell.number_format = 'HH:MM:SS'
+            elif col_name == 'NO OF HOURS':
+                cell.value = f'=IF(AND(B{row_idx}<>"",C{row_idx}<>""),(NOW()-(B{row_idx}+C{row_idx}))*24,"")'
+                cell.number_format = '0.00'
+            elif col_name == 'PENDING DAYS':
+                cell.value = f'=IF(D{row_idx}<>"",INT(D{row_idx}/24),"")'
+                cell.number_format = '0'
+            elif col_name == 'DAYS':
+                cell.value = f'=IF(D{row_idx}="","",IF(D{row_idx}<=24,"D1 (0-24Hrs)",' \
+                             f'IF(D{row_idx}<=48,"D2 (24-48Hrs)",' \
+                             f'IF(D{row_idx}<=72,"D3 (48-72 Hrs)","D4 (>72Hrs)"))))'
+            elif col_name == 'TAT STATUS':
+                cell.value = f'=IF(E{row_idx}<>"",IF(E{row_idx}>0,"OUT TAT","IN TAT"),"")'
+            else:
+                cell.value = str(value) if pd.notna(value) else ""
+
+    header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
+    alternate_fill = PatternFill(start_color="F2F2F2", end_color="F2F2F2", fill_type="solid")
+    thin_border = Border(left=Side(style='thin'), right=Side(style='thin'),
+                         top=Side(style='thin'), bottom=Side(style='thin'))
+    for row_num, row in enumerate(worksheet.iter_rows(min_row=1, max_row=worksheet.max_row,
+                                                      min_col=1, max_col=worksheet.max_column), 1):
+        for cell in row:
+            cell.border = thin_border
+            if row_num == 1:
+                cell.alignment = center_middle_alignment
+                cell.fill = header_fill
+                cell.font = Font(bold=True, color="FFFFFF", size=12)
+            else:
+                cell.font = Font(size=11)
+                if row_num % 2 == 0 and cell.column != 7:
+                    cell.fill = alternate_fill
+    worksheet.conditional_formatting.add(f"G2:G{worksheet.max_row}", FormulaRule(
+        formula=['$G2="IN TAT"'], fill=PatternFill(start_color="90EE90", end_color="90EE90", fill_type="solid")))
+    worksheet.conditional_formatting.add(f"G2:G{worksheet.max_row}", FormulaRule(
+        formula=['$G2="OUT TAT"'], fill=PatternFill(start_color="FFB6C1", end_color="FFB6C1", fill_type="solid")))
+    worksheet.column_dimensions['D'].hidden = True
+    worksheet.auto_filter.ref = worksheet.dimensions
+    worksheet.freeze_panes = 'A2'
+    workbook.save(output_path)
+
+
+def main():
+    row_counts = [int(arg) for arg in sys.argv[1:]] or [50_000, 200_000]
+    orient = load_orient()
+
+    results = []
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for rows in row_counts:
+            csv_path = os.path.join(temp_dir, 'orient.csv')
+            orient_frame(rows, filler_columns=0).to_csv(csv_path, index=False)
+            df = orient.extract_required_columns(csv_path)
+            df['REMARK'] = ''
+            df['SO_NUMBER'] = ''
+
+            start = time.perf_counter()
+            legacy_write(df, os.path.join(temp_dir, 'legacy.xlsx'))
+            legacy_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            assert orient.create_formatted_excel(df, os.path.join(temp_dir, 'columnar.xlsx'))
+            results.append((rows, legacy_seconds, time.perf_counter() - start))
+
+    print()
+    for rows, legacy_seconds, columnar_seconds in results:
+        print(f"{rows:>8} rows   iterrows: {legacy_seconds:6.2f}s   columnar: {columnar_seconds:6.2f}s"
+              f"   ({legacy_seconds / columnar_seconds:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Times adding the PivotTable parts to an Atomberg report.
+
+The report (Sheet1 and the SLA summary on Sheet2) is written once without
+and once with the pivot_tables step, which adds the pivot cache and pivot
+table over the summary while the report is written, the step that used to
+open the workbook in Excel through COM.
+
+    python benchmarks/bench_pivot_parts.py [rows ...]
+"""
+import os
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT_DIR)
+from benchmarks.synthetic import atomberg_frame
+from common.excel_writer import (
+    ATOMBERG_DATA_STYLES, ATOMBERG_HEADER, ATOMBERG_STYLES, SheetSpec, write_report
+)
+from common.pivots import PivotTableSpec, pivot_counts, pivot_tables, summary_sheet
+
+ATOMBERG_COLUMNS = ['Case Number', 'SLA', 'Customer Name', 'Customer Phone', 'Street', 'Zip/Postal Code',
+                    'Customer Complaint', 'Product Description', 'LineItem Status', 'Technician Name', 'Remarks']
+
+
+def main():
+    row_counts = [int(arg) for arg in sys.argv[1:]] or [50_000, 200_000]
+
+    results = []
+    with tempfile.TemporaryDirectory() as temp_dir:
+        output_path = os.path.join(temp_dir, 'report.xlsx')
+        for rows in row_counts:
+            df = atomberg_frame(rows, filler_columns=0)
+            df['SLA'] = (df.index % 4).astype(int)
+            df['Remarks'] = ''
+            df = df[ATOMBERG_COLUMNS]
+            new_cases = df[df['LineItem Status'] == 'New']
+            sla_sheet = summary_sheet(
+                "Sheet2", pivot_counts(new_cases, 'Technician Name', 'Case Number', columns='SLA'),
+                ATOMBERG_HEADER, 'Atomberg Data', 'Atomberg Total', data_caption='Count of Cases',
+                columns_caption='SLA', filters=[('LineItem Status', 'New')]
+            )
+
+            sheets = [SheetSpec("Sheet1", df, ATOMBERG_HEADER, ATOMBERG_DATA_STYLES), sla_sheet]
+
+            start = time.perf_counter()
+            write_report(output_path, sheets, ATOMBERG_STYLES)
+            write_seconds = time.perf_counter() - start
+            report_size = os.path.getsize(output_path)
+
+            start = time.perf_counter()
+            write_report(output_path, sheets, ATOMBERG_STYLES, edit_package=pivot_tables([
+                PivotTableSpec("SLA_Pivot", sla_sheet, "Sheet1", df, 'Technician Name', 'Case Number',
+                               columns='SLA', data_caption='Count of Cases',
+                               page_fields=[('LineItem Status', ['New'])]),
+            ]))
+            # The time the pivot step adds to the write
+            pivot_seconds = time.perf_counter() - start - write_seconds
+            results.append((rows, write_seconds, pivot_seconds, report_size, os.path.getsize(output_path)))
+
+    print()
+    for rows, write_seconds, pivot_seconds, report_size, pivot_size in results:
+        print(f"{rows:>8} rows   report: {write_seconds:6.2f}s   pivot parts: {pivot_seconds:6.2f}s"
+              f"   size {report_size / 1e6:.1f}MB -> {pivot_size / 1e6:.1f}MB")
+
+
+if __name__ == "__main__":
+    main()
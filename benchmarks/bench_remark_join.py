@@ -0,0 +1,94 @@
+"""Compares the old cell-by-cell Remarks lookup with the pandas remark join.
+
+The old direct-data lookup reloaded the saved report, looked up each row's
+Case Number in a dict and saved the report again. The join fills the
+Remarks column of the frame before the report is written, so only the
+lookup sheet is read. Both read the same synthetic lookup workbook. The
+join is also checked against an empty lookup index, where every Case
+Number must come back Not Found.
+
+    python benchmarks/bench_remark_join.py [rows]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from openpyxl import Workbook, load_workbook
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT_DIR)
+from benchmarks.synthetic import atomberg_frame
+from common.excel_writer import ATOMBERG_DATA_STYLES, ATOMBERG_HEADER, ATOMBERG_STYLES, SheetSpec, write_report
+from common.remarks import NOT_FOUND, join_remarks, read_lookup_index
+
+REPORT_COLUMNS = ['Case Number', 'SLA', 'Customer Name', 'Street', 'Zip/Postal Code', 'Customer Complaint',
+                  'Product Description', 'LineItem Status', 'Technician Name', 'Remarks']
+
+
+def write_lookup(df, path):
+    """Writes a tracker with every other report Case Number and a remark in column J."""
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet("Sheet1")
+    worksheet.append(['Case Number'] + [f'Column {i}' for i in range(2, 10)] + ['Remarks'])
+    for row_idx, case_number in enumerate(df['Case Number'].iloc[::2]):
+        worksheet.append([case_number] + [''] * 8 + [f'Remark {row_idx}'])
+    workbook.save(path)
+
+
+def legacy_lookup(report_path, lookup_path):
+    """apply_vlookup_direct_data as Feed_Remark used it before the remark join."""
+    lookup_ws = load_workbook(lookup_path, data_only=True).active
+    lookup_dict = {}
+    for row in range(2, lookup_ws.max_row + 1):
+        case_num = lookup_ws.cell(row=row, column=1).value
+        remarks = lookup_ws.cell(row=row, column=10).value
+        if case_num:
+            lookup_dict[str(case_num).strip()] = remarks if remarks else "No Remarks"
+    main_wb = load_workbook(report_path)
+    main_ws = main_wb["Sheet1"]
+    for row in range(2, main_ws.max_row + 1):
+        case_num = main_ws.cell(row=row, column=1).value
+        if case_num:
+            main_ws.cell(row=row, column=10, value=lookup_dict.get(str(case_num).strip(), "Not Found"))
+    main_wb.save(report_path)
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    df = atomberg_frame(rows, filler_columns=0)
+    df['SLA'] = (df.index % 4).astype(int)
+    df['Remarks'] = ''
+    df = df[REPORT_COLUMNS]
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        lookup_path = os.path.join(temp_dir, 'lookup.xlsx')
+        report_path = os.path.join(temp_dir, 'report.xlsx')
+        write_lookup(df, lookup_path)
+        sheets = [SheetSpec("Sheet1", df, ATOMBERG_HEADER, ATOMBERG_DATA_STYLES)]
+
+        # Old: write the report, then patch the Remarks in place
+        start = time.perf_counter()
+        write_report(report_path, sheets, ATOMBERG_STYLES)
+        written_seconds = time.perf_counter() - start
+        legacy_lookup(report_path, lookup_path)
+        legacy_seconds = time.perf_counter() - start
+
+        # New: join the Remarks into the frame, then write the report once
+        start = time.perf_counter()
+        lookup_index = read_lookup_index(lookup_path, {'Remarks': 10})
+        remarks, stats = join_remarks(df['Case Number'], lookup_index, ['Remarks'])
+        joined_seconds = time.perf_counter() - start
+        # With no stored keys at all, every Case Number is missing, as with VLOOKUP
+        unmatched, _ = join_remarks(df['Case Number'], lookup_index.iloc[:0], ['Remarks'])
+        assert (unmatched['Remarks'] == NOT_FOUND).all(), "Unmatched Case Numbers are not Not Found"
+        write_report(report_path, [sheets[0]._replace(df=df.assign(Remarks=remarks['Remarks']))], ATOMBERG_STYLES)
+        join_seconds = time.perf_counter() - start
+
+    print(f"\n{rows} rows, {stats['matched']} matched")
+    print(f"write + reload/patch/save : {legacy_seconds:6.2f}s  (lookup step {legacy_seconds - written_seconds:.2f}s)")
+    print(f"join + write              : {join_seconds:6.2f}s  (lookup step {joined_seconds:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Compares a per-cell word-wrap simulation with the vectorized row height estimate.
+
+Both measure the same free-text columns (addresses, complaints and remarks
+built from random words, so nearly every value is distinct) with the same
+Calibri character widths. The simulation wraps each cell word by word as
+Excel does; the estimate works from each cell's total width and word count.
+Reported are both timings and how often the estimated line count of a row
+matches the simulated one.
+
+    python benchmarks/bench_row_heights.py [rows]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT_DIR)
+from common.layout import CHAR_WIDTHS, estimate_row_heights, line_height
+
+WORDS = ['Flat', '4B', 'Sai', 'Heights', 'Baner', 'Road', 'Near', 'City', 'Mall', 'Pune', 'MG', 'Opp.',
+         'Station', 'Society', 'Wing', 'Sector', 'Fan', 'not', 'working', 'noise', 'issue', 'remote',
+         'customer', 'requested', 'visit', 'tomorrow', 'part', 'pending', 'replaced', 'PCB', 'motor']
+COLUMN_WIDTHS = {'A': 12, 'B': 60, 'C': 15, 'D': 15}
+
+
+def free_text_frame(rows, seed=0):
+    rng = np.random.default_rng(seed)
+
+    def sentences(low, high):
+        counts = rng.integers(low, high, rows)
+        words = rng.choice(WORDS, counts.sum())
+        return [' '.join(chunk) for chunk in np.split(words, np.cumsum(counts)[:-1])]
+
+    return pd.DataFrame({
+        'Case Number': [f"{n:08d}" for n in rng.integers(1, 99999999, rows)],
+        'Street': sentences(3, 14),
+        'Customer Complaint': sentences(1, 6),
+        'Remarks': sentences(0, 12),
+    })
+
+
+def simulated_lines(text, column_width):
+    """Wraps one cell word by word; a word wider than the column is broken across lines."""
+    lines = 0
+    for paragraph in text.split('\n'):
+        lines += 1
+        used = 0.0
+        for word_idx, word in enumerate(paragraph.split(' ')):
+            word_width = sum(CHAR_WIDTHS[min(ord(char), len(CHAR_WIDTHS) - 1)] for char in word)
+            space = CHAR_WIDTHS[32] if word_idx else 0.0
+            if used and used + space + word_width > column_width:
+                lines += 1
+                used, space = 0.0, 0.0
+            used += space + word_width
+            while used > column_width:
+                lines += 1
+                used -= column_width
+    return lines
+
+
+def simulated_heights(df):
+    lines = np.ones(len(df), dtype=np.int64)
+    for position, name in enumerate(df.columns):
+        width = COLUMN_WIDTHS[chr(ord('A') + position)]
+        lines = np.maximum(lines, [simulated_lines(text, width) for text in df[name]])
+    return lines
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    df = free_text_frame(rows)
+
+    start = time.perf_counter()
+    simulated = simulated_heights(df)
+    simulated_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    heights = estimate_row_heights(df, COLUMN_WIDTHS)
+    estimate_seconds = time.perf_counter() - start
+    estimated = np.array([1 if height is None else round(height / line_height(11)) for height in heights])
+
+    difference = estimated - simulated
+    print(f"\n{rows} rows, {df['Street'].nunique()} distinct streets")
+    print(f"per-cell word wrap  : {simulated_seconds:6.2f}s")
+    print(f"vectorized estimate : {estimate_seconds:6.2f}s")
+    print(f"same line count {np.mean(difference == 0) * 100:.1f}%, "
+          f"one line more {np.mean(difference == 1) * 100:.1f}%, "
+          f"one line fewer {np.mean(difference == -1) * 100:.1f}%, "
+          f"further off {np.mean(abs(difference) > 1) * 100:.1f}%")
+
+
+if __name__ == "__main__":
+    main()
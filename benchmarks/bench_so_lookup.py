@@ -0,0 +1,87 @@
+"""Compares the old iterrows SO_NUMBER lookup with the vectorized prefix join.
+
+Builds an SO export ZIP (one CSV, 30 columns, key text in column G and the
+SO number in column Y, some keys repeated) and a set of PENDING CALL POs,
+then looks the POs up both ways and checks the results agree.
+
+    python benchmarks/bench_so_lookup.py [export_rows] [calls]
+"""
+import importlib.util
+import os
+import sys
+import tempfile
+import time
+import zipfile
+
+import numpy as np
+import pandas as pd
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT_DIR)
+from common.csv_reader import read_csv_once
+
+EXPORT_COLUMNS = 30
+
+
+def load_orient():
+    spec = importlib.util.spec_from_file_location('orient_script', os.path.join(ROOT_DIR, 'orient', 'orient.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def write_export(rows, zip_path, seed=0):
+    """Writes the SO export ZIP and returns the PO numbers it contains."""
+    rng = np.random.default_rng(seed)
+    po_numbers = np.array([f"PO{n:011d}" for n in rng.integers(0, 99999999999, rows)])
+    po_numbers[rng.integers(0, rows, rows // 20)] = po_numbers[rng.integers(0, rows, rows // 20)]
+    export = pd.DataFrame({f'COL{i}': rng.integers(0, 1000, rows) for i in range(EXPORT_COLUMNS)})
+    export['COL6'] = [f"{po}-{line:03d}" for po, line in zip(po_numbers, rng.integers(0, 999, rows))]
+    export['COL24'] = [f"SO{n:09d}" for n in rng.integers(0, 999999999, rows)]
+    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('so_export.csv', export.to_csv(index=False))
+    return po_numbers
+
+
+def legacy_lookup(orient, zip_path, pending_call_po):
+    """process_so_number_lookup and the PENDING CALL PO map as orient.py ran them before the join."""
+    lookup_df = read_csv_once(orient.find_csv_in_zip(zip_path), header=None)
+    mapping = {}
+    for _, row in lookup_df.iterrows():
+        if len(row) > 24:
+            key = str(row[6]).strip()[:13]
+            value = str(row[24]).strip()
+            if key and value:
+                mapping[key] = value
+    return pending_call_po.astype(str).str.strip().str[:13].map(lambda x: mapping.get(x, "Not Found"))
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    calls = int(sys.argv[2]) if len(sys.argv) > 2 else 50_000
+    orient = load_orient()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        zip_path = os.path.join(temp_dir, 'so_export.zip')
+        po_numbers = write_export(rows, zip_path)
+        rng = np.random.default_rng(1)
+        known = rng.choice(po_numbers, calls - calls // 4)
+        unknown = [f"PO{n:011d}" for n in rng.integers(0, 99999999999, calls // 4)]
+        pending_call_po = pd.Series(np.concatenate([known, unknown]))
+
+        start = time.perf_counter()
+        legacy = legacy_lookup(orient, zip_path, pending_call_po)
+        legacy_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        joined = orient.join_so_numbers(pending_call_po, orient.process_so_number_lookup(zip_path))
+        join_seconds = time.perf_counter() - start
+
+    assert (legacy.to_numpy() == joined.to_numpy()).all(), "SO numbers differ between the two paths"
+    print(f"\n{rows} export rows, {calls} calls")
+    print(f"iterrows mapping + map : {legacy_seconds:6.2f}s")
+    print(f"vectorized prefix join : {join_seconds:6.2f}s")
+
+
+if __name__ == "__main__":
+    main()
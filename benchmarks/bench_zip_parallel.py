@@ -0,0 +1,58 @@
+"""Measures how parsing a multi-CSV Orient ZIP scales with worker processes.
+
+Builds one ZIP holding several region CSVs, then parses every member straight
+from the archive with the shared schema reader, once per worker count. With
+a single CPU there is nothing to scale across, so the benchmark is skipped.
+
+    python benchmarks/bench_zip_parallel.py [rows_per_csv] [csv_count]
+"""
+import os
+import sys
+import tempfile
+import time
+import zipfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from benchmarks.synthetic import orient_frame
+from common.csv_reader import concat_frames, read_schema_csv
+from common.parallel import map_in_processes
+from common.schemas import ORIENT_SCHEMA
+from common.sources import ZipMember, find_zip_csv_members
+
+
+def parse_member(source):
+    return read_schema_csv(source, ORIENT_SCHEMA, low_memory=False)
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    csv_count = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    cpu_count = os.cpu_count() or 1
+    if cpu_count < 2:
+        print(f"os.cpu_count() is {cpu_count}: worker processes cannot run in parallel here, "
+              f"so there is no scaling to measure. Run this on a machine with several CPUs.")
+        return
+    worker_counts = sorted({1, 2, 4, cpu_count} & set(range(1, cpu_count + 1)))
+
+    results = []
+    with tempfile.TemporaryDirectory() as temp_dir:
+        zip_path = os.path.join(temp_dir, 'orient_regions.zip')
+        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zip_ref:
+            for region in range(csv_count):
+                zip_ref.writestr(f'region_{region}.csv', orient_frame(rows, seed=region).to_csv(index=False))
+        sources = [ZipMember(zip_path, member) for member in find_zip_csv_members(zip_path)]
+
+        for workers in worker_counts:
+            start = time.perf_counter()
+            df = concat_frames(map_in_processes(parse_member, sources, max_workers=workers), ignore_index=True)
+            results.append((workers, time.perf_counter() - start))
+            assert len(df) == rows * csv_count
+
+    print(f"\n{csv_count} CSVs x {rows} rows, {cpu_count} CPUs")
+    baseline = results[0][1]
+    for workers, seconds in results:
+        print(f"{workers:3d} worker(s): {seconds:6.2f}s   ({baseline / seconds:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
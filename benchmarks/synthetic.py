@@ -0,0 +1,55 @@
+"""Synthetic Atomberg and Orient exports for the benchmark scripts."""
+import numpy as np
+import pandas as pd
+
+TECHNICIANS = ['Ramesh Patil', 'Suresh Jadhav', 'Anil Shinde', 'Vijay More', 'Sunil Pawar', 'Prakash Kale']
+ENGINEERS = ['AMIT SHARMA', 'RAHUL VERMA', 'SANJAY GUPTA', 'DEEPAK SINGH', 'MANOJ YADAV']
+PRODUCTS = ['Renesa 1200mm Ceiling Fan', 'Efficio Alpha 1200mm', 'Aris Starlight', 'Studio+ 900mm']
+
+
+def atomberg_frame(rows, filler_columns=70, seed=0):
+    """Builds an Atomberg-style export with the pipeline columns plus filler columns."""
+    rng = np.random.default_rng(seed)
+    created = pd.Timestamp('2025-01-01') + pd.to_timedelta(rng.integers(0, 180, rows), unit='D')
+    ended = created + pd.to_timedelta(rng.integers(0, 20, rows), unit='D')
+    df = pd.DataFrame({
+        'Case Number': [f"{n:08d}" for n in rng.integers(1, 99999999, rows)],
+        'Created Date': created.strftime('%d-%m-%Y'),
+        'Customer Name': rng.choice(['Asha Kulkarni', 'Rohan Mehta', 'Neha Joshi', 'Kiran Rao'], rows),
+        'Customer Phone': [f"9{n:09d}" for n in rng.integers(0, 999999999, rows)],
+        'Street': rng.choice(['12, MG Road, Near City Mall, Pune', 'Flat 4B, Sai Heights, Baner Road, Pune'], rows),
+        'Zip/Postal Code': rng.choice(['411001', '411045', '411038'], rows),
+        'Customer Complaint': rng.choice(['Fan not working', 'Noise issue', 'Remote not working'], rows),
+        'Product Description': rng.choice(PRODUCTS, rows),
+        'LineItem Status': rng.choice(['New', 'Completed', 'Cancelled'], rows, p=[0.3, 0.6, 0.1]),
+        'Technician Name': rng.choice(TECHNICIANS, rows),
+        'WO Status': rng.choice(['New', 'Closed', 'Cancelled'], rows, p=[0.05, 0.9, 0.05]),
+        'End Date': ended.strftime('%d-%m-%Y'),
+        'Warranty Status': rng.choice(['In Warranty', 'Out of Warranty'], rows),
+    })
+    filler = pd.DataFrame(rng.integers(0, 1000, (rows, filler_columns)),
+                          columns=[f'Extra Field {i}' for i in range(filler_columns)])
+    return pd.concat([df, filler], axis=1)
+
+
+def orient_frame(rows, filler_columns=135, seed=0):
+    """Builds an Orient-style export with the pipeline columns plus filler columns."""
+    rng = np.random.default_rng(seed)
+    registered = pd.Timestamp('2025-06-01') + pd.to_timedelta(rng.integers(0, 30 * 24 * 60, rows), unit='min')
+    df = pd.DataFrame({
+        'CALL ID': [f"OR{n:010d}" for n in rng.integers(1, 9999999999, rows)],
+        'REGISTRATION DATE': registered.strftime('%d-%m-%Y %H:%M:%S'),
+        'MODEL DESCRIPTION': rng.choice(['AEROSTORM 1200', 'APEX-FX 1200', 'ELECTRIC GEYSER 15L'], rows),
+        'CALL STAGE': rng.choice(['OPEN', 'PENDING', 'CLOSED', 'CANCELLED'], rows),
+        'CUSTOMER NAME': rng.choice(['ASHA KULKARNI', 'ROHAN MEHTA', 'NEHA JOSHI'], rows),
+        'ADDRESS': rng.choice(['12, MG ROAD, PUNE', 'FLAT 4B, SAI HEIGHTS, BANER ROAD, PUNE'], rows),
+        'PIN CODE': rng.choice(['411001', '411045'], rows),
+        'CONTACT NUMBER': [f"9{n:09d}" for n in rng.integers(0, 999999999, rows)],
+        'ENGINEER NAME': rng.choice(ENGINEERS, rows),
+        'CUSTOMER REMARKS': rng.choice(['FAN NOT WORKING', 'NOISE', 'INSTALLATION'], rows),
+        'PENDING CALL PO': [f"PO{n:011d}X" for n in rng.integers(0, 99999999999, rows)],
+        'GROUP': rng.choice(['FANS', 'WATER HEATERS', 'COOLERS'], rows),
+    })
+    filler = pd.DataFrame(rng.integers(0, 1000, (rows, filler_columns)),
+                          columns=[f'FIELD {i}' for i in range(filler_columns)])
+    return pd.concat([df, filler], axis=1)
@@ -0,0 +1 @@
+"""Shared helpers used by the Atomberg and Orient processing scripts."""
@@ -0,0 +1,204 @@
+import glob
+import hashlib
+import json
+import os
+
+import pandas as pd
+
+from common.config import ROOT_DIR, get_float_setting, get_setting
+from common.sources import ZipMember
+
+# ===============================
+# Parsed Export Cache
+# ===============================
+# Parsed, typed DataFrames are stored as Parquet files named after the
+# pipeline, its schema version and a SHA-256 of the input file (or of the ZIP
+# archive holding it), so the same export processed again (e.g. once plain
+# and once with remarks) skips the CSV parse and date handling entirely.
+# Bump a schema's 'version' whenever the code that builds its cached frame
+# changes.
+#
+# Settings come from the [cache] section of config.ini.
+DEFAULT_CACHE_DIR = os.path.join(ROOT_DIR, 'cache')
+DEFAULT_MAX_SIZE_MB = 1024
+HASH_BLOCK_SIZE = 8 * 1024 * 1024
+
+
+def cache_enabled():
+    """Checks whether caching is switched on and Parquet support (pyarrow) is installed."""
+    if get_setting('cache', 'enabled', 'true').strip().lower() not in ('1', 'true', 'yes', 'on'):
+        return False
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        print("pyarrow is not installed, parsed export cache disabled")
+        return False
+    return True
+
+
+def get_cache_dir():
+    """Returns the cache directory, creating it if needed."""
+    cache_dir = get_setting('cache', 'directory', '').strip() or DEFAULT_CACHE_DIR
+    os.makedirs(cache_dir, exist_ok=True)
+    return cache_dir
+
+
+def file_hash(file_path):
+    """Returns the SHA-256 hex digest of a file's contents."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def source_hash(source):
+    """Returns the content hash for a CSV source.
+
+    A ZIP member is keyed by the hash of its (compressed) archive and the
+    member name, so the member is not decompressed just to be hashed.
+    """
+    if isinstance(source, ZipMember):
+        return hashlib.sha256(f"{file_hash(source.zip_path)}/{source.member}".encode('utf-8')).hexdigest()
+    return file_hash(source)
+
+
+def evict_cache(cache_dir, max_size_mb):
+    """Deletes least recently used cache files until the directory fits in max_size_mb."""
+    entries = []
+    for name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, name)
+        if name.endswith('.parquet') and os.path.isfile(path):
+            stat = os.stat(path)
+            entries.append((stat.st_mtime, stat.st_size, path))
+    total_size = sum(size for _, size, _ in entries)
+    max_size = max_size_mb * 1024 * 1024
+    for _, size, path in sorted(entries):
+        if total_size <= max_size:
+            break
+        try:
+            os.remove(path)
+            total_size -= size
+            print(f"Evicted from cache: {os.path.basename(path)}")
+        except OSError:
+            pass
+
+
+def _load_cached_parquet(cache_dir, cache_file, build_frame, description):
+    """Reads cache_file, or builds the frame and stores it there, keeping the cache within its size cap."""
+    if os.path.exists(cache_file):
+        try:
+            df = pd.read_parquet(cache_file)
+            os.utime(cache_file)  # mark as recently used
+            print(f"Loaded {description} from cache: {os.path.basename(cache_file)}")
+            return df
+        except Exception as e:
+            print(f"Warning: Could not read cached {description}, re-parsing: {str(e)}")
+
+    df = build_frame()
+    temp_file = cache_file + '.tmp'
+    try:
+        df.to_parquet(temp_file)
+        os.replace(temp_file, cache_file)
+        evict_cache(cache_dir, get_float_setting('cache', 'max_size_mb', DEFAULT_MAX_SIZE_MB))
+    except Exception as e:
+        print(f"Warning: Could not cache {description}: {str(e)}")
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+    return df
+
+
+def load_cached_frame(source, schema, build_frame):
+    """Returns the parsed frame for an export, calling build_frame() and caching the result on a miss.
+
+    build_frame should raise for invalid input so that only frames that passed
+    validation are ever cached.
+    """
+    if not cache_enabled():
+        return build_frame()
+
+    cache_dir = get_cache_dir()
+    cache_file = os.path.join(
+        cache_dir, f"{schema['name']}-v{schema['version']}-{source_hash(source)}.parquet"
+    )
+    return _load_cached_parquet(cache_dir, cache_file, build_frame, 'parsed export')
+
+
+# ===============================
+# Lookup Index Cache
+# ===============================
+# Lookup workbooks (the remark trackers) are parsed into an index of their
+# keys and the looked-up columns, cached as Parquet in the same directory and
+# under the same size cap as the exports. An index is named after the
+# workbook's content hash and the columns it holds, so every script looking
+# up the same columns shares it. lookup_files.json records the path, mtime,
+# size and hash of each workbook: an unchanged workbook is not re-hashed, and
+# the indexes of a workbook whose contents changed are deleted.
+LOOKUP_MANIFEST = 'lookup_files.json'
+# Bump whenever the code that builds a lookup index changes
+LOOKUP_INDEX_VERSION = 2
+
+
+def _read_lookup_manifest(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, LOOKUP_MANIFEST), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_lookup_manifest(cache_dir, manifest):
+    manifest_file = os.path.join(cache_dir, LOOKUP_MANIFEST)
+    with open(manifest_file + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(manifest_file + '.tmp', manifest_file)
+
+
+def remove_lookup_indexes(cache_dir, content_hash):
+    """Deletes the cached indexes of a lookup workbook version."""
+    for path in glob.glob(os.path.join(cache_dir, f"lookup-v*-{content_hash}-*.parquet")):
+        try:
+            os.remove(path)
+            print(f"Removed outdated lookup index: {os.path.basename(path)}")
+        except OSError:
+            pass
+
+
+def lookup_file_hash(cache_dir, lookup_file_path):
+    """Returns the content hash of a lookup workbook, hashing it again only if its mtime or size changed."""
+    path = os.path.abspath(lookup_file_path)
+    stat = os.stat(path)
+    manifest = _read_lookup_manifest(cache_dir)
+    entry = manifest.get(path)
+    if entry and entry['mtime'] == stat.st_mtime and entry['size'] == stat.st_size:
+        return entry['hash']
+
+    content_hash = file_hash(path)
+    if entry and entry['hash'] != content_hash:
+        # The workbook changed: its old indexes are dropped unless another path has the same contents
+        if not any(other['hash'] == entry['hash'] for other_path, other in manifest.items() if other_path != path):
+            remove_lookup_indexes(cache_dir, entry['hash'])
+    manifest[path] = {'mtime': stat.st_mtime, 'size': stat.st_size, 'hash': content_hash}
+    try:
+        _write_lookup_manifest(cache_dir, manifest)
+    except OSError as e:
+        print(f"Warning: Could not update the lookup file list: {str(e)}")
+    return content_hash
+
+
+def load_cached_lookup(lookup_file_path, spec, build_index):
+    """Returns the index of a lookup workbook, calling build_index() and caching the result on a miss.
+
+    spec describes what the index holds (e.g. its columns); indexes of the
+    same workbook with a different spec are cached separately.
+    """
+    if not cache_enabled():
+        return build_index()
+
+    cache_dir = get_cache_dir()
+    spec_hash = hashlib.sha256(json.dumps(spec, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+    cache_file = os.path.join(
+        cache_dir,
+        f"lookup-v{LOOKUP_INDEX_VERSION}-{lookup_file_hash(cache_dir, lookup_file_path)}-{spec_hash}.parquet"
+    )
+    return _load_cached_parquet(cache_dir, cache_file, build_index, 'lookup index')
@@ -0,0 +1,28 @@
+import configparser
+import os
+
+# config.ini lives at the repository root, next to gui.py
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+CONFIG_PATH = os.path.join(ROOT_DIR, "config.ini")
+
+
+def load_config():
+    """Reads config.ini, returning an empty config if it does not exist."""
+    config = configparser.ConfigParser()
+    config.read(CONFIG_PATH)
+    return config
+
+
+def get_setting(section, key, fallback=None):
+    """Returns a string setting from config.ini."""
+    return load_config().get(section, key, fallback=fallback)
+
+
+def get_int_setting(section, key, fallback):
+    """Returns an integer setting from config.ini."""
+    return load_config().getint(section, key, fallback=fallback)
+
+
+def get_float_setting(section, key, fallback):
+    """Returns a float setting from config.ini."""
+    return load_config().getfloat(section, key, fallback=fallback)
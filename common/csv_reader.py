@@ -0,0 +1,260 @@
+import codecs
+
+import pandas as pd
+
+from common.config import get_float_setting, get_int_setting, get_setting
+from common.schemas import resolve_columns, resolve_dtypes
+from common.sources import ZipMember, open_source, source_size
+
+# ===============================
+# Encoding Detection
+# ===============================
+# Bytes read from the start and from the end of the file when sniffing. A
+# ZIP member or a stream that cannot seek is only sampled at the start:
+# reaching its end would mean decompressing (or reading) it all before the
+# parse does it again. A byte past the sample that is not UTF-8 is still
+# caught, by the strict decode in read_csv_once.
+SAMPLE_SIZE = 1024 * 1024
+
+# Used when the sample is not valid UTF-8, or when a byte outside the sample
+# turns out not to be. Latin-1 maps every byte, so the old "try Latin-1, then
+# Windows-1252" chain never reached Windows-1252.
+FALLBACK_ENCODING = 'latin-1'
+
+
+def _is_utf8(sample, at_start):
+    """Checks whether a byte sample decodes as UTF-8, ignoring cut-off characters at its edges."""
+    if not at_start:
+        # A tail sample can start in the middle of a multi-byte character
+        skip = 0
+        while skip < 3 and skip < len(sample) and 0x80 <= sample[skip] <= 0xBF:
+            skip += 1
+        sample = sample[skip:]
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    try:
+        decoder.decode(sample, final=False)
+        return True
+    except UnicodeDecodeError:
+        return False
+
+
+def sniff_encoding(source, sample_size=SAMPLE_SIZE):
+    """Detects the file encoding from a byte sample taken at the start and, if cheap to reach, the end of the file."""
+    file_size = source_size(source)
+    with open_source(source) as f:
+        head = f.read(sample_size)
+        if head.startswith(codecs.BOM_UTF8):
+            return 'utf-8-sig'
+        samples = [(head, True)]
+        if file_size > sample_size and not isinstance(source, ZipMember) and f.seekable():
+            f.seek(max(sample_size, file_size - sample_size))
+            samples.append((f.read(), False))
+
+    for sample, at_start in samples:
+        if not _is_utf8(sample, at_start):
+            return FALLBACK_ENCODING
+    return 'utf-8'
+
+
+# ===============================
+# CSV Reading
+# ===============================
+# Defaults for the [ingestion] section of config.ini
+DEFAULT_ENGINE = 'c'
+DEFAULT_STREAMING_THRESHOLD_MB = 200
+DEFAULT_CHUNK_ROWS = 100000
+
+# read_csv options the pyarrow engine does not support; reads that need them
+# use the C engine. low_memory only tunes the C parser and is dropped instead.
+C_ENGINE_ONLY_OPTIONS = ('chunksize', 'nrows')
+
+
+def get_csv_engine():
+    """Returns the configured CSV engine, falling back to 'c' when pyarrow is not installed."""
+    engine = get_setting('ingestion', 'engine', DEFAULT_ENGINE).strip().lower()
+    if engine != 'pyarrow':
+        return 'c'
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        print("pyarrow is not installed, using the default CSV engine")
+        return 'c'
+    return 'pyarrow'
+
+
+def _arrow_string_dtype():
+    """Arrow-backed string dtype that still uses NaN for missing values.
+
+    openpyxl cannot write pd.NA, so the NaN variant keeps the existing
+    Excel writers working unchanged.
+    """
+    try:
+        return pd.StringDtype('pyarrow', na_value=float('nan'))
+    except (TypeError, ValueError, ImportError):
+        pass
+    try:
+        return pd.StringDtype('pyarrow_numpy')
+    except (TypeError, ValueError, ImportError):
+        return str
+
+
+def _read_csv_arrow(source, encoding, read_csv_kwargs):
+    """Parses a CSV with the multithreaded pyarrow engine and Arrow-backed text columns."""
+    dtype = read_csv_kwargs.get('dtype')
+    if dtype is str:
+        read_csv_kwargs['dtype'] = _arrow_string_dtype()
+    elif isinstance(dtype, dict):
+        arrow_string = _arrow_string_dtype()
+        read_csv_kwargs['dtype'] = {col: arrow_string if value is str else value for col, value in dtype.items()}
+    read_csv_kwargs.pop('encoding_errors', None)
+    return pd.read_csv(source, encoding=encoding, engine='pyarrow', **read_csv_kwargs)
+
+
+def _has_undecoded_bytes(df):
+    """Checks whether any text column of a pyarrow read holds raw bytes instead of strings."""
+    for col in df.columns:
+        series = df[col]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            values = series.cat.categories
+        elif series.dtype == object:
+            values = series.dropna()
+        else:
+            continue
+        if any(isinstance(value, bytes) for value in values):
+            return True
+    return False
+
+
+def read_csv_once(source, encoding=None, **read_csv_kwargs):
+    """Reads a CSV with a single parse, using an encoding sniffed up front instead of retrying on errors.
+
+    source is a path, a ZipMember or an open binary file (see common/sources.py).
+    Chunked reads of a ZipMember need the member opened by the caller, since
+    the returned reader outlives this call.
+    """
+    if encoding is None:
+        encoding = sniff_encoding(source)
+    if isinstance(source, ZipMember):
+        with open_source(source) as f:
+            return read_csv_once(f, encoding=encoding, **read_csv_kwargs)
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    print(f"Detected encoding: {encoding}")
+
+    engine = read_csv_kwargs.pop('engine', None) or get_csv_engine()
+    if engine == 'pyarrow' and not any(option in read_csv_kwargs for option in C_ENGINE_ONLY_OPTIONS):
+        arrow_kwargs = dict(read_csv_kwargs)
+        arrow_kwargs.pop('low_memory', None)
+        # A byte the sample missed that is not UTF-8 makes pyarrow either stop
+        # (string columns) or pass the column through as raw bytes (columns
+        # without a string dtype). Either way the file is read again as
+        # Latin-1, the only case where it is parsed a second time.
+        try:
+            df = _read_csv_arrow(source, encoding, arrow_kwargs)
+            if encoding == FALLBACK_ENCODING or not _has_undecoded_bytes(df):
+                return df
+        except UnicodeDecodeError:
+            if encoding == FALLBACK_ENCODING:
+                raise
+        print(f"pyarrow engine hit an undecodable byte, re-reading as {FALLBACK_ENCODING}...")
+        if hasattr(source, 'seek'):
+            source.seek(0)
+        return _read_csv_arrow(source, FALLBACK_ENCODING, arrow_kwargs)
+
+    # Decoding is strict, so customer text is never silently replaced. A byte
+    # outside the sampled regions that is not UTF-8 means the file is read
+    # again as Latin-1; this is the only case where it is parsed twice.
+    try:
+        return pd.read_csv(source, encoding=encoding, **read_csv_kwargs)
+    except UnicodeDecodeError:
+        if encoding == FALLBACK_ENCODING:
+            raise
+        print(f"Undecodable byte outside the sampled part of the file, re-reading as {FALLBACK_ENCODING}...")
+        if hasattr(source, 'seek'):
+            source.seek(0)
+        return pd.read_csv(source, encoding=FALLBACK_ENCODING, **read_csv_kwargs)
+
+
+def categorize_columns(df, schema):
+    """Converts the columns a schema reads as 'category' from the text they were parsed as."""
+    for col, dtype in resolve_dtypes(df.columns, schema).items():
+        if dtype == 'category':
+            df[col] = df[col].astype('category')
+    return df
+
+
+def read_schema_csv(source, schema, **read_csv_kwargs):
+    """Reads only the columns a pipeline schema needs, with their dtypes pinned.
+
+    'category' columns are parsed as text and converted afterwards: the C
+    parser's categorical converter does not go through the decoding error
+    handling, and pyarrow leaves undecodable categories as bytes. A chunked
+    read returns the reader; categorize_columns converts each chunk.
+    """
+    encoding = read_csv_kwargs.pop('encoding', None) or sniff_encoding(source)
+    with open_source(source) as f:
+        header = pd.read_csv(f, encoding=encoding, encoding_errors='replace', nrows=0).columns
+    usecols = resolve_columns(header, schema)
+    print(f"Reading {len(usecols)} of {len(header)} columns")
+    dtypes = {col: str if dtype == 'category' else dtype for col, dtype in resolve_dtypes(header, schema).items()}
+    df = read_csv_once(source, encoding=encoding, usecols=usecols, dtype=dtypes, **read_csv_kwargs)
+    if 'chunksize' in read_csv_kwargs:
+        return df
+    return categorize_columns(df, schema)
+
+
+def concat_frames(frames, **concat_kwargs):
+    """Concatenates frames read separately, keeping their categorical columns categorical."""
+    df = pd.concat(frames, **concat_kwargs)
+    # Frames with different category sets concatenate to plain strings; re-encode them
+    for col in frames[0].columns:
+        if isinstance(frames[0][col].dtype, pd.CategoricalDtype) and col in df.columns:
+            df[col] = df[col].astype('category')
+    return df
+
+
+def should_stream(source):
+    """Checks whether a file is over the configured streaming threshold."""
+    threshold_mb = get_float_setting('ingestion', 'streaming_threshold_mb', DEFAULT_STREAMING_THRESHOLD_MB)
+    return source_size(source) >= threshold_mb * 1024 * 1024
+
+
+def _stream_chunks(source, schema, prepare_rows, chunk_rows, read_csv_kwargs):
+    """Reads a CSV chunk by chunk, returning the rows prepare_rows kept from each and the rows read."""
+    kept_chunks = []
+    rows_read = 0
+    with open_source(source) as f:
+        with read_schema_csv(f, schema, chunksize=chunk_rows, **read_csv_kwargs) as reader:
+            for chunk in reader:
+                rows_read += len(chunk)
+                kept_chunks.append(prepare_rows(categorize_columns(chunk, schema)))
+    return kept_chunks, rows_read
+
+
+def read_schema_csv_filtered(source, schema, prepare_rows, **read_csv_kwargs):
+    """Reads a CSV through prepare_rows, streaming it in chunks when the file is large.
+
+    prepare_rows takes a DataFrame and returns the rows to keep. When streaming,
+    it is applied to each chunk as it is read, so only the surviving rows are
+    held in memory.
+    """
+    if not should_stream(source):
+        return prepare_rows(read_schema_csv(source, schema, **read_csv_kwargs))
+
+    chunk_rows = get_int_setting('ingestion', 'chunk_rows', DEFAULT_CHUNK_ROWS)
+    print(f"Large file detected, streaming in chunks of {chunk_rows} rows...")
+    read_csv_kwargs.setdefault('encoding', sniff_encoding(source))
+    try:
+        kept_chunks, rows_read = _stream_chunks(source, schema, prepare_rows, chunk_rows, read_csv_kwargs)
+    except UnicodeDecodeError:
+        # As in read_csv_once: a byte the sample missed is not UTF-8
+        if read_csv_kwargs['encoding'] == FALLBACK_ENCODING:
+            raise
+        print(f"Undecodable byte outside the sampled part of the file, re-reading as {FALLBACK_ENCODING}...")
+        read_csv_kwargs['encoding'] = FALLBACK_ENCODING
+        kept_chunks, rows_read = _stream_chunks(source, schema, prepare_rows, chunk_rows, read_csv_kwargs)
+    if not kept_chunks:
+        return prepare_rows(read_schema_csv(source, schema, nrows=0, **read_csv_kwargs))
+    df = concat_frames(kept_chunks)
+    print(f"Streamed {rows_read} rows, kept {len(df)}")
+    return df
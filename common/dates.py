@@ -0,0 +1,145 @@
+import json
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+from common.cache import get_cache_dir
+
+# ===============================
+# Date Parsing
+# ===============================
+# Formats seen in the Atomberg 'Created Date' column
+ATOMBERG_DATE_FORMATS = [
+    "%d-%m-%Y", "%Y-%m-%d", "%d/%m/%Y", "%m/%d/%Y",
+    "%d-%b-%Y", "%Y/%m/%d", "%d.%m.%Y", "%b %d %Y"
+]
+
+# Formats seen in the Orient 'REGISTRATION DATE' column, most specific first
+ORIENT_DATETIME_FORMATS = [
+    "%d-%m-%Y %H:%M:%S", "%d-%m-%Y %H:%M", "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%d %H:%M", "%d/%m/%Y %H:%M:%S", "%d/%m/%Y %H:%M",
+    "%m/%d/%Y %H:%M:%S", "%m/%d/%Y %H:%M", "%d-%b-%Y %H:%M:%S",
+    "%d-%b-%Y %H:%M", "%Y/%m/%d %H:%M:%S", "%Y/%m/%d %H:%M",
+    "%d.%m.%Y %H:%M:%S", "%d.%m.%Y %H:%M",
+    "%d-%m-%Y", "%Y-%m-%d", "%d/%m/%Y", "%m/%d/%Y",
+    "%d-%b-%Y", "%Y/%m/%d", "%d.%m.%Y"
+]
+
+
+# Regex fragments for the directives used above; each accepts at least what
+# strptime does, so the shape check never rejects a row a format would parse.
+FORMAT_DIRECTIVE_PATTERNS = {
+    '%d': r'\d{1,2}', '%m': r'\d{1,2}', '%Y': r'\d{4}',
+    '%H': r'\d{1,2}', '%M': r'\d{1,2}', '%S': r'\d{1,2}', '%b': r'[A-Za-z]+',
+}
+
+
+def _format_shape(date_format):
+    """Builds a regex matching the shape of strings a date format can parse."""
+    parts = re.split(r'(%[a-zA-Z])', date_format)
+    pattern = ''
+    for part in parts:
+        if part in FORMAT_DIRECTIVE_PATTERNS:
+            pattern += FORMAT_DIRECTIVE_PATTERNS[part]
+        elif part.startswith('%'):
+            return None  # unknown directive, skip the shape check
+        else:
+            pattern += r'\s+'.join(re.escape(piece) for piece in part.split(' '))
+    return pattern
+
+
+def parse_dates_cascade(values, date_formats, format_counts=None):
+    """Parses each row with the first format that fits it; blank or unparseable rows become NaT.
+
+    Every format is tried on the whole column at once, but only on the rows
+    that no earlier format could parse, so mixed-format columns still take
+    about one pass. If format_counts is given, the number of rows each format
+    parsed is added to it.
+    """
+    text = values.astype(object).where(values.notna()).str.strip()
+    text = text.where(text != '').to_numpy(dtype=object)
+    result = np.full(len(text), np.datetime64('NaT'), dtype='datetime64[ns]')
+    remaining = pd.notna(text)
+    for date_format in date_formats:
+        if not remaining.any():
+            break
+        candidates = np.flatnonzero(remaining)
+        # A cheap regex check first, so strptime only runs on rows shaped like the format
+        shape = _format_shape(date_format)
+        if shape is not None:
+            candidates = candidates[pd.Series(text[candidates]).str.fullmatch(shape).to_numpy(dtype=bool)]
+            if not len(candidates):
+                continue
+        try:
+            attempt = pd.to_datetime(pd.Series(text[candidates]), format=date_format, errors='coerce')
+        except ValueError:
+            continue
+        matched = attempt.notna().to_numpy()
+        rows = candidates[matched]
+        result[rows] = attempt.to_numpy(dtype='datetime64[ns]')[matched]
+        remaining[rows] = False
+        if format_counts is not None:
+            format_counts[date_format] = format_counts.get(date_format, 0) + len(rows)
+    return pd.Series(result, index=values.index)
+
+
+# ===============================
+# Format Order Memory
+# ===============================
+# The number of rows each format parsed is remembered per export source, so
+# the next run tries that source's dominant format first and the cascade
+# settles after one format for most rows. Only formats that cannot read the
+# same string are reordered: formats that differ just in the order of day
+# and month move as one group in their listed order, so a day/month-ambiguous
+# value such as 03/04/2025 always parses as %d/%m/%Y, whatever ran before.
+FORMAT_ORDER_FILE = 'date_formats.json'
+
+# Both Atomberg pipelines read the same portal export
+ATOMBERG_DATE_SOURCE = 'atomberg_created_date'
+
+
+def _format_order_path():
+    return os.path.join(get_cache_dir(), FORMAT_ORDER_FILE)
+
+
+def _load_format_stats():
+    try:
+        with open(_format_order_path(), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _day_month_group(date_format):
+    """Returns the same key for formats that differ only in the order of %d and %m."""
+    return date_format.replace('%m', '%d')
+
+
+def load_format_order(source, date_formats):
+    """Returns date_formats with the formats that parsed most rows in the source's last run first.
+
+    Formats that differ only in day/month order keep their listed order
+    among themselves and are ranked by the rows they parsed together.
+    """
+    counts = _load_format_stats().get(source, {})
+    groups = {}
+    for date_format in date_formats:
+        groups.setdefault(_day_month_group(date_format), []).append(date_format)
+    # sorted() is stable, so unseen formats keep their listed order
+    ordered = sorted(groups.values(), key=lambda group: -sum(counts.get(date_format, 0) for date_format in group))
+    return [date_format for group in ordered for date_format in group]
+
+
+def save_format_order(source, format_counts):
+    """Stores the rows parsed per format for an export source."""
+    if not format_counts:
+        return
+    stats = _load_format_stats()
+    stats[source] = format_counts
+    try:
+        with open(_format_order_path(), 'w', encoding='utf-8') as f:
+            json.dump(stats, f, indent=2)
+    except OSError as e:
+        print(f"Warning: Could not save date format order: {str(e)}")
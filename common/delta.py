@@ -0,0 +1,138 @@
+import os
+import sqlite3
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from common.config import ROOT_DIR, get_setting
+from common.keys import normalize_keys
+
+# ===============================
+# Delta Processing State
+# ===============================
+# Each daily export is mostly the same open cases as the day before. With
+# [delta] enabled, every processed case is recorded in a small SQLite store
+# (next to electrolyte_crm.db) under its case key with a hash of the content
+# of all its rows; Atomberg exports repeat a Case Number once per line item.
+# Later runs still write the full report, with each case labelled new,
+# changed or unchanged since the last run in a Delta Status column. Open
+# cases missing from the new export are marked closed in the store and
+# listed in the report with the day they were last seen.
+#
+# The state is saved only after the output file was written, so a failed run
+# never hides changes from the next one.
+DEFAULT_STATE_DB = os.path.join(ROOT_DIR, 'processing_state.db')
+DELTA_STATUS_COLUMN = 'Delta Status'
+
+
+def delta_enabled():
+    """Checks whether delta processing is switched on in config.ini."""
+    return get_setting('delta', 'enabled', 'false').strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def get_state_db_path():
+    """Returns the path of the delta state database."""
+    return get_setting('delta', 'state_db', '').strip() or DEFAULT_STATE_DB
+
+
+def _connect():
+    conn = sqlite3.connect(get_state_db_path())
+    conn.execute('''CREATE TABLE IF NOT EXISTS processed_rows (
+        pipeline TEXT NOT NULL,
+        row_key TEXT NOT NULL,
+        row_hash TEXT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'open' CHECK(status IN ('open', 'closed')),
+        first_seen TEXT NOT NULL,
+        last_seen TEXT NOT NULL,
+        closed_at TEXT,
+        PRIMARY KEY (pipeline, row_key)
+    );''')
+    return conn
+
+
+def case_hashes(df, keys, columns=None):
+    """Returns, for each row, a content hash of all the rows sharing its key, computed vectorized.
+
+    The row hashes of a case are summed (wrapping), so the hash does not
+    depend on the order the case's rows come in.
+    """
+    columns = list(df.columns) if columns is None else columns
+    hashes = pd.util.hash_pandas_object(df[columns], index=False)
+    return hashes.groupby(keys.to_numpy()).transform('sum').map('{:016x}'.format)
+
+
+def find_delta(pipeline, df, key_column, hash_columns=None):
+    """Compares an export with the stored state and labels each row 'new', 'changed' or 'unchanged'.
+
+    All rows of a case get the label of the case. Returns a dict holding the
+    per-row keys, case hashes and labels plus the keys of open cases that are
+    missing from this export (now closed) and when each was last seen.
+    """
+    keys = normalize_keys(df[key_column])
+    hashes = case_hashes(df, keys, hash_columns)
+
+    conn = _connect()
+    try:
+        previous = pd.read_sql_query(
+            'SELECT row_key, row_hash, status, last_seen FROM processed_rows WHERE pipeline = ?',
+            conn, params=(pipeline,)
+        )
+    finally:
+        conn.close()
+
+    previous = previous.set_index('row_key')
+    previous_hash = keys.map(previous['row_hash'])
+    previous_status = keys.map(previous['status'])
+    # A closed case that shows up again is treated as new
+    is_new = previous_hash.isna() | (previous_status == 'closed')
+    change = pd.Series(
+        np.select([is_new, previous_hash != hashes], ['new', 'changed'], 'unchanged'),
+        index=df.index
+    )
+    open_cases = previous[previous['status'] == 'open']
+    closed = open_cases[~open_cases.index.isin(keys)]
+    closed_keys = closed.index.tolist()
+
+    counts = change.value_counts()
+    print(f"Delta against last run: {counts.get('new', 0)} new, {counts.get('changed', 0)} changed, "
+          f"{counts.get('unchanged', 0)} unchanged, {len(closed_keys)} closed")
+    return {
+        'pipeline': pipeline,
+        'keys': keys,
+        'hashes': hashes,
+        'change': change,
+        'closed_keys': closed_keys,
+        'closed_last_seen': closed['last_seen'].tolist(),
+    }
+
+
+def closed_cases(delta, key_label):
+    """Returns the cases closed since the last run as a frame of their keys and when they were last seen."""
+    return pd.DataFrame({key_label: delta['closed_keys'], 'Last Seen': delta['closed_last_seen']}, dtype=object)
+
+
+def save_delta_state(delta):
+    """Records this run's cases as open and marks the missing cases closed."""
+    now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    cases = pd.DataFrame({'key': delta['keys'].to_numpy(), 'hash': delta['hashes'].to_numpy()})
+    rows = [
+        (delta['pipeline'], key, case_hash, now, now)
+        for key, case_hash in cases.drop_duplicates('key').itertuples(index=False, name=None)
+    ]
+    conn = _connect()
+    try:
+        conn.executemany('''INSERT INTO processed_rows (pipeline, row_key, row_hash, status, first_seen, last_seen)
+                            VALUES (?, ?, ?, 'open', ?, ?)
+                            ON CONFLICT(pipeline, row_key) DO UPDATE SET
+                                row_hash = excluded.row_hash,
+                                status = 'open',
+                                last_seen = excluded.last_seen,
+                                closed_at = NULL''', rows)
+        conn.executemany('''UPDATE processed_rows SET status = 'closed', closed_at = ?
+                            WHERE pipeline = ? AND row_key = ?''',
+                         [(now, delta['pipeline'], key) for key in delta['closed_keys']])
+        conn.commit()
+    finally:
+        conn.close()
+    print(f"Saved delta state for {len(rows)} cases ({len(delta['closed_keys'])} closed)")
@@ -0,0 +1,60 @@
+import os
+import shutil
+import tempfile
+
+import win32com.client as win32
+
+# ===============================
+# Excel COM Layout Engine
+# ===============================
+# The optional 'com' layout engine (see common.layout), for Windows machines
+# with Excel and pywin32. It is imported only when that engine is configured.
+
+
+def clear_com_cache():
+    """Clears win32com cache to fix COM errors."""
+    try:
+        gen_py_path = os.path.join(tempfile.gettempdir(), 'gen_py')
+        if os.path.exists(gen_py_path):
+            print("Clearing win32com cache...")
+            shutil.rmtree(gen_py_path, ignore_errors=True)
+            print("Cache cleared successfully")
+    except Exception as e:
+        print(f"Warning: Could not clear COM cache: {str(e)}")
+
+
+def autofit_rows(file_path, sheet_names):
+    """Opens a saved workbook in Excel, autofits the rows of the given sheets and saves it once."""
+    excel = None
+    wb = None
+    try:
+        print("Auto-fitting rows using Excel COM...")
+        clear_com_cache()
+        try:
+            excel = win32.Dispatch('Excel.Application')
+        except Exception:
+            clear_com_cache()
+            excel = win32.gencache.EnsureDispatch('Excel.Application')
+        excel.Visible = False
+        excel.DisplayAlerts = False
+
+        wb = excel.Workbooks.Open(os.path.abspath(file_path))
+        for sheet_name in sheet_names:
+            # Rows only, the column widths are kept
+            wb.Sheets(sheet_name).Rows.AutoFit()
+        wb.Save()
+        wb.Close()
+        wb = None
+        print("Successfully auto-fitted rows with text wrapping preserved")
+        return True
+    except Exception as e:
+        print(f"Error during auto-fit: {str(e)}")
+        return False
+    finally:
+        try:
+            if wb is not None:
+                wb.Close(SaveChanges=False)
+            if excel:
+                excel.Quit()
+        except Exception:
+            pass
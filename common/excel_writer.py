@@ -0,0 +1,432 @@
+import os
+import re
+import shutil
+import zipfile
+from collections import namedtuple
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.formatting.rule import CellIsRule, FormulaRule
+from openpyxl.styles import Alignment, Border, Font, NamedStyle, PatternFill, Side
+from openpyxl.utils import column_index_from_string, get_column_letter
+from openpyxl.writer.excel import ExcelWriter
+
+from common.config import get_setting
+
+# ===============================
+# Streaming Styled Sheet Writer
+# ===============================
+# Sheets are written through openpyxl's write-only mode: each row is
+# serialized as soon as it is appended, already carrying a named style, so
+# there is no in-memory sheet and no second pass over the cells to style them.
+# Named styles are stored once in the workbook and shared by every cell.
+#
+# Reports describe their styles as plain dicts, so the same report can also be
+# written by the XlsxWriter backend ([<company>] excel_backend in config.ini):
+#   {'font': {'bold': True, 'color': 'FFFFFF', 'size': 12, 'name': 'Calibri'},
+#    'fill': '4CAF50', 'border': True,
+#    'alignment': {'horizontal': 'center', 'vertical': 'center', 'wrap_text': True}}
+EXCEL_BACKENDS = ('openpyxl', 'xlsxwriter')
+
+CENTER_WRAP = {'horizontal': 'center', 'vertical': 'center', 'wrap_text': True}
+
+ATOMBERG_HEADER = 'Atomberg Header'
+# Banded and plain rows alternate starting with the first data row
+ATOMBERG_DATA_STYLES = ['Atomberg Banded', 'Atomberg Data']
+ATOMBERG_STYLES = {
+    ATOMBERG_HEADER: {'font': {'bold': True, 'color': 'FFFFFF', 'size': 12}, 'fill': '4CAF50',
+                      'border': True, 'alignment': CENTER_WRAP},
+    'Atomberg Banded': {'font': {'size': 11}, 'fill': 'F5F5F5', 'border': True, 'alignment': CENTER_WRAP},
+    'Atomberg Data': {'font': {'size': 11}, 'border': True, 'alignment': CENTER_WRAP},
+    'Atomberg Total': {'font': {'bold': True, 'size': 11}, 'border': True, 'alignment': CENTER_WRAP},
+}
+
+# A sheet of a report. Only name is required; a sheet without df is left empty.
+# conditional_formats is a list of (column letter, rule) applied to the data
+# rows, where a rule is {'operator': 'equal', 'value': '0', 'fill': '00FF00'}
+# or {'formula': '$G2="IN TAT"', 'fill': '90EE90'}. preamble rows are written
+# unstyled above the header, and total_style styles the last data row.
+# filters is a list of (column name, shown values) written as autofilter
+# criteria, with the other rows hidden as Excel would hide them. row_heights
+# gives each data row its own height in place of row_height.
+SheetSpec = namedtuple('SheetSpec', [
+    'name', 'df', 'header_style', 'data_styles', 'column_widths', 'header_height', 'row_height',
+    'column_formulas', 'column_formats', 'hidden_columns', 'freeze_panes', 'autofilter',
+    'conditional_formats', 'preamble', 'total_style', 'filters', 'row_heights',
+], defaults=[None, None, None, None, None, None, None, None, (), None, True, (), (), None, (), None])
+
+
+def get_excel_backend(company):
+    """Returns the configured Excel writer for a company, falling back to openpyxl."""
+    backend = get_setting(company, 'excel_backend', 'openpyxl').strip().lower() or 'openpyxl'
+    if backend not in EXCEL_BACKENDS:
+        print(f"Unknown excel_backend '{backend}', using openpyxl")
+        return 'openpyxl'
+    if backend == 'xlsxwriter':
+        try:
+            import xlsxwriter  # noqa: F401
+        except ImportError:
+            print("xlsxwriter is not installed, using openpyxl")
+            return 'openpyxl'
+    return backend
+
+
+def thin_border():
+    """Returns the thin black border used around every report cell."""
+    return Border(left=Side(style='thin'), right=Side(style='thin'),
+                  top=Side(style='thin'), bottom=Side(style='thin'))
+
+
+def _named_style(name, spec):
+    style = NamedStyle(name=name, font=Font(**spec.get('font', {})))
+    if spec.get('fill'):
+        style.fill = PatternFill(start_color=spec['fill'], end_color=spec['fill'], fill_type="solid")
+    if spec.get('border'):
+        style.border = thin_border()
+    if spec.get('alignment'):
+        style.alignment = Alignment(**spec['alignment'])
+    if spec.get('number_format'):
+        style.number_format = spec['number_format']
+    return style
+
+
+def add_named_styles(workbook, styles):
+    """Registers each style spec in the workbook as a named style."""
+    for name, spec in styles.items():
+        workbook.add_named_style(_named_style(name, spec))
+
+
+def filtered_out_rows(df, filters):
+    """Returns a boolean array of the rows the autofilter criteria hide, or None without criteria."""
+    shown = None
+    for name, values in filters:
+        matches = df[name].astype(str).isin([str(value) for value in values])
+        shown = matches if shown is None else shown & matches
+    return None if shown is None else ~shown.to_numpy()
+
+
+def _append_row(worksheet, cells, row_idx, height, hidden=False):
+    # Row heights are read when the row is serialized, then dropped so the
+    # dimension table does not grow with the sheet
+    if height is not None or hidden:
+        dimension = worksheet.row_dimensions[row_idx]
+        dimension.height = height
+        dimension.hidden = hidden
+    worksheet.append(cells)
+    if height is not None or hidden:
+        del worksheet.row_dimensions[row_idx]
+
+
+def _styled_cell(worksheet, style, number_format=None):
+    cell = WriteOnlyCell(worksheet)
+    cell.style = style
+    if number_format is not None:
+        cell.number_format = number_format
+    return cell
+
+
+def write_styled_sheet(worksheet, df, header_style, data_styles, column_widths=None,
+                       header_height=None, row_height=None, column_formulas=None,
+                       column_formats=None, hidden_columns=(), freeze_panes=None, autofilter=True,
+                       preamble=(), total_style=None, filters=(), row_heights=None):
+    """Streams a DataFrame into a write-only worksheet, each cell written already styled.
+
+    data_styles are applied to the data rows in turn (e.g. banded and plain);
+    each is a style name, or a list with one style name per column.
+    column_widths maps column letters to widths and column_formats maps column
+    names to number formats. column_formulas maps a column name to a formula
+    template with a {row} placeholder, written instead of that column's values.
+    Values are written as they are, so convert them per column beforehand.
+    preamble rows go above the header and total_style styles the last data row.
+    filters and row_heights are as for SheetSpec. Returns the last row written.
+    """
+    # Column widths and frozen panes go in the sheet header, so they are set
+    # before the first row is appended
+    for col_letter, width in (column_widths or {}).items():
+        worksheet.column_dimensions[col_letter].width = width
+    for col_letter in hidden_columns:
+        worksheet.column_dimensions[col_letter].hidden = True
+    if freeze_panes:
+        worksheet.freeze_panes = freeze_panes
+
+    for preamble_row in preamble:
+        worksheet.append(list(preamble_row))
+    header_row = len(preamble) + 1
+
+    columns = list(df.columns)
+    header_cells = [_styled_cell(worksheet, header_style) for _ in columns]
+    for cell, name in zip(header_cells, columns):
+        cell.value = name
+    _append_row(worksheet, header_cells, header_row, header_height)
+
+    # One reusable cell per column and style: a row is fully serialized by
+    # append(), so the same cells can carry the next row's values
+    column_formats = column_formats or {}
+    style_cells = []
+    for style in list(data_styles) + ([total_style] if total_style else []):
+        styles = style if isinstance(style, (list, tuple)) else [style] * len(columns)
+        style_cells.append([
+            _styled_cell(worksheet, cell_style, column_formats.get(name))
+            for name, cell_style in zip(columns, styles)
+        ])
+    total_cells = style_cells.pop() if total_style else None
+    formulas = [(columns.index(name), template) for name, template in (column_formulas or {}).items()]
+    hidden_rows = filtered_out_rows(df, filters)
+    last_row = header_row + len(df)
+    row_idx = header_row
+    for row_idx, values in enumerate(df.itertuples(index=False, name=None), header_row + 1):
+        position = row_idx - header_row - 1
+        if total_cells and row_idx == last_row:
+            cells = total_cells
+        else:
+            cells = style_cells[position % len(style_cells)]
+        for cell, value in zip(cells, values):
+            cell.value = value
+        for col_idx, template in formulas:
+            cells[col_idx].value = template.format(row=row_idx)
+        _append_row(worksheet, cells, row_idx,
+                    row_height if row_heights is None else row_heights[position],
+                    hidden_rows is not None and hidden_rows[position])
+
+    if autofilter:
+        worksheet.auto_filter.ref = f"A{header_row}:{get_column_letter(max(len(columns), 1))}{row_idx}"
+        for name, values in filters:
+            worksheet.auto_filter.add_filter_column(columns.index(name), [str(value) for value in values])
+    return row_idx
+
+
+def _openpyxl_rule(rule):
+    fill = PatternFill(start_color=rule['fill'], end_color=rule['fill'], fill_type="solid")
+    if 'formula' in rule:
+        return FormulaRule(formula=[rule['formula']], fill=fill)
+    return CellIsRule(operator=rule['operator'], formula=[rule['value']], fill=fill)
+
+
+def _write_openpyxl(output_path, sheets, styles, edit_package=None):
+    workbook = Workbook(write_only=True)
+    add_named_styles(workbook, styles)
+    for sheet in sheets:
+        worksheet = workbook.create_sheet(sheet.name)
+        if sheet.df is None:
+            continue
+        last_row = write_styled_sheet(
+            worksheet, sheet.df, sheet.header_style, sheet.data_styles,
+            column_widths=sheet.column_widths, header_height=sheet.header_height,
+            row_height=sheet.row_height, column_formulas=sheet.column_formulas,
+            column_formats=sheet.column_formats, hidden_columns=sheet.hidden_columns,
+            freeze_panes=sheet.freeze_panes, autofilter=sheet.autofilter,
+            preamble=sheet.preamble, total_style=sheet.total_style,
+            filters=sheet.filters, row_heights=sheet.row_heights
+        )
+        first_row = len(sheet.preamble) + 2
+        if last_row < first_row:
+            continue
+        for col_letter, rule in sheet.conditional_formats:
+            worksheet.conditional_formatting.add(f"{col_letter}{first_row}:{col_letter}{last_row}",
+                                                 _openpyxl_rule(rule))
+    if edit_package is None:
+        workbook.save(output_path)
+    else:
+        ExcelWriter(workbook, _EditedPackage(output_path, edit_package)).save()
+
+
+# ===============================
+# XlsxWriter Backend
+# ===============================
+# XlsxWriter in constant-memory mode flushes each row to a temporary file as
+# soon as the next one starts, so memory stays flat however long the sheet.
+# Rows must be written strictly in order, which the report layout already is.
+XLSXWRITER_OPERATORS = {
+    'equal': 'equal to',
+    'notEqual': 'not equal to',
+    'greaterThan': 'greater than',
+    'greaterThanOrEqual': 'greater than or equal to',
+    'lessThan': 'less than',
+    'lessThanOrEqual': 'less than or equal to',
+}
+
+
+def _xlsxwriter_properties(spec, number_format=None):
+    properties = {}
+    font = spec.get('font', {})
+    if 'name' in font:
+        properties['font_name'] = font['name']
+    if 'size' in font:
+        properties['font_size'] = font['size']
+    if font.get('bold'):
+        properties['bold'] = True
+    if 'color' in font:
+        properties['font_color'] = '#' + font['color']
+    if spec.get('fill'):
+        properties['pattern'] = 1
+        properties['bg_color'] = '#' + spec['fill']
+    if spec.get('border'):
+        properties['border'] = 1
+    alignment = spec.get('alignment', {})
+    if 'horizontal' in alignment:
+        properties['align'] = alignment['horizontal']
+    if 'vertical' in alignment:
+        properties['valign'] = 'vcenter' if alignment['vertical'] == 'center' else alignment['vertical']
+    if alignment.get('wrap_text'):
+        properties['text_wrap'] = True
+    number_format = number_format or spec.get('number_format')
+    if number_format:
+        properties['num_format'] = number_format
+    return properties
+
+
+def _xlsxwriter_rule(workbook, rule):
+    options = {'format': workbook.add_format({'bg_color': '#' + rule['fill']})}
+    if 'formula' in rule:
+        options.update(type='formula', criteria='=' + rule['formula'])
+    else:
+        options.update(type='cell', criteria=XLSXWRITER_OPERATORS[rule['operator']], value=rule['value'])
+    return options
+
+
+def _write_xlsxwriter(output_path, sheets, styles):
+    import xlsxwriter
+
+    workbook = xlsxwriter.Workbook(output_path, {
+        'constant_memory': True, 'nan_inf_to_errors': True, 'strings_to_urls': False,
+    })
+    formats = {}
+
+    def cell_format(style, number_format=None):
+        if (style, number_format) not in formats:
+            formats[style, number_format] = workbook.add_format(
+                _xlsxwriter_properties(styles[style], number_format))
+        return formats[style, number_format]
+
+    for sheet in sheets:
+        worksheet = workbook.add_worksheet(sheet.name)
+        if sheet.df is None:
+            continue
+        columns = list(sheet.df.columns)
+        column_widths = sheet.column_widths or {}
+        for col_letter in sorted(set(column_widths) | set(sheet.hidden_columns), key=column_index_from_string):
+            col_idx = column_index_from_string(col_letter) - 1
+            worksheet.set_column(col_idx, col_idx, column_widths.get(col_letter), None,
+                                 {'hidden': col_letter in sheet.hidden_columns})
+        if sheet.freeze_panes:
+            worksheet.freeze_panes(sheet.freeze_panes)
+
+        for row, preamble_row in enumerate(sheet.preamble):
+            worksheet.write_row(row, 0, preamble_row)
+        header_row = len(sheet.preamble) + 1
+        if sheet.header_height is not None:
+            worksheet.set_row(header_row - 1, sheet.header_height)
+        worksheet.write_row(header_row - 1, 0, columns, cell_format(sheet.header_style))
+
+        column_formats = sheet.column_formats or {}
+        row_formats = []
+        for style in list(sheet.data_styles) + ([sheet.total_style] if sheet.total_style else []):
+            row_styles = style if isinstance(style, (list, tuple)) else [style] * len(columns)
+            row_formats.append([cell_format(row_style, column_formats.get(name))
+                                for name, row_style in zip(columns, row_styles)])
+        total_formats = row_formats.pop() if sheet.total_style else None
+        formulas = [(columns.index(name), template) for name, template in (sheet.column_formulas or {}).items()]
+        hidden_rows = filtered_out_rows(sheet.df, sheet.filters)
+        last_row = header_row + len(sheet.df)
+        row_idx = header_row
+        for row_idx, values in enumerate(sheet.df.itertuples(index=False, name=None), header_row + 1):
+            position = row_idx - header_row - 1
+            if total_formats and row_idx == last_row:
+                cell_formats = total_formats
+            else:
+                cell_formats = row_formats[position % len(row_formats)]
+            if formulas:
+                values = list(values)
+                for col_idx, template in formulas:
+                    values[col_idx] = template.format(row=row_idx)
+            height = sheet.row_height if sheet.row_heights is None else sheet.row_heights[position]
+            if hidden_rows is not None and hidden_rows[position]:
+                worksheet.set_row(row_idx - 1, height, None, {'hidden': True})
+            elif height is not None:
+                worksheet.set_row(row_idx - 1, height)
+            for col_idx, (value, cell_fmt) in enumerate(zip(values, cell_formats)):
+                worksheet.write(row_idx - 1, col_idx, value, cell_fmt)
+
+        if sheet.autofilter:
+            worksheet.autofilter(f"A{header_row}:{get_column_letter(max(len(columns), 1))}{row_idx}")
+            for name, values in sheet.filters:
+                worksheet.filter_column_list(columns.index(name), [str(value) for value in values])
+        if row_idx <= header_row:
+            continue
+        for col_letter, rule in sheet.conditional_formats:
+            worksheet.conditional_format(f"{col_letter}{header_row + 1}:{col_letter}{row_idx}",
+                                         _xlsxwriter_rule(workbook, rule))
+    workbook.close()
+
+
+# ===============================
+# Package Edits
+# ===============================
+# Parts neither backend can write (the PivotTables of common.pivots) are added
+# by an edit_package step, which gets the workbook, workbook relationships,
+# content types and worksheet relationships parts as XML text and returns the
+# parts to write in their place, new parts included. The openpyxl backend
+# holds those few small parts back while it writes the package and writes
+# them, edited, when the package is closed, so the report is still saved
+# once. XlsxWriter assembles its package itself, so with that backend the
+# edited parts are swapped into a copy of the saved file.
+EDITABLE_PARTS = re.compile(r'\[Content_Types\]\.xml|xl/workbook\.xml|xl/_rels/workbook\.xml\.rels'
+                            r'|xl/worksheets/_rels/[^/]+\.rels')
+
+
+class _EditedPackage(zipfile.ZipFile):
+    """A package being written whose editable parts go through edit_package when it is closed."""
+
+    def __init__(self, output_path, edit_package):
+        super().__init__(output_path, 'w', zipfile.ZIP_DEFLATED, allowZip64=True)
+        self._edit_package = edit_package
+        self._held_parts = {}
+
+    def writestr(self, zinfo_or_arcname, data, *args, **kwargs):
+        name = getattr(zinfo_or_arcname, 'filename', zinfo_or_arcname)
+        if self._edit_package is not None and EDITABLE_PARTS.fullmatch(name):
+            self._held_parts[name] = data.decode('utf-8') if isinstance(data, bytes) else data
+            return
+        super().writestr(zinfo_or_arcname, data, *args, **kwargs)
+
+    def close(self):
+        if self._edit_package is not None and self.fp is not None:
+            edit_package, self._edit_package = self._edit_package, None
+            for name, data in edit_package(self._held_parts).items():
+                super().writestr(name, data)
+        super().close()
+
+
+def _edit_saved_package(output_path, edit_package):
+    """Applies edit_package to a saved workbook, copying the other parts over unchanged."""
+    with zipfile.ZipFile(output_path) as package:
+        parts = edit_package({name: package.read(name).decode('utf-8')
+                              for name in package.namelist() if EDITABLE_PARTS.fullmatch(name)})
+
+    # Entries are streamed, so the sheet data is never held in memory as a whole
+    temp_path = output_path + '.tmp'
+    with zipfile.ZipFile(output_path) as package, zipfile.ZipFile(temp_path, 'w', zipfile.ZIP_DEFLATED) as updated:
+        for info in package.infolist():
+            if EDITABLE_PARTS.fullmatch(info.filename):
+                if info.filename in parts:
+                    updated.writestr(info, parts.pop(info.filename))
+                continue
+            with package.open(info) as source, updated.open(info, 'w') as target:
+                shutil.copyfileobj(source, target, 1024 * 1024)
+        for name, data in parts.items():
+            updated.writestr(name, data)
+    os.replace(temp_path, output_path)
+
+
+def write_report(output_path, sheets, styles, backend='openpyxl', edit_package=None):
+    """Writes the report sheets (SheetSpec) to output_path with the chosen backend.
+
+    styles maps the style names used by the sheets to their style specs.
+    edit_package adds parts to the package as it is written (see above).
+    """
+    if backend == 'xlsxwriter':
+        _write_xlsxwriter(output_path, sheets, styles)
+        if edit_package is not None:
+            _edit_saved_package(output_path, edit_package)
+    else:
+        _write_openpyxl(output_path, sheets, styles, edit_package)
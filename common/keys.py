@@ -0,0 +1,45 @@
+import pandas as pd
+
+# ===============================
+# Join Key Normalization
+# ===============================
+# Case Numbers, CALL IDs and PO numbers meet their lookup tables with one
+# side read from a CSV export and the other typed into an Excel tracker.
+# There they pick up a float suffix (12345.0), lose their leading zeros,
+# gain stray spaces or change case. Both sides of every join go through
+# normalize_keys so that these differences match instead of ending up as
+# "Not Found". Stored or cached keys must be rebuilt when this changes.
+KEY_NORMALIZATION_VERSION = 1
+MISMATCH_SAMPLE_SIZE = 10
+
+
+def normalize_keys(series):
+    """Returns join keys as upper-case text without whitespace; whole numbers lose a .0 suffix and leading zeros."""
+    keys = series.astype(object).where(series.notna(), '').astype(str)
+    keys = keys.str.replace(r'\s+', '', regex=True).str.upper()
+    keys = keys.str.replace(r'^(\d+)\.0*$', r'\1', regex=True)
+    return keys.str.replace(r'^0+(?=\d+$)', '', regex=True)
+
+
+def report_key_mismatches(raw_keys, keys, matched, label):
+    """Prints how many keys normalization changed, by kind, and a sample of the keys that found no match.
+
+    raw_keys are the values as read, keys their normalize_keys form and
+    matched a boolean array of the rows that found a match.
+    """
+    raw = raw_keys.astype(object).where(raw_keys.notna(), '').astype(str)
+    text = raw.str.replace(r'\s+', '', regex=True)
+    fixes = {
+        'whitespace': (text != raw).to_numpy(),
+        'case': (text != text.str.upper()).to_numpy(),
+        'float suffix': text.str.fullmatch(r'\d+\.0*').to_numpy(dtype=bool),
+        'leading zeros': text.str.match(r'0+\d').to_numpy(dtype=bool),
+    }
+    changed = [f"{int((fix & matched).sum())} {kind}" for kind, fix in fixes.items() if fix.any()]
+    if changed:
+        print(f"{label} keys normalized before matching: {', '.join(changed)} (matched rows)")
+
+    unmatched = pd.Series(raw.to_numpy()[~matched & (keys != '').to_numpy()]).drop_duplicates()
+    if len(unmatched):
+        sample = unmatched.head(MISMATCH_SAMPLE_SIZE).tolist()
+        print(f"{label} keys without a match: {len(unmatched)} distinct, e.g. {sample}")
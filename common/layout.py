@@ -0,0 +1,212 @@
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+from openpyxl.utils import get_column_letter
+
+from common.config import get_setting
+
+# ===============================
+# Sheet Layout Engines
+# ===============================
+# Sorting, autofilter criteria and row heights used to be applied by reopening
+# the saved report in Excel through COM, a full reload and save for each. The
+# 'python' engine (the default) works them out before the sheet is written:
+# rows are sorted in pandas, the filter criteria and the rows they hide are
+# written with the sheet, and row heights are estimated from the wrapped text,
+# so the report is saved once. The 'com' engine ([<company>] layout_engine in
+# config.ini) is an optional plug-in for Windows machines with Excel: sorting
+# and filtering are the same, but Excel autofits the row heights after the
+# save (common/excel_com.py).
+LAYOUT_ENGINES = ('python', 'com')
+
+# Excel's default column width, and the height of a line of 11pt text
+DEFAULT_COLUMN_WIDTH = 8.43
+LINE_HEIGHT = 15
+MAX_ROW_HEIGHT = 409
+ROW_HEIGHT_STEP = 0.75
+# Fitted column widths leave room for the cell margins, up to a cap
+MAX_COLUMN_WIDTH = 50
+COLUMN_PADDING = 2
+
+# How the data rows of a sheet are laid out. sort_by is a column name or a
+# list of them, filters is a list of (column name, shown values) and
+# fit_rows sizes each data row, and an unsized header row, to its wrapped
+# text at the given font sizes (the header is taken to be bold).
+SheetLayout = namedtuple('SheetLayout', [
+    'sort_by', 'ascending', 'filters', 'fit_rows', 'font_size', 'header_font_size',
+], defaults=[None, True, (), False, 11, 12])
+
+
+def get_layout_engine(company):
+    """Returns the configured layout engine for a company, falling back to python."""
+    engine = get_setting(company, 'layout_engine', 'python').strip().lower() or 'python'
+    if engine not in LAYOUT_ENGINES:
+        print(f"Unknown layout_engine '{engine}', using python")
+        return 'python'
+    if engine == 'com':
+        try:
+            import win32com.client  # noqa: F401
+        except ImportError:
+            print("Excel automation (pywin32) is not available, using the python layout engine")
+            return 'python'
+    return engine
+
+
+# ===============================
+# Text Metrics
+# ===============================
+# Text is measured in column width units, the width of a '0' in 11pt Calibri,
+# from the Calibri advance widths of each character (font units, '0' = 1038).
+# Characters not listed count as wide as a '0'. Each string's width is the
+# sum over its characters, taken for all strings at once from one array of
+# code points, so there is no per-cell loop.
+CALIBRI_ADVANCES = {
+    ' ': 463, '!': 544, '"': 821, '#': 1038, '$': 1038, '%': 1464, '&': 1397, "'": 452, '(': 621,
+    ')': 621, '*': 1038, '+': 1038, ',': 511, '-': 627, '.': 517, '/': 792, ':': 548, ';': 548,
+    '<': 1038, '=': 1038, '>': 1038, '?': 943, '@': 1829, '[': 625, '\\': 792, ']': 625, '_': 1026,
+    '|': 942, 'A': 1185, 'B': 1114, 'C': 1092, 'D': 1260, 'E': 1000, 'F': 941, 'G': 1292, 'H': 1276,
+    'I': 516, 'J': 653, 'K': 1064, 'L': 861, 'M': 1751, 'N': 1322, 'O': 1356, 'P': 1058, 'Q': 1378,
+    'R': 1112, 'S': 941, 'T': 998, 'U': 1314, 'V': 1162, 'W': 1822, 'X': 1063, 'Y': 998, 'Z': 959,
+    'a': 981, 'b': 1076, 'c': 866, 'd': 1076, 'e': 1019, 'f': 625, 'g': 964, 'h': 1076, 'i': 470,
+    'j': 490, 'k': 931, 'l': 470, 'm': 1636, 'n': 1076, 'o': 1080, 'p': 1076, 'q': 1076, 'r': 714,
+    's': 801, 't': 686, 'u': 1076, 'v': 925, 'w': 1464, 'x': 887, 'y': 927, 'z': 809, '\n': 0,
+}
+CHAR_WIDTHS = np.ones(128, dtype=np.float32)
+for char, advance in CALIBRI_ADVANCES.items():
+    CHAR_WIDTHS[ord(char)] = advance / 1038
+BOLD_WIDTH = 1.05
+# Strings measured per block, which bounds the size of the code point arrays
+METRICS_BLOCK_ROWS = 50_000
+
+
+def text_metrics(strings):
+    """Returns the width of each string at 11pt, with its counts of spaces and line breaks, as arrays."""
+    widths = np.zeros(len(strings), dtype=np.float64)
+    spaces = np.zeros(len(strings), dtype=np.int64)
+    breaks = np.zeros(len(strings), dtype=np.int64)
+    for start in range(0, len(strings), METRICS_BLOCK_ROWS):
+        block = strings[start:start + METRICS_BLOCK_ROWS]
+        lengths = np.fromiter(map(len, block), dtype=np.int64, count=len(block))
+        codes = np.frombuffer(''.join(block).encode('utf-32-le', 'surrogatepass'), dtype=np.uint32)
+        ends = np.cumsum(lengths)
+        starts = ends - lengths
+        for totals, values in ((widths, CHAR_WIDTHS[np.minimum(codes, len(CHAR_WIDTHS) - 1)]),
+                               (spaces, codes == 32), (breaks, codes == 10)):
+            running = np.concatenate([[0], np.cumsum(values, dtype=totals.dtype)])
+            totals[start:start + len(block)] = running[ends] - running[starts]
+    return widths, spaces, breaks
+
+
+def _is_text_column(series):
+    return not (pd.api.types.is_numeric_dtype(series) or pd.api.types.is_datetime64_any_dtype(series))
+
+
+def _text_cells(series):
+    """Returns the cells of a column as a list of strings, '' for everything that is not text."""
+    if isinstance(series.dtype, pd.StringDtype):
+        return series.fillna('').tolist()
+    return [value if type(value) is str else '' for value in series.tolist()]
+
+
+def wrapped_lines(strings, column_width, scale=1.0):
+    """Returns the number of lines each string takes when wrapped in a column of the given width.
+
+    Excel wraps at spaces, so every line but the last usually ends short of
+    the column edge, on average by half a word. Text without spaces is broken
+    anywhere and fills its lines. Each line break adds a line.
+    """
+    widths, spaces, breaks = text_metrics(strings)
+    widths = widths * scale
+    usable = max(column_width, 1)
+    waste = np.where(spaces > 0, np.minimum(widths / (spaces + 1), usable) / 2, 0)
+    lines = np.ceil((widths - waste) / np.maximum(usable - waste, 1))
+    return np.maximum(lines, 1).astype(np.int64) + breaks
+
+
+def line_height(font_size):
+    """Returns the height in points of a line of Calibri text at font_size."""
+    return LINE_HEIGHT * font_size / 11
+
+
+def _row_heights(lines, font_size):
+    # Excel sizes rows in whole pixels, 0.75pt each
+    heights = np.ceil(np.round(lines * line_height(font_size) / ROW_HEIGHT_STEP, 6)) * ROW_HEIGHT_STEP
+    return np.minimum(heights, MAX_ROW_HEIGHT)
+
+
+def estimate_row_heights(df, column_widths=None, hidden_columns=(), font_size=11):
+    """Estimates the height of each row with its text wrapped to the column widths.
+
+    Only text cells are measured; numbers and dates stay on one line. Rows of
+    a single line get None, the default height.
+    """
+    column_widths = column_widths or {}
+    lines = np.ones(len(df), dtype=np.int64)
+    for position, name in enumerate(df.columns, 1):
+        col_letter = get_column_letter(position)
+        width = column_widths.get(col_letter, DEFAULT_COLUMN_WIDTH)
+        if col_letter in hidden_columns or not width or not _is_text_column(df[name]):
+            continue
+        # Repeated values are measured once
+        codes, uniques = pd.factorize(pd.Series(_text_cells(df[name]), dtype=object))
+        if len(uniques):
+            lines = np.maximum(lines, wrapped_lines(list(uniques), width, font_size / 11)[codes])
+    heights = _row_heights(lines, font_size)
+    return [None if line_count == 1 else height for line_count, height in zip(lines.tolist(), heights.tolist())]
+
+
+def estimate_header_height(columns, column_widths=None, hidden_columns=(), font_size=12):
+    """Estimates the height of a bold header row wrapped to the column widths, None for a single line."""
+    column_widths = column_widths or {}
+    lines = 1
+    for position, name in enumerate(columns, 1):
+        col_letter = get_column_letter(position)
+        width = column_widths.get(col_letter, DEFAULT_COLUMN_WIDTH)
+        if col_letter not in hidden_columns and width:
+            lines = max(lines, int(wrapped_lines([str(name)], width, font_size / 11 * BOLD_WIDTH)[0]))
+    return None if lines == 1 else float(_row_heights(lines, font_size))
+
+
+def estimate_column_widths(df, header_font_size=12, max_width=MAX_COLUMN_WIDTH, padding=COLUMN_PADDING):
+    """Returns a width per column letter that fits its bold header and its widest value, as AutoFit would.
+
+    Every value is measured as text, numbers included.
+    """
+    column_widths = {}
+    for position, name in enumerate(df.columns, 1):
+        values = df[name]
+        text = values.astype(object).where(values.notna(), '').map(str).unique().tolist()
+        widest = max(text_metrics([str(name)])[0][0] * header_font_size / 11 * BOLD_WIDTH,
+                     text_metrics(text)[0].max(initial=0))
+        column_widths[get_column_letter(position)] = round(float(min(widest + padding, max_width)), 2)
+    return column_widths
+
+
+def apply_layout(sheet, layout, engine='python'):
+    """Returns the sheet (SheetSpec) with its rows sorted, its filters set and, with the python engine, fitted."""
+    df = sheet.df
+    if layout.sort_by is not None:
+        print(f"Sorting {sheet.name} by {layout.sort_by} ({'ascending' if layout.ascending else 'descending'})...")
+        df = df.sort_values(layout.sort_by, ascending=layout.ascending, kind='stable')
+    sheet = sheet._replace(df=df, filters=list(layout.filters) or sheet.filters)
+    if layout.fit_rows and engine == 'python':
+        sheet = sheet._replace(row_heights=estimate_row_heights(df, sheet.column_widths, sheet.hidden_columns,
+                                                                layout.font_size))
+        if sheet.header_height is None:
+            sheet = sheet._replace(header_height=estimate_header_height(
+                df.columns, sheet.column_widths, sheet.hidden_columns, layout.header_font_size))
+    return sheet
+
+
+def finish_layout(output_path, layouts, engine='python'):
+    """Runs the layout steps left for after the save, returning False if one failed.
+
+    layouts maps sheet names to their SheetLayout. Only the com engine has
+    such steps: Excel autofits the rows of the sheets with fit_rows.
+    """
+    sheet_names = [name for name, layout in layouts.items() if layout.fit_rows]
+    if engine != 'com' or not sheet_names:
+        return True
+    from common.excel_com import autofit_rows
+    return autofit_rows(output_path, sheet_names)
@@ -0,0 +1,35 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from common.config import get_int_setting
+
+# ===============================
+# Process Pool
+# ===============================
+# [ingestion] max_workers caps the worker processes; 0 means one per CPU.
+DEFAULT_MAX_WORKERS = 0
+
+
+def get_max_workers(task_count):
+    """Returns how many worker processes to use for task_count jobs."""
+    max_workers = get_int_setting('ingestion', 'max_workers', DEFAULT_MAX_WORKERS)
+    if max_workers <= 0:
+        max_workers = os.cpu_count() or 1
+    return max(1, min(max_workers, task_count))
+
+
+def map_in_processes(func, items, max_workers=None):
+    """Calls func on each item in a process pool and returns the results in order.
+
+    func must be a module-level function so the worker processes can import it.
+    A single item, or a single worker, runs in this process without a pool.
+    """
+    items = list(items)
+    if max_workers is None:
+        max_workers = get_max_workers(len(items))
+    if max_workers <= 1 or len(items) <= 1:
+        return [func(item) for item in items]
+
+    print(f"Processing {len(items)} files with {max_workers} worker processes...")
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(func, items))
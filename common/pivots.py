@@ -0,0 +1,438 @@
+import math
+import numbers
+import posixpath
+import re
+from collections import namedtuple
+from datetime import date, datetime
+from xml.etree import ElementTree
+from xml.sax.saxutils import escape
+
+import numpy as np
+import pandas as pd
+from openpyxl.utils import get_column_letter
+
+from common.excel_writer import SheetSpec
+from common.layout import estimate_column_widths
+
+# ===============================
+# Summary (Pivot) Sheets
+# ===============================
+# The summary sheets used to be Excel pivot tables built through COM after
+# the report was saved. They are now counted with pandas and written in the
+# same pass as the data sheet, laid out like the pivot tables: page filters
+# on top, one row per row item, one column per column item, and grand totals.
+BLANK_LABEL = '(blank)'
+TOTAL_LABEL = 'Grand Total'
+
+
+def _labels(series):
+    """Returns the pivot item of each value, with missing and empty values as (blank)."""
+    labels = series.astype(object).where(series.notna(), BLANK_LABEL)
+    return labels.where(labels.astype(str).str.strip() != '', BLANK_LABEL)
+
+
+def _sorted_items(labels, sort_key=None):
+    """Sorts pivot items ascending, with (blank) last, as Excel does."""
+    items = [item for item in labels.unique() if item != BLANK_LABEL]
+    items = sorted(items, key=sort_key)
+    if (labels == BLANK_LABEL).any():
+        items.append(BLANK_LABEL)
+    return items
+
+
+def pivot_counts(df, rows, count_column, columns=None, data_caption=None, row_sort_key=None):
+    """Counts the non-blank count_column values per row item (and column item), like an Excel pivot.
+
+    Returns a frame with the row items in the first column, one column per
+    column item (or a single data_caption column) and grand totals. Row and
+    column item pairs without any rows are left empty.
+    """
+    data_caption = data_caption or f"Count of {count_column}"
+    counted = df[count_column].notna() & (df[count_column].astype(str).str.strip() != '')
+    row_labels = _labels(df[rows])
+    row_items = _sorted_items(row_labels, row_sort_key)
+
+    if columns is None:
+        counts = counted.astype(int).groupby(row_labels).sum()
+        table = pd.DataFrame({data_caption: counts.reindex(row_items)})
+    else:
+        column_labels = _labels(df[columns])
+        counts = counted.astype(int).groupby([row_labels, column_labels]).sum().unstack()
+        table = counts.reindex(index=row_items, columns=_sorted_items(column_labels))
+        table[TOTAL_LABEL] = table.sum(axis=1, min_count=1)
+
+    table.loc[TOTAL_LABEL] = table.sum(axis=0, min_count=1)
+    table.index.name = rows
+    table.columns.name = None
+    table = table.reset_index()
+    # Empty cells stay empty; counts are written as whole numbers
+    for column in table.columns[1:]:
+        table[column] = pd.Series([int(value) if pd.notna(value) else '' for value in table[column]],
+                                  index=table.index, dtype=object)
+    return table
+
+
+def summary_sheet(name, table, header_style, data_style, total_style, data_caption=None,
+                  columns_caption=None, filters=()):
+    """Returns the SheetSpec of a summary sheet for a pivot_counts table.
+
+    filters are (field, selection) pairs shown above the table, like pivot page
+    fields. data_caption and columns_caption label the value and the column field.
+    """
+    preamble = [tuple(page_filter) for page_filter in filters]
+    if preamble:
+        preamble.append(())
+    if data_caption or columns_caption:
+        preamble.append((data_caption or '', columns_caption or ''))
+
+    # Widths fit the widest text of each table column, as AutoFit did on the
+    # pivots; the filter text above may run over into the empty cells next to it
+    return SheetSpec(
+        name, table, header_style, [data_style],
+        column_widths=estimate_column_widths(table),
+        column_formats={column: '#,##0' for column in table.columns[1:]},
+        autofilter=False,
+        preamble=preamble,
+        total_style=total_style,
+    )
+
+# ===============================
+# Refreshable PivotTable Parts
+# ===============================
+# A summary sheet can also carry a real PivotTable, so it can be re-sliced in
+# Excel. Neither writer backend supports pivot tables, so pivot_tables gives
+# write_report an edit_package step that adds the pivotCacheDefinition,
+# pivotCacheRecords and pivotTable parts while the report is written. The
+# pivot table sits exactly on the summary cells, with the same captions, row
+# and column items and page fields, and is refreshed from the source sheet
+# when Excel opens the file.
+#
+# summary is the SheetSpec returned by summary_sheet, source the values of
+# the source sheet as written (header in row 1), and page_fields a list of
+# (field, shown values) pairs, matching the filters of the summary sheet.
+PivotTableSpec = namedtuple('PivotTableSpec', [
+    'name', 'summary', 'source_sheet', 'source', 'rows', 'count_column', 'columns', 'data_caption',
+    'page_fields',
+], defaults=[None, None, ()])
+
+MAIN_NS = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+REL_NS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+PACKAGE_REL_NS = 'http://schemas.openxmlformats.org/package/2006/relationships'
+PIVOT_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.{}+xml'
+# '#,##0', the number format of the count values
+COUNT_NUM_FMT_ID = 3
+ILLEGAL_XML_CHARS = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def _xml_text(value):
+    return escape(ILLEGAL_XML_CHARS.sub('', str(value)), {'"': '&quot;'})
+
+
+def _blank_mask(series):
+    """Marks the values a pivot shows as (blank): missing, empty or only whitespace."""
+    return series.isna() | (series.astype(str).str.strip() == '')
+
+
+def _item_kind(value):
+    if isinstance(value, (datetime, date)):
+        return 'd'
+    if isinstance(value, numbers.Number) and not isinstance(value, bool):
+        return 'n' if math.isfinite(value) else 'm'
+    return 's'
+
+
+def _cache_field(series):
+    """Returns the shared items of a source column as (kind, value) and each row's item index."""
+    blanks = _blank_mask(series)
+    codes, uniques = pd.factorize(series.astype(object).where(~blanks, None))
+    items = []
+    for value in uniques:
+        kind = _item_kind(value)
+        if kind == 'd':
+            value = pd.Timestamp(value).to_pydatetime()
+        elif kind == 's':
+            value = str(value)
+        items.append((kind, value))
+    if blanks.any():
+        codes = np.where(codes < 0, len(items), codes)
+        items.append(('m', None))
+    return items, codes
+
+
+def _number_text(value):
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _item_xml(kind, value):
+    if kind == 'm':
+        return '<m/>'
+    if kind == 'n':
+        return f'<n v="{_number_text(value)}"/>'
+    if kind == 'd':
+        return f'<d v="{value:%Y-%m-%dT%H:%M:%S}"/>'
+    return f'<s v="{_xml_text(value)}"/>'
+
+
+def _shared_items_xml(items):
+    """Writes the sharedItems of a cache field, with the flags Excel expects for its value types."""
+    kinds = {kind for kind, _ in items}
+    flags = []
+    if not kinds & {'s', 'm'}:
+        flags.append('containsSemiMixedTypes="0"')
+    if not kinds & {'s', 'n'}:
+        flags.append('containsNonDate="0"')
+    if 'd' in kinds:
+        flags.append('containsDate="1"')
+    if 's' not in kinds:
+        flags.append('containsString="0"')
+    if 'm' in kinds:
+        flags.append('containsBlank="1"')
+    if len(kinds - {'m'}) > 1:
+        flags.append('containsMixedTypes="1"')
+    if 'n' in kinds:
+        values = [value for kind, value in items if kind == 'n']
+        flags.append('containsNumber="1"')
+        if all(float(value).is_integer() for value in values):
+            flags.append('containsInteger="1"')
+        flags.append(f'minValue="{_number_text(min(values))}" maxValue="{_number_text(max(values))}"')
+    if 'd' in kinds:
+        dates = [value for kind, value in items if kind == 'd']
+        flags.append(f'minDate="{min(dates):%Y-%m-%dT%H:%M:%S}" maxDate="{max(dates):%Y-%m-%dT%H:%M:%S}"')
+    if any(kind == 's' and len(value) > 255 for kind, value in items):
+        flags.append('longText="1"')
+    flags.append(f'count="{len(items)}"')
+    return f'<sharedItems {" ".join(flags)}>' + ''.join(_item_xml(*item) for item in items) + '</sharedItems>'
+
+
+def _cache_parts(source, source_sheet):
+    """Returns the cache definition and records XML of a source frame, and the shared items of each field."""
+    fields = [_cache_field(source[column]) for column in source.columns]
+    last_cell = f"{get_column_letter(max(len(source.columns), 1))}{len(source) + 1}"
+    cache_fields = ''.join(
+        f'<cacheField name="{_xml_text(column)}" numFmtId="{14 if any(kind == "d" for kind, _ in items) else 0}">'
+        f'{_shared_items_xml(items)}</cacheField>'
+        for column, (items, _) in zip(source.columns, fields)
+    )
+    definition = (
+        f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        f'<pivotCacheDefinition xmlns="{MAIN_NS}" xmlns:r="{REL_NS}" r:id="rId1" refreshOnLoad="1" '
+        f'createdVersion="3" refreshedVersion="3" minRefreshableVersion="3" recordCount="{len(source)}">'
+        f'<cacheSource type="worksheet"><worksheetSource ref="A1:{last_cell}" sheet="{_xml_text(source_sheet)}"/>'
+        f'</cacheSource><cacheFields count="{len(fields)}">{cache_fields}</cacheFields></pivotCacheDefinition>'
+    )
+    # Every record refers to the shared items of its fields by index
+    field_tags = [np.array([f'<x v="{index}"/>' for index in range(len(items))], dtype=object)[codes]
+                  for items, codes in fields]
+    records = ''.join('<r>' + ''.join(row) + '</r>' for row in zip(*field_tags))
+    records = (
+        f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        f'<pivotCacheRecords xmlns="{MAIN_NS}" xmlns:r="{REL_NS}" count="{len(source)}">{records}</pivotCacheRecords>'
+    )
+    return definition, records, [items for items, _ in fields]
+
+
+def _item_indexes(items):
+    """Maps each pivot item label (as pivot_counts writes it) to its shared item index."""
+    indexes = {}
+    for index, (kind, value) in enumerate(items):
+        indexes[BLANK_LABEL if kind == 'm' else value] = index
+    return indexes
+
+
+def _axis_order(items, shown):
+    """Orders a field's shared items as the summary shows them, the others after."""
+    indexes = _item_indexes(items)
+    try:
+        order = [indexes[pd.Timestamp(label).to_pydatetime() if isinstance(label, (datetime, date)) else label]
+                 for label in shown]
+    except KeyError as e:
+        raise ValueError(f"summary item {e} is not in the source data")
+    return order + [index for index in range(len(items)) if index not in order]
+
+
+def _pivot_table_xml(pivot, cache_id, items):
+    """Writes the pivotTableDefinition of a pivot laid over its summary sheet."""
+    fields = list(pivot.source.columns)
+    table = pivot.summary.df
+    data_caption = pivot.data_caption or f"Count of {pivot.count_column}"
+    row_labels = list(table.iloc[:-1, 0])
+    column_labels = list(table.columns[1:-1]) if pivot.columns else []
+    if not row_labels:
+        raise ValueError("the summary has no rows")
+
+    axis_orders = {pivot.rows: _axis_order(items[fields.index(pivot.rows)], row_labels)}
+    if pivot.columns:
+        axis_orders[pivot.columns] = _axis_order(items[fields.index(pivot.columns)], column_labels)
+
+    # Page fields show a single item, or hide the items not shown
+    page_xml = []
+    hidden = {}
+    for field, shown in pivot.page_fields:
+        field_items = items[fields.index(field)]
+        indexes = _item_indexes(field_items)
+        shown_indexes = {indexes[value] for value in
+                         (BLANK_LABEL if pd.isna(value) or str(value).strip() == '' else value for value in shown)
+                         if value in indexes}
+        if not shown_indexes:
+            raise ValueError(f"no {field} item to show")
+        axis_orders[field] = list(range(len(field_items)))
+        if len(shown_indexes) == 1:
+            page_xml.append(f'<pageField fld="{fields.index(field)}" item="{shown_indexes.pop()}" hier="-1"/>')
+        else:
+            hidden[field] = set(axis_orders[field]) - shown_indexes
+            page_xml.append(f'<pageField fld="{fields.index(field)}" hier="-1"/>')
+
+    axes = {pivot.rows: 'axisRow', pivot.columns: 'axisCol'}
+    axes.update((field, 'axisPage') for field, _ in pivot.page_fields)
+    pivot_fields = []
+    for field in fields:
+        attributes = ''
+        if field in axes:
+            attributes += f' axis="{axes[field]}"'
+        if field == pivot.count_column:
+            attributes += ' dataField="1"'
+        if field in hidden:
+            attributes += ' multipleItemSelectionAllowed="1"'
+        if field not in axis_orders:
+            pivot_fields.append(f'<pivotField{attributes} showAll="0"/>')
+            continue
+        hidden_items = hidden.get(field, ())
+        field_items = ''.join(f'<item h="1" x="{index}"/>' if index in hidden_items else f'<item x="{index}"/>'
+                              for index in axis_orders[field])
+        pivot_fields.append(f'<pivotField{attributes} showAll="0"><items count="{len(axis_orders[field]) + 1}">'
+                            f'{field_items}<item t="default"/></items></pivotField>')
+
+    # Row and column items are positions in the field's items, shown in order
+    row_items = ''.join(f'<i><x v="{position}"/></i>' for position in range(len(row_labels)))
+    row_items += '<i t="grand"><x/></i>'
+    if pivot.columns:
+        column_xml = (f'<colFields count="1"><field x="{fields.index(pivot.columns)}"/></colFields>'
+                      f'<colItems count="{len(column_labels) + 1}">'
+                      + ''.join(f'<i><x v="{position}"/></i>' for position in range(len(column_labels)))
+                      + '<i t="grand"><x/></i></colItems>')
+    else:
+        column_xml = '<colItems count="1"><i/></colItems>'
+
+    # The table starts at the caption row above the header when there is a column field
+    header_row = len(pivot.summary.preamble) + 1
+    first_row = header_row - 1 if pivot.columns else header_row
+    last_cell = f"{get_column_letter(len(table.columns))}{header_row + len(table)}"
+    page_count = len(pivot.page_fields)
+    location = (f'<location ref="A{first_row}:{last_cell}" firstHeaderRow="1" '
+                f'firstDataRow="{2 if pivot.columns else 1}" firstDataCol="1"'
+                + (f' rowPageCount="{page_count}" colPageCount="1"' if page_count else '') + '/>')
+    captions = f' rowHeaderCaption="{_xml_text(pivot.rows)}"'
+    if pivot.columns:
+        captions += f' colHeaderCaption="{_xml_text(pivot.columns)}"'
+    return (
+        f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        f'<pivotTableDefinition xmlns="{MAIN_NS}" name="{_xml_text(pivot.name)}" cacheId="{cache_id}" '
+        f'applyNumberFormats="0" applyBorderFormats="0" applyFontFormats="0" applyPatternFormats="0" '
+        f'applyAlignmentFormats="0" applyWidthHeightFormats="1" dataCaption="Values" updatedVersion="3" '
+        f'minRefreshableVersion="3" useAutoFormatting="1" itemPrintTitles="1" createdVersion="3" indent="0" '
+        f'outline="1" outlineData="1" multipleFieldFilters="0"{captions}>{location}'
+        f'<pivotFields count="{len(fields)}">{"".join(pivot_fields)}</pivotFields>'
+        f'<rowFields count="1"><field x="{fields.index(pivot.rows)}"/></rowFields>'
+        f'<rowItems count="{len(row_labels) + 1}">{row_items}</rowItems>{column_xml}'
+        + (f'<pageFields count="{page_count}">{"".join(page_xml)}</pageFields>' if page_count else '')
+        + f'<dataFields count="1"><dataField name="{_xml_text(data_caption)}" '
+        f'fld="{fields.index(pivot.count_column)}" subtotal="count" baseField="0" baseItem="0" '
+        f'numFmtId="{COUNT_NUM_FMT_ID}"/></dataFields>'
+        f'<pivotTableStyleInfo name="PivotStyleLight16" showRowHeaders="1" showColHeaders="1" '
+        f'showRowStripes="0" showColStripes="0" showLastColumn="1"/></pivotTableDefinition>'
+    )
+
+
+def _relationships_xml(relationships):
+    return (f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n<Relationships xmlns="{PACKAGE_REL_NS}">'
+            + ''.join(f'<Relationship Id="{rel_id}" Type="{REL_NS}/{rel_type}" Target="{target}"/>'
+                      for rel_id, rel_type, target in relationships)
+            + '</Relationships>')
+
+
+def _add_relationship(rels_xml, rel_type, target):
+    """Adds a relationship to a .rels part, returning the new part and the relationship id."""
+    rel_numbers = [int(number) for number in re.findall(r'Id="rId(\d+)"', rels_xml)]
+    rel_id = f"rId{max(rel_numbers + [0]) + 1}"
+    relationship = f'<Relationship Id="{rel_id}" Type="{REL_NS}/{rel_type}" Target="{target}"/>'
+    return rels_xml.replace('</Relationships>', relationship + '</Relationships>'), rel_id
+
+
+def _rels_part(part):
+    return posixpath.join(posixpath.dirname(part), '_rels', posixpath.basename(part) + '.rels')
+
+
+def _sheet_parts(workbook_xml, workbook_rels):
+    """Maps each sheet name to its worksheet part in the package."""
+    workbook = ElementTree.fromstring(workbook_xml)
+    relationships = ElementTree.fromstring(workbook_rels)
+    targets = {rel.get('Id'): rel.get('Target') for rel in relationships}
+    parts = {}
+    for sheet in workbook.iter(f'{{{MAIN_NS}}}sheet'):
+        target = targets[sheet.get(f'{{{REL_NS}}}id')]
+        parts[sheet.get('name')] = target.lstrip('/') if target.startswith('/') else posixpath.join('xl', target)
+    return parts
+
+
+def add_pivot_parts(parts, pivots):
+    """Returns the package parts with a refreshable PivotTable (PivotTableSpec) over each summary sheet.
+
+    parts are the editable parts of write_report's edit_package step.
+    """
+    workbook_xml = parts['xl/workbook.xml']
+    workbook_rels = parts['xl/_rels/workbook.xml.rels']
+    content_types = parts['[Content_Types].xml']
+    sheet_parts = _sheet_parts(workbook_xml, workbook_rels)
+    if '<pivotCaches' in workbook_xml:
+        raise ValueError("the workbook already has pivot caches")
+
+    parts = dict(parts)
+    caches = []
+    for number, pivot in enumerate(pivots, 1):
+        definition, records, items = _cache_parts(pivot.source, pivot.source_sheet)
+        parts[f'xl/pivotCache/pivotCacheDefinition{number}.xml'] = definition
+        parts[f'xl/pivotCache/pivotCacheRecords{number}.xml'] = records
+        parts[f'xl/pivotCache/_rels/pivotCacheDefinition{number}.xml.rels'] = _relationships_xml(
+            [('rId1', 'pivotCacheRecords', f'pivotCacheRecords{number}.xml')])
+        parts[f'xl/pivotTables/pivotTable{number}.xml'] = _pivot_table_xml(pivot, number, items)
+        parts[f'xl/pivotTables/_rels/pivotTable{number}.xml.rels'] = _relationships_xml(
+            [('rId1', 'pivotCacheDefinition', f'../pivotCache/pivotCacheDefinition{number}.xml')])
+
+        workbook_rels, rel_id = _add_relationship(workbook_rels, 'pivotCacheDefinition',
+                                                  f'pivotCache/pivotCacheDefinition{number}.xml')
+        caches.append(f'<pivotCache xmlns:r="{REL_NS}" cacheId="{number}" r:id="{rel_id}"/>')
+        rels_part = _rels_part(sheet_parts[pivot.summary.name])
+        parts[rels_part], _ = _add_relationship(parts.get(rels_part, _relationships_xml([])),
+                                                'pivotTable', f'../pivotTables/pivotTable{number}.xml')
+        for part_type in ('pivotCacheDefinition', 'pivotCacheRecords', 'pivotTable'):
+            folder = 'pivotTables' if part_type == 'pivotTable' else 'pivotCache'
+            content_types = content_types.replace('</Types>', (
+                f'<Override PartName="/xl/{folder}/{part_type}{number}.xml" '
+                f'ContentType="{PIVOT_CONTENT_TYPE.format(part_type)}"/></Types>'))
+
+    # pivotCaches follows calcPr and comes before the web and extension settings
+    pivot_caches = f'<pivotCaches>{"".join(caches)}</pivotCaches>'
+    insert_at = min([workbook_xml.find(tag) for tag in ('<smartTagPr', '<smartTagTypes', '<webPublishing',
+                                                        '<fileRecoveryPr', '<webPublishObjects', '<extLst')
+                     if tag in workbook_xml] + [workbook_xml.rindex('</workbook>')])
+    parts['xl/workbook.xml'] = workbook_xml[:insert_at] + pivot_caches + workbook_xml[insert_at:]
+    parts['xl/_rels/workbook.xml.rels'] = workbook_rels
+    parts['[Content_Types].xml'] = content_types
+    return parts
+
+
+def pivot_tables(pivots):
+    """Returns the edit_package step for write_report that adds the pivots (PivotTableSpec).
+
+    If they cannot be built, a warning is printed and the report is written without them.
+    """
+    def add_pivot_tables(parts):
+        try:
+            parts = add_pivot_parts(parts, pivots)
+        except Exception as e:
+            print(f"Warning: Could not add the pivot table: {str(e)}")
+            return parts
+        for pivot in pivots:
+            print(f"{pivot.name} pivot table added to {pivot.summary.name}")
+        return parts
+    return add_pivot_tables
@@ -0,0 +1,207 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+
+from common.cache import cache_enabled, file_hash, get_cache_dir, load_cached_lookup, lookup_file_hash
+from common.keys import KEY_NORMALIZATION_VERSION, normalize_keys, report_key_mismatches
+from database import count_remark_cases, get_remark_import, get_remarks, import_remarks
+
+# ===============================
+# Remark Join
+# ===============================
+# Remarks come from a tracker workbook, looked up by Case Number in its first
+# column. The lookup sheet is read once and hash-joined onto the report frame
+# before the report is written, instead of a VLOOKUP formula per row through
+# Excel COM. As with VLOOKUP, the first lookup row of a Case Number is used.
+# Keys on both sides are compared in their normalize_keys form (see
+# common.keys). Only the key column and the looked-up columns are kept, as an
+# index that is cached on disk until the lookup workbook changes (see
+# common.cache).
+#
+# A selected tracker is imported into the remarks table of the CRM database
+# (company, case key, field) and the joins read the remarks back from there
+# for the report's case keys. An import replaces all stored remarks of its
+# fields, so a report only ever sees the selected tracker's remarks. A
+# tracker is parsed and imported only if it is not the version last imported
+# for those columns.
+NOT_FOUND = 'Not Found'
+NO_REMARKS = 'No Remarks'
+
+
+def peek_lookup_sheet(lookup_file_path, sample_rows=5):
+    """Returns the header row, the first sample_rows data rows and the data row count of a lookup workbook.
+
+    Only those rows are read. The row count comes from the sheet's dimension
+    record and is None if the workbook was saved without one.
+    """
+    workbook = load_workbook(lookup_file_path, read_only=True, data_only=True)
+    try:
+        worksheet = workbook.worksheets[0]
+        rows = worksheet.iter_rows(max_row=sample_rows + 1, values_only=True)
+        header = next(rows, ())
+        sample = [row for row in rows if any(value is not None for value in row)]
+        if worksheet.max_row is None:
+            return header, sample, None
+        return header, sample, max(worksheet.max_row - 1, 0)
+    finally:
+        workbook.close()
+
+
+def _column_positions(header, value_columns):
+    """Returns the 0-based position of each lookup column given by header name or 1-based column number."""
+    names = ['' if name is None else str(name).strip() for name in header]
+    positions = {}
+    for name, column in value_columns.items():
+        if isinstance(column, int):
+            positions[name] = column - 1
+        elif column in names:
+            positions[name] = names.index(column)
+    return positions
+
+
+def _text_values(values):
+    """Returns cell values as text, keeping empty cells as None."""
+    return [None if value is None else str(value) for value in values]
+
+
+def read_lookup_index(lookup_file_path, value_columns, header=True):
+    """Reads the lookup index of a workbook: its looked-up columns as text, indexed by the normalized first column.
+
+    value_columns maps each index column to its lookup column (header name or
+    1-based column number). With header=False row 1 is read as data and
+    columns can only be given by number. Columns missing from the sheet are
+    left out of the index. The sheet is streamed row by row as values and
+    only the key and looked-up cells are kept.
+    """
+    workbook = load_workbook(lookup_file_path, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header_row = next(rows, ()) if header else ()
+        positions = _column_positions(header_row, value_columns)
+        width = len(header_row)
+        keys = []
+        columns = {name: [] for name in positions}
+        for row in rows:
+            if not any(value is not None for value in row):
+                continue
+            width = max(width, len(row))
+            keys.append(row[0])
+            for name, position in positions.items():
+                columns[name].append(row[position] if position < len(row) else None)
+    finally:
+        workbook.close()
+
+    keys = normalize_keys(pd.Series(keys, dtype=object))
+    index = pd.DataFrame(index=pd.Index(keys.to_numpy(), name='key'))
+    for name, values in columns.items():
+        if positions[name] < width:  # numbered columns beyond the sheet are missing
+            index[name] = pd.Series(_text_values(values), dtype=object).to_numpy()
+    return index
+
+
+def load_lookup_index(lookup_file_path, value_columns, header=True):
+    """Returns the lookup index of a workbook for value_columns, reading the workbook only on a cache miss."""
+    spec = {'value_columns': value_columns, 'header': header, 'keys': KEY_NORMALIZATION_VERSION}
+    return load_cached_lookup(lookup_file_path, spec,
+                              lambda: read_lookup_index(lookup_file_path, value_columns, header))
+
+
+def import_tracker_remarks(company, lookup_file_path, value_columns, header=True):
+    """Replaces the stored remarks with a tracker's, returning False if it has no rows or none of the columns.
+
+    value_columns maps each remark field to its tracker column, as for
+    load_lookup_index. Repeated case keys keep their first row, like VLOOKUP.
+    Fields the tracker lacks are cleared as well.
+    """
+    if cache_enabled():
+        source_hash = lookup_file_hash(get_cache_dir(), lookup_file_path)
+    else:
+        source_hash = file_hash(lookup_file_path)
+    columns = json.dumps({'value_columns': value_columns, 'header': header, 'keys': KEY_NORMALIZATION_VERSION},
+                         sort_keys=True)
+    if get_remark_import(company, columns) == source_hash:
+        print("This lookup file was already imported, using the stored remarks")
+        return count_remark_cases(company, list(value_columns)) > 0
+
+    lookup_index = load_lookup_index(lookup_file_path, value_columns, header)
+    fields = [name for name in value_columns if name in lookup_index.columns]
+    for name in value_columns:
+        if name not in fields:
+            print(f"Warning: Column for '{name}' not found in lookup file")
+
+    first_rows = lookup_index[(lookup_index.index != '') & ~lookup_index.index.duplicated()]
+    remarks = []
+    for field in fields:
+        values = first_rows[field].astype(object)
+        remarks.extend(zip(first_rows.index, [field] * len(first_rows), values.where(values.notna(), None)))
+    count = import_remarks(company, columns, list(value_columns), remarks, os.path.abspath(lookup_file_path),
+                           source_hash)
+    print(f"Imported {count} remarks for {len(first_rows)} cases from {os.path.basename(lookup_file_path)}")
+    return not lookup_index.empty and bool(fields)
+
+
+def load_remark_index(company, case_numbers, fields):
+    """Returns the stored remarks of the given Case Numbers for join_remarks, one column per field.
+
+    Only the given cases are read; the number of cases stored in all is kept
+    in attrs['lookup_rows'] for the join stats.
+    """
+    keys = normalize_keys(case_numbers)
+    stored = pd.DataFrame(get_remarks(company, list(fields), keys[keys != ''].unique().tolist()),
+                          columns=['key', 'field', 'remark'], dtype=object)
+    index = stored.pivot(index='key', columns='field', values='remark').reindex(columns=list(fields))
+    index.columns.name = None
+    index.attrs['lookup_rows'] = count_remark_cases(company, list(fields))
+    return index
+
+
+def join_remarks(case_numbers, lookup_index, value_columns, missing=NOT_FOUND, blank=NO_REMARKS,
+                 key_label='Case Number'):
+    """Looks up remark values for each Case Number, returning them with the match stats.
+
+    lookup_index comes from load_remark_index or load_lookup_index and
+    value_columns names the output columns to fill from it. Rows without a
+    Case Number are left empty, Case Numbers not in the lookup sheet get
+    missing and empty remarks get blank. key_label names the keys in the
+    mismatch report.
+    """
+    keys = normalize_keys(case_numbers)
+    lookup_keys = pd.Series(lookup_index.index, dtype=object)
+    duplicates = (lookup_keys.duplicated() & (lookup_keys != '')).to_numpy()
+    first_rows = (lookup_keys != '').to_numpy() & ~duplicates
+
+    # Hash join: the position of each Case Number among the first lookup rows
+    positions = pd.Index(lookup_keys[first_rows]).get_indexer(keys)
+    matched = positions >= 0
+    blank_keys = (keys == '').to_numpy()
+
+    joined = {}
+    for name in value_columns:
+        if name not in lookup_index.columns:
+            print(f"Warning: Column for '{name}' not found in lookup file")
+            joined[name] = pd.Series('', index=case_numbers.index, dtype=object)
+            continue
+        # A trailing None is picked by the -1 positions, even when nothing is stored
+        values = np.append(lookup_index[name].astype(object).to_numpy()[first_rows], None)[positions]
+        values = pd.Series(values, index=case_numbers.index, dtype=object)
+        values = values.where(values.notna() & (values.astype(str).str.strip() != ''), blank)
+        joined[name] = values.where(matched, missing).where(~blank_keys, '')
+
+    stats = {
+        'rows': len(keys),
+        'matched': int(matched.sum()),
+        'not_found': int((~matched & ~blank_keys).sum()),
+        'blank_keys': int(blank_keys.sum()),
+        'lookup_rows': lookup_index.attrs.get('lookup_rows', len(lookup_keys)),
+        'duplicate_keys': int(duplicates.sum()),
+    }
+    looked_up = stats['rows'] - stats['blank_keys']
+    rate = stats['matched'] / looked_up * 100 if looked_up else 0
+    print(f"Remark join: {stats['matched']} of {looked_up} keys matched ({rate:.1f}%), "
+          f"{stats['not_found']} not found, {stats['blank_keys']} rows without a key")
+    print(f"Lookup: {stats['lookup_rows']} rows, {stats['duplicate_keys']} repeated keys (first row used)")
+    report_key_mismatches(case_numbers, keys, matched, key_label)
+    return pd.DataFrame(joined, index=case_numbers.index), stats
@@ -0,0 +1,137 @@
+# ===============================
+# Pipeline Schemas
+# ===============================
+# Each schema lists the export columns a pipeline actually uses and the dtype
+# to read them with. Only these columns are parsed; everything else in the
+# export is skipped at read time.
+#
+# Low-cardinality status and name columns are read as 'category', which
+# keeps one copy of each distinct string and makes the status filters and
+# group-bys compare integer codes instead of Python strings. They are parsed
+# as text and converted after the parse (see common/csv_reader.py).
+#
+# Identifier columns that are written to Excel as-is (Case Number, phone and
+# postal code in the Atomberg sheets) are left out of 'dtypes' so pandas
+# keeps inferring them and the output cells keep their current type.
+#
+# 'name' and 'version' key the parsed export cache (common/cache.py); bump
+# 'version' whenever the code that builds a pipeline's cached frame changes.
+# 'optional' columns are read when present but not required.
+# 'dtypes' is keyed by the names listed in the schema.
+# 'fuzzy' schemas match each name against the header ignoring spaces and
+# case, taking the first header column that contains it (Orient exports
+# vary their headers between regions).
+
+ATOMBERG_PHONE_COLUMNS = ['Customer Phone', 'Phone', 'Mobile', 'Contact Number', 'Phone Number']
+
+ATOMBERG_GENERAL_SCHEMA = {
+    'name': 'atomberg_general',
+    'version': 3,
+    'columns': [
+        'Created Date', 'Customer Name', 'Street',
+        'Zip/Postal Code', 'Customer Complaint', 'Product Description',
+        'LineItem Status', 'Technician Name', 'Case Number', 'WO Status'
+    ],
+    'optional': ATOMBERG_PHONE_COLUMNS,
+    'dtypes': {
+        'Created Date': str, 'Customer Name': str, 'Street': str,
+        'Customer Complaint': str, 'Product Description': str,
+        'LineItem Status': 'category', 'Technician Name': 'category', 'WO Status': 'category'
+    },
+    'fuzzy': False,
+}
+
+ATOMBERG_FEED_REMARK_SCHEMA = {
+    'name': 'atomberg_feed_remark',
+    'version': 3,
+    'columns': [
+        'Created Date', 'Customer Name', 'Street',
+        'Zip/Postal Code', 'Customer Complaint', 'Product Description',
+        'LineItem Status', 'Technician Name', 'Case Number', 'WO Status'
+    ],
+    'optional': [],
+    'dtypes': {
+        'Created Date': str, 'Customer Name': str, 'Street': str,
+        'Customer Complaint': str, 'Product Description': str,
+        'LineItem Status': 'category', 'Technician Name': 'category', 'WO Status': 'category'
+    },
+    'fuzzy': False,
+}
+
+ATOMBERG_VOC_VOT_SCHEMA = {
+    'name': 'atomberg_voc_vot',
+    'version': 2,
+    'columns': [
+        'Case Number', 'Created Date', 'Customer Name',
+        'Street', 'Zip/Postal Code', 'Customer Complaint', 'LineItem Status',
+        'End Date', 'Product Description', 'Warranty Status', 'Technician Name'
+    ],
+    'optional': [],
+    'dtypes': {
+        'Created Date': str, 'Customer Name': str, 'Street': str,
+        'Customer Complaint': str, 'LineItem Status': 'category', 'End Date': str,
+        'Product Description': str, 'Warranty Status': 'category', 'Technician Name': 'category'
+    },
+    'fuzzy': False,
+}
+
+# Every Orient value is written to Excel as text, so columns without an
+# explicit dtype are read as str ('default_dtype').
+ORIENT_SCHEMA = {
+    'name': 'orient',
+    'version': 3,
+    'columns': [],
+    'optional': [
+        'REGISTRATION', 'CALL ID', 'MODEL DESCRIPTION', 'CALL STAGE',
+        'CUSTOMER NAME', 'ADDRESS', 'PIN CODE', 'CONTACT NUMBER',
+        'ENGINEER NAME', 'CUSTOMER REMARKS', 'PENDING CALL PO', 'GROUP'
+    ],
+    'dtypes': {'CALL STAGE': 'category', 'ENGINEER NAME': 'category', 'GROUP': 'category'},
+    'default_dtype': str,
+    'fuzzy': True,
+}
+
+
+def _normalize_header(name):
+    return str(name).replace(' ', '').upper()
+
+
+def match_columns(header, schema):
+    """Maps each schema column name to the header column it selects."""
+    header = list(header)
+    names = schema['columns'] + schema['optional']
+    if not schema['fuzzy']:
+        return {name: name for name in names if name in header}
+
+    matches = {}
+    for name in names:
+        key = _normalize_header(name)
+        for col in header:
+            if key in _normalize_header(col):
+                matches[name] = col
+                break
+    # REGISTRATION DATE is looked up separately (see find_registration_date_column
+    # in orient.py), which prefers a column that also mentions DATE.
+    for col in header:
+        if 'REGISTRATION' in str(col).upper() and 'DATE' in str(col).upper():
+            matches['REGISTRATION DATE'] = col
+            break
+    return matches
+
+
+def resolve_columns(header, schema):
+    """Returns the header columns a schema selects, in file order."""
+    selected = set(match_columns(header, schema).values())
+    return [col for col in header if col in selected]
+
+
+def resolve_dtypes(header, schema):
+    """Returns the dtype mapping for the header columns a schema selects."""
+    matches = match_columns(header, schema)
+    dtypes = {}
+    if 'default_dtype' in schema:
+        dtypes = {col: schema['default_dtype'] for col in matches.values()}
+    for name, dtype in schema['dtypes'].items():
+        if name in matches:
+            dtypes[matches[name]] = dtype
+    return dtypes
@@ -0,0 +1,65 @@
+import os
+import zipfile
+from collections import namedtuple
+from contextlib import contextmanager
+
+# ===============================
+# CSV Sources
+# ===============================
+# The readers accept any of:
+#   - a file path
+#   - a ZipMember, i.e. a CSV inside a ZIP archive, which is decompressed as it
+#     is read instead of being extracted to a temporary directory first
+#   - an already open binary file object (it is rewound, never closed)
+ZipMember = namedtuple('ZipMember', ['zip_path', 'member'])
+
+
+def find_zip_csv_members(zip_path):
+    """Lists the CSV files inside a ZIP archive, skipping folders and macOS metadata."""
+    with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+        return [
+            info.filename for info in zip_ref.infolist()
+            if not info.is_dir()
+            and info.filename.lower().endswith('.csv')
+            and not info.filename.startswith('__MACOSX/')
+        ]
+
+
+@contextmanager
+def open_source(source):
+    """Opens a CSV source for binary reading, positioned at the start."""
+    if isinstance(source, ZipMember):
+        # The member keeps the archive file open until it is closed itself
+        with zipfile.ZipFile(source.zip_path, 'r') as zip_ref:
+            member_file = zip_ref.open(source.member)
+        with member_file:
+            yield member_file
+    elif isinstance(source, (str, bytes, os.PathLike)):
+        with open(source, 'rb') as f:
+            yield f
+    else:
+        source.seek(0)
+        yield source
+
+
+def source_size(source):
+    """Returns the uncompressed size of a CSV source in bytes."""
+    if isinstance(source, ZipMember):
+        with zipfile.ZipFile(source.zip_path, 'r') as zip_ref:
+            return zip_ref.getinfo(source.member).file_size
+    if isinstance(source, (str, bytes, os.PathLike)):
+        return os.path.getsize(source)
+    position = source.tell()
+    source.seek(0, os.SEEK_END)
+    size = source.tell()
+    source.seek(position)
+    return size
+
+
+def source_name(source):
+    """Returns a short display name for a CSV source."""
+    if isinstance(source, ZipMember):
+        return f"{os.path.basename(source.zip_path)}/{source.member}"
+    if isinstance(source, (str, bytes, os.PathLike)):
+        return os.path.basename(source)
+    return getattr(source, 'name', 'CSV stream')
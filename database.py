@@ -1,4 +1,5 @@
 import sqlite3
+import json
 from datetime import datetime
 import hashlib
 import os
@@ -112,6 +113,9 @@ def setup_database():
         processed_by TEXT
     );''')
     
+    # Remarks imported from tracker workbooks, looked up by case key
+    create_remark_tables(cursor)
+    
     # Insert default main admin user
     cursor.execute('''INSERT OR IGNORE INTO users (username, password_hash, role, company) 
                       VALUES (?, ?, ?, ?)''', 
@@ -377,7 +381,107 @@ def get_file_logs(company):
     
     return logs
 
+# Remark functions
+def create_remark_tables(cursor):
+    """Create the remark tables if they do not exist yet"""
+    # The primary key indexes remarks by company and case key
+    cursor.execute('''CREATE TABLE IF NOT EXISTS remarks (
+        company TEXT NOT NULL,
+        case_key TEXT NOT NULL,
+        field TEXT NOT NULL,
+        remark TEXT,
+        source_file TEXT,
+        updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (company, case_key, field)
+    );''')
+    
+    # Last tracker imported per company and set of remark columns
+    cursor.execute('''CREATE TABLE IF NOT EXISTS remark_imports (
+        company TEXT NOT NULL,
+        columns TEXT NOT NULL,
+        source_file TEXT NOT NULL,
+        source_hash TEXT NOT NULL,
+        remark_count INTEGER,
+        imported_at TEXT DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (company, columns)
+    );''')
+
+def get_remark_import(company, columns):
+    """Get the content hash of the tracker last imported for these remark columns"""
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    create_remark_tables(cursor)
+    
+    cursor.execute('''SELECT source_hash FROM remark_imports 
+                      WHERE company = ? AND columns = ?''', (company, columns))
+    row = cursor.fetchone()
+    conn.close()
+    
+    return row[0] if row else None
+
+def import_remarks(company, columns, fields, remarks, source_file, source_hash):
+    """Replace the stored remarks of the given fields with a tracker's (case_key, field, remark) rows"""
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    create_remark_tables(cursor)
+    
+    # Remarks of cases that are not in this tracker must not outlive it
+    placeholders = ', '.join('?' * len(fields))
+    cursor.execute(f'DELETE FROM remarks WHERE company = ? AND field IN ({placeholders})', (company, *fields))
+    cursor.executemany('''INSERT INTO remarks (company, case_key, field, remark, source_file)
+                          VALUES (?, ?, ?, ?, ?)''',
+                       ((company, case_key, field, remark, source_file) for case_key, field, remark in remarks))
+    remark_count = cursor.rowcount
+    
+    # Earlier imports that stored any of these fields no longer describe the table
+    cursor.execute('''SELECT columns FROM remark_imports WHERE company = ? AND columns != ?''', (company, columns))
+    for (other_columns,) in cursor.fetchall():
+        if set(json.loads(other_columns)['value_columns']) & set(fields):
+            cursor.execute('''DELETE FROM remark_imports WHERE company = ? AND columns = ?''',
+                           (company, other_columns))
+    cursor.execute('''INSERT OR REPLACE INTO remark_imports (company, columns, source_file, source_hash, remark_count)
+                      VALUES (?, ?, ?, ?, ?)''', (company, columns, source_file, source_hash, remark_count))
+    
+    conn.commit()
+    conn.close()
+    
+    return remark_count
+
+def count_remark_cases(company, fields):
+    """Count the cases stored with any of the given remark fields"""
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    create_remark_tables(cursor)
+    
+    placeholders = ', '.join('?' * len(fields))
+    cursor.execute(f'''SELECT COUNT(DISTINCT case_key) FROM remarks 
+                       WHERE company = ? AND field IN ({placeholders})''', (company, *fields))
+    case_count = cursor.fetchone()[0]
+    conn.close()
+    
+    return case_count
+
+def get_remarks(company, fields, case_keys):
+    """Get the stored (case_key, field, remark) rows of the given cases with one indexed query"""
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    create_remark_tables(cursor)
+    
+    cursor.execute('CREATE TEMP TABLE lookup_keys (case_key TEXT PRIMARY KEY)')
+    cursor.executemany('INSERT OR IGNORE INTO lookup_keys VALUES (?)', ((case_key,) for case_key in case_keys))
+    placeholders = ', '.join('?' * len(fields))
+    # CROSS JOIN keeps the case keys as the outer loop, so each is a primary key lookup
+    cursor.execute(f'''SELECT r.case_key, r.field, r.remark 
+                       FROM lookup_keys k 
+                       CROSS JOIN remarks r ON r.company = ? AND r.case_key = k.case_key
+                       WHERE r.field IN ({placeholders})''', (company, *fields))
+    
+    remarks = cursor.fetchall()
+    conn.close()
+    
+    return remarks
+
 # Legacy function for backward compatibility
 def log_conversion(filename, status, rows):
     """Legacy function for backward compatibility"""
-    log_file_processing('legacy', filename, 'csv', status, error_message=f"Rows: {rows}") 
\ No newline at end of file
+    log_file_processing('legacy', filename, 'csv', status, error_message=f"Rows: {rows}")
@@ -1,23 +1,33 @@
 import pandas as pd
 import tkinter as tk
 from tkinter import filedialog, messagebox
-from openpyxl import Workbook, load_workbook
-from openpyxl.styles import PatternFill, Font, Border, Side, Alignment
-from openpyxl.formatting.rule import FormulaRule
 import os
 import sys
 import subprocess
 from datetime import datetime
-import zipfile
-import tempfile
-import shutil
-import win32com.client as win32
-from openpyxl.utils import get_column_letter
+
+# Make the shared helpers in common/ importable when run as a standalone script
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from common.cache import load_cached_frame
+from common.config import get_setting
+from common.csv_reader import concat_frames, read_csv_once, read_schema_csv
+from common.dates import ORIENT_DATETIME_FORMATS, parse_dates_cascade
+from common.delta import DELTA_STATUS_COLUMN, closed_cases, delta_enabled, find_delta, save_delta_state
+from common.excel_writer import CENTER_WRAP, SheetSpec, get_excel_backend, write_report
+from common.keys import normalize_keys, report_key_mismatches
+from common.layout import SheetLayout, apply_layout, finish_layout, get_layout_engine
+from common.parallel import map_in_processes
+from common.pivots import PivotTableSpec, pivot_counts, pivot_tables, summary_sheet
+from common.remarks import import_tracker_remarks, join_remarks, load_remark_index
+from common.schemas import ORIENT_SCHEMA
+from common.sources import ZipMember, find_zip_csv_members
 
 # ===============================
 # Welcome Message
 # ===============================
-print("""
+# Guarded so that worker processes, which re-import this script, stay quiet
+if __name__ == "__main__":
+    print("""
 =======================================
        CSV to Excel Processor
 =======================================
@@ -25,7 +35,7 @@ This script processes a CSV file from a ZIP archive with ~150 columns and extrac
 specific columns with proper formatting, date calculations, and optional VLOOKUPs.
 
 Features:
-- Accepts a ZIP file containing a CSV
+- Accepts a ZIP file containing one or more CSVs (combined, duplicate CALL IDs removed)
 - Extracts 14 specific columns from your CSV (CALL STATUS removed)
 - Calculates PENDING DAYS (NO OF HOURS / 24, rounded down)
 - Adds new DAYS column with hour buckets
@@ -35,7 +45,7 @@ Features:
 - Optional: Adds VLOOKUP for REMARKS column from another Excel file
 - Optional: Adds VLOOKUP for SO_NUMBER column from a ZIP containing CSV (using LEFT 13 chars)
 - Creates properly formatted Excel output with formulas
-- Creates pivot table with CALL STAGE filters
+- Creates a Pivot Analysis summary sheet (cancelled and closed calls left out)
 - Auto-opens the result file
 - All data is center and middle aligned with text wrapping
 =======================================
@@ -84,27 +94,23 @@ def get_input_zip():
     print(f"Selected input file: {input_path}")
     return input_path
 
-def extract_csv_from_zip(zip_path):
-    """Extracts CSV file from ZIP and returns its path."""
+def find_csvs_in_zip(zip_path):
+    """Finds the CSV files inside a ZIP; they are read straight from the archive, nothing is extracted."""
     try:
-        temp_dir = tempfile.mkdtemp()
-        print(f"Created temporary directory: {temp_dir}")
-        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-            zip_ref.extractall(temp_dir)
-        csv_files = [f for f in os.listdir(temp_dir) if f.lower().endswith('.csv')]
+        csv_files = find_zip_csv_members(zip_path)
         if not csv_files:
-            shutil.rmtree(temp_dir)
             raise ValueError("No CSV files found in the ZIP archive.")
-        if len(csv_files) > 1:
-            shutil.rmtree(temp_dir)
-            raise ValueError("Multiple CSV files found in the ZIP archive. Please include only one CSV.")
-        csv_path = os.path.join(temp_dir, csv_files[0])
-        print(f"Extracted CSV file: {csv_path}")
-        return csv_path, temp_dir
+        print(f"Found {len(csv_files)} CSV file(s) in ZIP: {', '.join(csv_files)}")
+        return [ZipMember(zip_path, csv_file) for csv_file in csv_files]
     except Exception as e:
-        if 'temp_dir' in locals():
-            shutil.rmtree(temp_dir, ignore_errors=True)
-        raise ValueError(f"Error extracting ZIP file: {str(e)}")
+        raise ValueError(f"Error reading ZIP file: {str(e)}")
+
+def find_csv_in_zip(zip_path):
+    """Finds the single CSV file inside a lookup ZIP."""
+    csv_sources = find_csvs_in_zip(zip_path)
+    if len(csv_sources) > 1:
+        raise ValueError("Multiple CSV files found in the ZIP archive. Please include only one CSV.")
+    return csv_sources[0]
 
 def get_output_directory():
     """Opens a GUI for selecting output directory location."""
@@ -172,40 +178,58 @@ def find_registration_date_column(df):
             return col
     return None
 
-def parse_datetime_string(datetime_str):
-    """Parse datetime string and return datetime object."""
-    if pd.isna(datetime_str) or str(datetime_str).strip() == '':
-        return None
-    datetime_str = str(datetime_str).strip()
-    datetime_formats = [
-        "%d-%m-%Y %H:%M:%S", "%d-%m-%Y %H:%M", "%Y-%m-%d %H:%M:%S",
-        "%Y-%m-%d %H:%M", "%d/%m/%Y %H:%M:%S", "%d/%m/%Y %H:%M",
-        "%m/%d/%Y %H:%M:%S", "%m/%d/%Y %H:%M", "%d-%b-%Y %H:%M:%S",
-        "%d-%b-%Y %H:%M", "%Y/%m/%d %H:%M:%S", "%Y/%m/%d %H:%M",
-        "%d.%m.%Y %H:%M:%S", "%d.%m.%Y %H:%M",
-        "%d-%m-%Y", "%Y-%m-%d", "%d/%m/%Y", "%m/%d/%Y",
-        "%d-%b-%Y", "%Y/%m/%d", "%d.%m.%Y"
-    ]
-    for fmt in datetime_formats:
-        try:
-            return datetime.strptime(datetime_str, fmt)
-        except ValueError:
-            continue
-    return None
+def get_output_mode():
+    """Returns the configured output mode: 'formulas' (live NOW() formulas) or 'snapshot'."""
+    output_mode = get_setting('orient', 'output_mode', 'formulas').strip().lower()
+    if output_mode not in ('formulas', 'snapshot'):
+        print(f"Warning: Unknown output_mode '{output_mode}', using formulas")
+        return 'formulas'
+    return output_mode
+
+def get_snapshot_time():
+    """Returns the as-of time for snapshot values: [orient] snapshot_as_of, or now."""
+    as_of = get_setting('orient', 'snapshot_as_of', '').strip()
+    return pd.Timestamp(as_of) if as_of else pd.Timestamp.now()
+
+def compute_tat_snapshot(df, as_of):
+    """Computes NO OF HOURS, PENDING DAYS, DAYS and TAT STATUS as of a fixed time, as the Excel formulas would."""
+    df = df.copy()
+    hours = (as_of - (df['DATE'] + df['TIME'])).dt.total_seconds() / 3600
+    pending_days = hours // 24  # Excel INT rounds down
+    df['NO OF HOURS'] = hours
+    df['PENDING DAYS'] = pending_days
+    df['DAYS'] = pd.cut(
+        hours, [float('-inf'), 24, 48, 72, float('inf')],
+        labels=['D1 (0-24Hrs)', 'D2 (24-48Hrs)', 'D3 (48-72 Hrs)', 'D4 (>72Hrs)']
+    )
+    df['TAT STATUS'] = (pending_days > 0).map({True: 'OUT TAT', False: 'IN TAT'}).where(hours.notna(), '')
+    print(f"Computed TAT values as of {as_of:%d-%m-%Y %H:%M}")
+    return df
+
+def process_csv_sources(csv_sources):
+    """Processes every CSV from the input ZIP as one dataset, parsing them in parallel."""
+    frames = map_in_processes(process_csv_data, csv_sources)
+    if len(frames) == 1:
+        return frames[0]
+    return combine_exports(frames)
+
+def combine_exports(frames):
+    """Concatenates the per-CSV results, keeping the first row for each CALL ID."""
+    df = concat_frames(frames, ignore_index=True)
+    call_ids = normalize_keys(df['CALL ID'])
+    duplicates = call_ids.duplicated() & (call_ids != '')
+    print(f"Combined {len(frames)} CSV files: {len(df)} rows, {duplicates.sum()} duplicate CALL IDs removed")
+    return df[~duplicates].reset_index(drop=True)
 
 def process_csv_data(input_path):
+    """Processes the CSV file, reusing the parsed result if this export was processed before."""
+    return load_cached_frame(input_path, ORIENT_SCHEMA, lambda: extract_required_columns(input_path))
+
+def extract_required_columns(input_path):
     """Processes the CSV file and extracts required columns."""
     try:
         print("Reading CSV file...")
-        try:
-            df = pd.read_csv(input_path, encoding='utf-8', low_memory=False)
-        except UnicodeDecodeError:
-            print("UTF-8 encoding failed, trying Latin-1...")
-            try:
-                df = pd.read_csv(input_path, encoding='latin-1', low_memory=False)
-            except UnicodeDecodeError:
-                print("Latin-1 encoding failed, trying Windows-1252...")
-                df = pd.read_csv(input_path, encoding='windows-1252', low_memory=False)
+        df = read_schema_csv(input_path, ORIENT_SCHEMA, low_memory=False)
 
         print(f"CSV loaded successfully. Shape: {df.shape}")
         reg_date_col = find_registration_date_column(df)
@@ -225,9 +249,9 @@ def process_csv_data(input_path):
                     column_mapping[required_col] = csv_col
                     break
         
-        parsed_datetimes = [parse_datetime_string(dt) for dt in df[reg_date_col]]
-        date_values = [dt.date() if dt else None for dt in parsed_datetimes]
-        time_values = [dt.time() if dt else None for dt in parsed_datetimes]
+        parsed_datetimes = parse_dates_cascade(df[reg_date_col], ORIENT_DATETIME_FORMATS)
+        date_values = parsed_datetimes.dt.normalize()
+        time_values = parsed_datetimes - date_values  # time of day as a timedelta
         
         output_data = {
             'CALL ID': df[column_mapping['CALL ID']] if column_mapping['CALL ID'] else '',
@@ -257,351 +281,254 @@ def process_csv_data(input_path):
         print(f"Error processing CSV data: {str(e)}")
         raise
 
+# The SO export is looked up like VLOOKUP(LEFT(PENDING CALL PO, 13), ...) on
+# its columns G (key) and Y (SO number), as a vectorized join. Only those two
+# columns are parsed, and a key repeated in the export maps to its last row.
+SO_KEY_LENGTH = 13
+SO_KEY_COLUMN = 6
+SO_NUMBER_COLUMN = 24
+
+def so_number_keys(values):
+    """Returns the SO lookup keys of a column: the first 13 characters, as LEFT() takes them, normalized.
+
+    The cut comes first, so normalizing (dropping spaces or leading zeros)
+    never moves the 13th character.
+    """
+    text = values.astype(object).where(values.notna(), '').astype(str)
+    return normalize_keys(text.str.strip().str[:SO_KEY_LENGTH])
+
 def process_so_number_lookup(so_lookup_file):
-    """Processes SO_NUMBER lookup from ZIP containing CSV."""
+    """Processes SO_NUMBER lookup from ZIP containing CSV, returning the SO numbers indexed by key."""
     try:
-        csv_path, temp_dir = extract_csv_from_zip(so_lookup_file)
+        csv_source = find_csv_in_zip(so_lookup_file)
         
-        try:
-            lookup_df = pd.read_csv(csv_path, encoding='utf-8', header=None)
-        except UnicodeDecodeError:
-            try:
-                lookup_df = pd.read_csv(csv_path, encoding='latin-1', header=None)
-            except UnicodeDecodeError:
-                lookup_df = pd.read_csv(csv_path, encoding='windows-1252', header=None)
+        lookup_df = read_csv_once(csv_source, header=None, usecols=[SO_KEY_COLUMN, SO_NUMBER_COLUMN], dtype=str)
         
-        mapping = {}
-        for _, row in lookup_df.iterrows():
-            if len(row) > 24:
-                key = str(row[6]).strip()[:13]  # Use only first 13 characters
-                value = str(row[24]).strip()
-                if key and value:
-                    mapping[key] = value
+        # Columns come back in file order whatever the engine labels them
+        keys = so_number_keys(lookup_df.iloc[:, 0])
+        values = lookup_df.iloc[:, 1].fillna('').str.strip()
+        valid = ((keys != '') & (values != '')).to_numpy()
+        mapping = pd.Series(values.to_numpy()[valid], index=keys.to_numpy()[valid], dtype=object)
+        mapping = mapping[~mapping.index.duplicated(keep='last')]
         
         print(f"Created SO_NUMBER mapping with {len(mapping)} entries")
-        return mapping, temp_dir
+        return mapping
     except Exception as e:
         print(f"Error processing SO_NUMBER lookup: {str(e)}")
         raise 
 
-def create_formatted_excel(df, output_path):
-    """Creates a formatted Excel file with proper data types and formulas."""
+def join_so_numbers(pending_call_po, so_mapping):
+    """Looks up the SO_NUMBER of each PENDING CALL PO, with "Not Found" for POs not in the mapping."""
+    keys = so_number_keys(pending_call_po)
+    so_numbers = so_mapping.reindex(keys.to_numpy())
+    matched = int(so_numbers.notna().sum())
+    rate = matched / len(so_numbers) * 100 if len(so_numbers) else 0
+    print(f"SO_NUMBER lookup: {matched} of {len(so_numbers)} calls matched ({rate:.1f}%), "
+          f"{len(so_numbers) - matched} not found")
+    report_key_mismatches(pending_call_po, keys, so_numbers.notna().to_numpy(), 'PENDING CALL PO')
+    return pd.Series(so_numbers.fillna("Not Found").to_numpy(), index=pending_call_po.index, dtype=object)
+
+# ===============================
+# Formatted Excel Output
+# ===============================
+# Cell values are converted a whole column at a time, and each column's style
+# and number format is decided once up front. The rows then go to the
+# streaming writer as plain tuples.
+ORIENT_COLUMN_WIDTHS = {
+    'A': 20,   # CALL ID
+    'B': 12,   # DATE
+    'C': 10,   # TIME
+    'D': 0,    # NO OF HOURS (hidden)
+    'E': 15,   # PENDING DAYS
+    'F': 20,   # DAYS
+    'G': 12,   # TAT STATUS
+    'H': 25,   # MODEL DESCRIPTION
+    'I': 15,   # CATEGORY
+    'J': 15,   # CALL STAGE
+    'K': 20,   # CUSTOMER NAME
+    'L': 30,   # ADDRESS
+    'M': 10,   # PIN CODE
+    'N': 15,   # CONTACT NUMBER
+    'O': 20,   # ENGINEER NAME
+    'P': 15,   # CUSTOMER REMARKS
+    'Q': 15,   # PENDING CALL PO
+    'R': 20,   # REMARK
+    'S': 15    # SO_NUMBER
+}
+
+ORIENT_NUMBER_FORMATS = {
+    'DATE': 'DD-MM-YYYY',
+    'TIME': 'HH:MM:SS',
+    'NO OF HOURS': '0.00',
+    'PENDING DAYS': '0',
+}
+
+ORIENT_TAT_FORMULAS = {
+    'NO OF HOURS': '=IF(AND(B{row}<>"",C{row}<>""),(NOW()-(B{row}+C{row}))*24,"")',
+    'PENDING DAYS': '=IF(D{row}<>"",INT(D{row}/24),"")',
+    'DAYS': '=IF(D{row}="","",IF(D{row}<=24,"D1 (0-24Hrs)",'
+            'IF(D{row}<=48,"D2 (24-48Hrs)",'
+            'IF(D{row}<=72,"D3 (48-72 Hrs)","D4 (>72Hrs)"))))',
+    'TAT STATUS': '=IF(E{row}<>"",IF(E{row}>0,"OUT TAT","IN TAT"),"")',
+}
+
+ORIENT_HEADER = 'Orient Header'
+ORIENT_CALL_ID_ALIGNMENT = {'horizontal': 'center', 'vertical': 'center', 'wrap_text': False}
+ORIENT_STYLES = {
+    ORIENT_HEADER: {'font': {'bold': True, 'color': 'FFFFFF', 'size': 12}, 'fill': '366092',
+                    'border': True, 'alignment': CENTER_WRAP},
+    'Orient Data': {'font': {'size': 11}, 'border': True, 'alignment': CENTER_WRAP},
+    'Orient Banded': {'font': {'size': 11}, 'fill': 'F2F2F2', 'border': True, 'alignment': CENTER_WRAP},
+    'Orient Call ID': {'font': {'size': 11}, 'border': True, 'alignment': ORIENT_CALL_ID_ALIGNMENT},
+    'Orient Call ID Banded': {'font': {'size': 11}, 'fill': 'F2F2F2', 'border': True,
+                              'alignment': ORIENT_CALL_ID_ALIGNMENT},
+    'Orient Total': {'font': {'bold': True, 'size': 11}, 'border': True, 'alignment': CENTER_WRAP},
+}
+
+# Rows are sized to their wrapped text (formerly an Excel COM autofit after the save)
+ORIENT_DATA_LAYOUT = SheetLayout(fit_rows=True)
+
+# Conditional formatting for TAT STATUS (column G)
+ORIENT_TAT_RULES = [
+    ('G', {'formula': '$G2="IN TAT"', 'fill': '90EE90'}),
+    ('G', {'formula': '$G2="OUT TAT"', 'fill': 'FFB6C1'}),
+]
+
+
+def orient_data_styles(columns):
+    """Returns the per-column styles of the banded and the plain data rows.
+
+    CALL ID is not wrapped and TAT STATUS is never banded, so its conditional
+    fill stays visible.
+    """
+    banded_row, plain_row = [], []
+    for name in columns:
+        if name == 'CALL ID':
+            banded_row.append('Orient Call ID Banded')
+            plain_row.append('Orient Call ID')
+        else:
+            banded_row.append('Orient Data' if name == 'TAT STATUS' else 'Orient Banded')
+            plain_row.append('Orient Data')
+    return [banded_row, plain_row]
+
+
+def _text_values(series):
+    """Converts a column to cell text, blanks for missing values."""
+    return series.astype(object).where(series.notna(), '').map(str)
+
+
+def _optional_values(series, values):
+    """Returns values as cell values, blanks where the column is missing."""
+    return pd.Series(values, index=series.index, dtype=object).where(series.notna(), '')
+
+
+def convert_output_columns(df, static_values=False):
+    """Converts each column of the processed frame to the values written to its cells.
+
+    DATE becomes a datetime and TIME a fraction of a day, as Excel stores them.
+    The TAT columns are left for their formulas unless static_values is set.
+    """
+    converted = {}
+    for name in df.columns:
+        series = df[name]
+        if name == 'DATE':
+            values = _optional_values(series, series.dt.to_pydatetime())
+        elif name == 'TIME':
+            values = _optional_values(series, series.dt.total_seconds() / 86400)
+        elif name in ('NO OF HOURS', 'PENDING DAYS'):
+            values = _optional_values(series, series) if static_values else ''
+        elif name in ('DAYS', 'TAT STATUS'):
+            values = _text_values(series) if static_values else ''
+        else:
+            values = _text_values(series)
+        converted[name] = values
+    return pd.DataFrame(converted, index=df.index, columns=df.columns)
+
+
+# CALL STAGE items left out of the Pivot Analysis summary
+SUMMARY_EXCLUDED_CALL_STAGES = ['cancelled', 'closed']
+
+
+def open_call_stages(df):
+    """Returns the CALL STAGE values counted in the summary, all but cancelled and closed."""
+    stages = df['CALL STAGE'].drop_duplicates()
+    return [stage for stage in stages if str(stage).lower() not in SUMMARY_EXCLUDED_CALL_STAGES]
+
+
+def summarize_calls(df):
+    """Counts the calls per ENGINEER NAME and DAYS bucket, leaving out cancelled and closed calls.
+
+    df must carry the TAT values (compute_tat_snapshot).
+    """
+    open_calls = df[df['CALL STAGE'].isin(open_call_stages(df))]
+    return pivot_counts(open_calls, 'ENGINEER NAME', 'CALL ID', columns='DAYS')
+
+
+def create_formatted_excel(df, output_path, static_values=False, layout_engine='python', closed=None):
+    """Creates a formatted Excel file with proper data types and formulas.
+
+    With static_values, NO OF HOURS, PENDING DAYS, DAYS and TAT STATUS are
+    written as the plain values from compute_tat_snapshot instead of formulas.
+    A Pivot Analysis sheet in front counts the open calls per engineer and DAYS.
+    layout_engine lays out Processed Data (see common.layout). In delta mode,
+    closed lists the calls closed since the last run on a Closed Calls sheet.
+    """
     try:
         print("Creating formatted Excel file...")
-        workbook = Workbook()
-        worksheet = workbook.active
-        worksheet.title = "Processed Data"
-        
-        # Define column widths for all 19 columns (A to S)
-        column_widths = {
-            1: 20,   # A: CALL ID
-            2: 12,   # B: DATE
-            3: 10,   # C: TIME
-            4: 0,    # D: NO OF HOURS (hidden)
-            5: 15,   # E: PENDING DAYS
-            6: 20,   # F: DAYS (new column)
-            7: 12,   # G: TAT STATUS
-            8: 25,   # H: MODEL DESCRIPTION
-            9: 15,   # I: CATEGORY (new column)
-            10: 15,  # J: CALL STAGE
-            11: 20,  # K: CUSTOMER NAME
-            12: 30,  # L: ADDRESS
-            13: 10,  # M: PIN CODE
-            14: 15,  # N: CONTACT NUMBER
-            15: 20,  # O: ENGINEER NAME
-            16: 15,  # P: CUSTOMER REMARKS
-            17: 15,  # Q: PENDING CALL PO
-            18: 20,  # R: REMARK
-            19: 15   # S: SO_NUMBER
+        column_formulas = None if static_values else {
+            name: template for name, template in ORIENT_TAT_FORMULAS.items() if name in df.columns
         }
+        # DAYS is a NOW() formula in formula mode, so the summary buckets the calls as of now
+        tat_values = df if static_values else compute_tat_snapshot(df, datetime.now())
+        processed_values = convert_output_columns(df, static_values)
+        summary = summary_sheet("Pivot Analysis", summarize_calls(tat_values), ORIENT_HEADER, 'Orient Data',
+                                'Orient Total', data_caption='Count of CALL ID', columns_caption='DAYS',
+                                filters=[('CALL STAGE', 'All except Cancelled, Closed')])
+        column_widths = ORIENT_COLUMN_WIDTHS
+        if DELTA_STATUS_COLUMN in df.columns:
+            column_widths = {**ORIENT_COLUMN_WIDTHS, 'T': 12}  # Delta Status
+        sheets = [
+            summary,
+            apply_layout(SheetSpec("Processed Data", processed_values,
+                                   ORIENT_HEADER, orient_data_styles(df.columns),
+                                   column_widths=column_widths,
+                                   column_formulas=column_formulas,
+                                   column_formats=ORIENT_NUMBER_FORMATS,
+                                   hidden_columns=['D'],  # NO OF HOURS
+                                   freeze_panes='A2',
+                                   conditional_formats=ORIENT_TAT_RULES),
+                         ORIENT_DATA_LAYOUT, layout_engine),
+        ]
+        if closed is not None:
+            sheets.append(SheetSpec("Closed Calls", closed, ORIENT_HEADER, ['Orient Banded', 'Orient Data'],
+                                    column_widths={'A': 20, 'B': 20}))
 
-        # Apply column widths
-        for col_idx, width in column_widths.items():
-            col_letter = get_column_letter(col_idx)
-            worksheet.column_dimensions[col_letter].width = width
+        # XlsxWriter rewrites every formula it is given, so the live TAT
+        # formulas are written faster by openpyxl
+        backend = get_excel_backend('orient')
+        if backend == 'xlsxwriter' and not static_values:
+            print("Writing the TAT formulas with openpyxl, which writes them faster than xlsxwriter")
+            backend = 'openpyxl'
 
-        # Write headers
-        headers = list(df.columns)
-        for col_idx, header in enumerate(headers, 1):
-            worksheet.cell(row=1, column=col_idx, value=header)
-        
-        # Define alignments
-        center_middle_alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-        call_id_alignment = Alignment(horizontal='center', vertical='center', wrap_text=False)
-
-        # Write data
-        for row_idx, (_, row) in enumerate(df.iterrows(), 2):
-            for col_idx, (col_name, value) in enumerate(row.items(), 1):
-                cell = worksheet.cell(row=row_idx, column=col_idx)
-                if col_name == 'CALL ID':
-                    cell.alignment = call_id_alignment  # No wrapping for CALL ID data
-                else:
-                    cell.alignment = center_middle_alignment
-                
-                if col_name == 'CALL ID':
-                    cell.value = str(value) if pd.notna(value) else ""
-                elif col_name == 'DATE' and value:
-                    cell.value = value
-                    cell.number_format = 'DD-MM-YYYY'
-                elif col_name == 'TIME' and value:
-                    time_fraction = (value.hour + value.minute/60 + value.second/3600) / 24
-                    cell.value = time_fraction
-                    cell.number_format = 'HH:MM:SS'
-                elif col_name == 'NO OF HOURS' and value:
-                    formula = f'=IF(AND(B{row_idx}<>"",C{row_idx}<>""),(NOW()-(B{row_idx}+C{row_idx}))*24,"")'
-                    cell.value = formula
-                    cell.number_format = '0.00'
-                elif col_name == 'PENDING DAYS' and value:
-                    formula = f'=IF(D{row_idx}<>"",INT(D{row_idx}/24),"")'
-                    cell.value = formula
-                    cell.number_format = '0'
-                elif col_name == 'DAYS' and value:
-                    formula = f'=IF(D{row_idx}="","",IF(D{row_idx}<=24,"D1 (0-24Hrs)",' \
-                              f'IF(D{row_idx}<=48,"D2 (24-48Hrs)",' \
-                              f'IF(D{row_idx}<=72,"D3 (48-72 Hrs)","D4 (>72Hrs)"))))'
-                    cell.value = formula
-                elif col_name == 'TAT STATUS' and value:
-                    formula = f'=IF(E{row_idx}<>"",IF(E{row_idx}>0,"OUT TAT","IN TAT"),"")'
-                    cell.value = formula
-                elif col_name == 'CATEGORY':
-                    cell.value = str(value) if pd.notna(value) else ""
-                else:
-                    cell.value = str(value) if pd.notna(value) else ""
-        
-        # Apply styles
-        header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-        header_font = Font(bold=True, color="FFFFFF", size=12)
-        data_font = Font(size=11)
-        green_fill = PatternFill(start_color="90EE90", end_color="90EE90", fill_type="solid")
-        red_fill = PatternFill(start_color="FFB6C1", end_color="FFB6C1", fill_type="solid")
-        thin_border = Border(left=Side(style='thin'), right=Side(style='thin'),
-                            top=Side(style='thin'), bottom=Side(style='thin'))
-        alternate_fill = PatternFill(start_color="F2F2F2", end_color="F2F2F2", fill_type="solid")
-        
-        for row_num, row in enumerate(worksheet.iter_rows(min_row=1, max_row=worksheet.max_row,
-                                                         min_col=1, max_col=worksheet.max_column), 1):
-            for cell in row:
-                cell.border = thin_border
-                if row_num == 1:
-                    cell.alignment = center_middle_alignment
-                    cell.fill = header_fill
-                    cell.font = header_font
-                else:
-                    cell.font = data_font
-                    if cell.column == 7:  # TAT STATUS column (now column G)
-                        pass
-                    elif row_num % 2 == 0 and cell.column != 7:
-                        cell.fill = alternate_fill
-        
-        # Conditional formatting for TAT STATUS (now column G)
-        worksheet.conditional_formatting.add(f"G2:G{worksheet.max_row}", 
-            FormulaRule(formula=['$G2="IN TAT"'], fill=green_fill))
-        worksheet.conditional_formatting.add(f"G2:G{worksheet.max_row}", 
-            FormulaRule(formula=['$G2="OUT TAT"'], fill=red_fill))
-        
-        # Hide column D (NO OF HOURS)
-        worksheet.column_dimensions['D'].hidden = True
-        
-        worksheet.auto_filter.ref = worksheet.dimensions
-        worksheet.freeze_panes = 'A2'
-        workbook.save(output_path)
+        # The summary also becomes a PivotTable, refreshed from Processed Data when opened in Excel
+        sheet_values = processed_values if static_values else convert_output_columns(tat_values, True)
+        write_report(output_path, sheets, ORIENT_STYLES, backend, pivot_tables([
+            PivotTableSpec("CallAnalysis_Pivot", summary, "Processed Data", sheet_values, 'ENGINEER NAME',
+                           'CALL ID', columns='DAYS', data_caption='Count of CALL ID',
+                           page_fields=[('CALL STAGE', open_call_stages(sheet_values))]),
+        ]))
         print(f"Excel file saved successfully: {output_path}")
         return True
     except Exception as e:
         print(f"Error creating formatted Excel: {str(e)}")
         return False
     
-def clear_com_cache():
-    """Clears win32com cache to fix COM errors."""
-    try:
-        import shutil
-        import tempfile
-        
-        gen_py_path = os.path.join(tempfile.gettempdir(), 'gen_py')
-        
-        if os.path.exists(gen_py_path):
-            print("Clearing win32com cache...")
-            shutil.rmtree(gen_py_path, ignore_errors=True)
-            print("Cache cleared successfully")
-    except Exception as e:
-        print(f"Warning: Could not clear COM cache: {str(e)}")
-
-def auto_fit_excel_columns_rows(file_path):
-    """Uses Excel COM to auto-fit rows for compact sizing."""
-    excel = None
-    try:
-        print("Auto-fitting rows using Excel COM...")
-        
-        clear_com_cache()
-        
-        try:
-            excel = win32.Dispatch('Excel.Application')
-        except Exception:
-            clear_com_cache()
-            excel = win32.gencache.EnsureDispatch('Excel.Application')
-        
-        excel.Visible = False
-        excel.DisplayAlerts = False
-        
-        try:
-            wb = excel.Workbooks.Open(os.path.abspath(file_path))
-            data_sheet = wb.Sheets("Processed Data")
-            
-            # Auto-fit rows only (preserve column widths)
-            data_sheet.Rows.AutoFit()
-            
-            # Ensure column D (NO OF HOURS) is hidden
-            data_sheet.Columns(4).Hidden = True
-            
-            wb.Save()
-            wb.Close()
-            
-            print("Successfully auto-fitted rows with text wrapping preserved")
-            return True
-        except Exception as e:
-            print(f"Error during auto-fit: {str(e)}")
-            try:
-                if 'wb' in locals():
-                    wb.Close(SaveChanges=False)
-            except:
-                pass
-            return False
-    except Exception as e:
-        print(f"Error creating Excel COM instance: {str(e)}")
-        return False
-    finally:
-        try:
-            if excel:
-                excel.Quit()
-                excel = None
-        except:
-            pass
-
-def create_pivot_table(output_path):
-    """Creates a pivot table using Excel COM."""
-    excel = None
-    try:
-        print("Creating pivot table using Excel COM...")
-        
-        clear_com_cache()
-        
-        try:
-            excel = win32.Dispatch('Excel.Application')
-        except Exception:
-            clear_com_cache()
-            excel = win32.gencache.EnsureDispatch('Excel.Application')
-        
-        excel.Visible = False
-        excel.DisplayAlerts = False
-        
-        try:
-            wb = excel.Workbooks.Open(os.path.abspath(output_path))
-            sheet1_excel = wb.Sheets("Processed Data")
-            
-            sheet2 = wb.Sheets.Add()
-            sheet2.Name = "Pivot Analysis"
-            
-            xlDatabase = 1
-            xlPageField = 3
-            xlRowField = 1
-            xlColumnField = 2
-            xlDataField = 4
-            xlCount = -4112
-            xlContinuous = 1
-            xlThin = 2
-            
-            pivot_cache = wb.PivotCaches().Create(
-                SourceType=xlDatabase,
-                SourceData=sheet1_excel.UsedRange
-            )
-            
-            pivot_table = pivot_cache.CreatePivotTable(
-                TableDestination=sheet2.Range("A3"),
-                TableName="CallAnalysis_Pivot"
-            )
-            
-            pivot_table.PivotFields("CALL STAGE").Orientation = xlPageField
-            pivot_table.PivotFields("CALL STAGE").Position = 1
-            
-            try:
-                call_stage_field = pivot_table.PivotFields("CALL STAGE")
-                for item in call_stage_field.PivotItems():
-                    if item.Name.lower() in ['cancelled', 'closed']:
-                        item.Visible = False
-            except Exception as filter_error:
-                print(f"Warning: Could not apply CALL STAGE filters: {str(filter_error)}")
-            
-            pivot_table.PivotFields("ENGINEER NAME").Orientation = xlRowField
-            pivot_table.PivotFields("ENGINEER NAME").Position = 1
-            
-            pivot_table.PivotFields("DAYS").Orientation = xlColumnField  # Changed to use new DAYS column
-            pivot_table.PivotFields("DAYS").Position = 1
-            
-            pivot_table.AddDataField(
-                pivot_table.PivotFields("CALL ID"),
-                "Count of CALL ID",
-                xlCount
-            )
-            
-            try:
-                pivot_table.PivotFields("Count of CALL ID").NumberFormat = "#,##0"
-            except Exception as format_error:
-                print(f"Warning: Could not apply number formatting: {str(format_error)}")
-            
-            try:
-                sheet2.UsedRange.Columns.AutoFit()
-            except Exception as autofit_error:
-                print(f"Warning: Could not auto-fit columns: {str(autofit_error)}")
-            
-            try:
-                pivot_range = pivot_table.TableRange1
-                if pivot_range:
-                    pivot_range.Borders.LineStyle = xlContinuous
-                    pivot_range.Borders.Weight = xlThin
-                    
-                    header_range = pivot_table.TableRange2.Rows(1)
-                    header_range.Interior.Color = 0x366092
-                    header_range.Font.Bold = True
-                    header_range.Font.Color = 0xFFFFFF
-            except Exception as style_error:
-                print(f"Warning: Could not apply pivot table styling: {str(style_error)}")
-            
-            wb.Save()
-            wb.Close()
-            
-            print(f"Pivot table successfully created in 'Pivot Analysis' sheet:")
-            print("- Filters: CALL STAGE (cancelled and closed excluded)")
-            print("- Columns: DAYS (new hour buckets)")
-            print("- Rows: ENGINEER NAME")
-            print("- Values: Count of CALL ID")
-            return True
-            
-        except Exception as com_error:
-            print(f"Excel COM error: {str(com_error)}")
-            try:
-                if 'wb' in locals():
-                    wb.Close(SaveChanges=False)
-            except:
-                pass
-            return False
-            
-    except Exception as e:
-        print(f"Error creating pivot table: {str(e)}")
-        return False
-    finally:
-        try:
-            if excel:
-                excel.Quit()
-                excel = None
-        except:
-            pass
 
 # ===============================
 # Main Program Flow
 # ===============================
 def main():
     """Main program execution."""
-    temp_dirs = []
     try:
         remark_choice, so_choice = get_user_choices()
         
@@ -610,68 +537,69 @@ def main():
             print("Process terminated: No input ZIP file selected.")
             return
 
-        input_csv_path, main_temp_dir = extract_csv_from_zip(input_zip_path)
-        temp_dirs.append(main_temp_dir)
+        input_csvs = find_csvs_in_zip(input_zip_path)
         
         output_excel_path = get_output_directory()
         if not output_excel_path:
             print("Process terminated: No output directory selected.")
             return
 
-        processed_df = process_csv_data(input_csv_path)
+        processed_df = process_csv_sources(input_csvs)
+
+        # In delta mode each call is labelled new, changed or unchanged since the last run
+        delta = None
+        if delta_enabled():
+            delta = find_delta('orient', processed_df, 'CALL ID')
         
         if remark_choice:
             print("Processing with REMARK VLOOKUP...")
             lookup_excel_path = get_lookup_file("REMARKS")
             if lookup_excel_path:
                 try:
-                    lookup_df = pd.read_excel(lookup_excel_path, usecols=[0, 16], header=None)
-                    
-                    if lookup_df.empty or lookup_df.shape[1] < 2:
+                    # CALL IDs are in column A and the remarks in column Q of the lookup sheet
+                    if not import_tracker_remarks('Orient', lookup_excel_path, {'REMARK': 17}, header=False):
                         print("Warning: REMARK lookup file is empty or has insufficient columns. Skipping VLOOKUP.")
                     else:
-                        lookup_df.columns = ['CALL ID', 'REMARKS']
-                        lookup_df['CALL ID'] = lookup_df['CALL ID'].astype(str).str.strip()
-                        processed_df['CALL ID'] = processed_df['CALL ID'].astype(str).str.strip()
-                        merged_df = pd.merge(processed_df, lookup_df, on='CALL ID', how='left')
-                        merged_df['REMARKS'] = merged_df['REMARKS'].fillna("Not Found")
-                        processed_df['REMARK'] = merged_df['REMARKS']
+                        lookup_index = load_remark_index('Orient', processed_df['CALL ID'], ['REMARK'])
+                        remarks, _ = join_remarks(processed_df['CALL ID'], lookup_index, ['REMARK'],
+                                                  missing="Not Found", blank="Not Found", key_label='CALL ID')
+                        processed_df['REMARK'] = remarks['REMARK']
                 except Exception as e:
                     print(f"Error performing REMARK VLOOKUP: {str(e)}")
                     print("Proceeding without REMARK VLOOKUP.")
 
-        so_mapping = {}
-        so_temp_dir = None
         if so_choice:
             print("Processing with SO_NUMBER VLOOKUP...")
             so_lookup_zip = get_lookup_file("SO_NUMBER")
             if so_lookup_zip:
                 try:
-                    so_mapping, so_temp_dir = process_so_number_lookup(so_lookup_zip)
-                    temp_dirs.append(so_temp_dir)
-                    
-                    processed_df['SO_NUMBER'] = (
-                        processed_df['PENDING CALL PO']
-                        .astype(str)
-                        .str.strip()
-                        .str[:13]  # Use only first 13 characters
-                        .map(lambda x: so_mapping.get(x, "Not Found"))
-                    )
+                    so_mapping = process_so_number_lookup(so_lookup_zip)
+                    processed_df['SO_NUMBER'] = join_so_numbers(processed_df['PENDING CALL PO'], so_mapping)
                 except Exception as e:
                     print(f"Error performing SO_NUMBER VLOOKUP: {str(e)}")
                     print("Proceeding without SO_NUMBER VLOOKUP.")
 
-        success = create_formatted_excel(processed_df, output_excel_path)
+        # Snapshot mode writes values computed once instead of volatile NOW() formulas
+        static_values = get_output_mode() == 'snapshot'
+        if static_values:
+            processed_df = compute_tat_snapshot(processed_df, get_snapshot_time())
+
+        closed = None
+        if delta is not None:
+            processed_df[DELTA_STATUS_COLUMN] = delta['change']
+            closed = closed_cases(delta, 'CALL ID')
+
+        layout_engine = get_layout_engine('orient')
+        success = create_formatted_excel(processed_df, output_excel_path, static_values, layout_engine, closed)
         
         if not success:
             raise Exception("Failed to create Excel file")
+        if delta is not None:
+            save_delta_state(delta)
         
-        auto_fit_success = auto_fit_excel_columns_rows(output_excel_path)
-        if not auto_fit_success:
+        if not finish_layout(output_excel_path, {"Processed Data": ORIENT_DATA_LAYOUT}, layout_engine):
             print("Warning: Failed to auto-fit columns and rows")
         
-        pivot_success = create_pivot_table(output_excel_path)
-        
         root = tk.Tk()
         root.withdraw()
         message = (
@@ -680,23 +608,24 @@ def main():
             f"Processed {len(processed_df)} rows.\n"
             f"Features added:\n"
             f"• Proper DATE and TIME data types\n"
-            f"• Dynamic NO OF HOURS calculation (hidden)\n"
+            f"• {'Snapshot' if static_values else 'Dynamic'} NO OF HOURS calculation (hidden)\n"
             f"• PENDING DAYS as whole number (Hours/24)\n"
             f"• New DAYS column with hour buckets\n"
             f"• STATUS column with color coding\n"
-            f"• Auto-updating formulas\n"
+            f"• {'Static values (no recalculation)' if static_values else 'Auto-updating formulas'}\n"
             f"• Text wrapping for readability\n"
             f"• Columns and rows optimized for minimal size\n"
             f"• CALL STATUS column removed\n"
             f"• Added CATEGORY column from GROUP data\n"
+            f"• Pivot Analysis sheet counting open calls by engineer and DAYS\n"
         )
         
         if remark_choice:
             message += "• REMARK VLOOKUP applied (from Excel input)\n"
         if so_choice:
             message += "• SO_NUMBER VLOOKUP applied (using LEFT 13 chars from ZIP input)\n"
-        if pivot_success:
-            message += "• Pivot table created in 'Pivot Analysis' sheet (using new DAYS column)\n"
+        if delta is not None:
+            message += f"• Delta Status column (new/changed/unchanged), {len(delta['closed_keys'])} calls closed since last run\n"
         
         message += "\nThe file will open automatically."
         messagebox.showinfo("Success", message)
@@ -711,10 +640,6 @@ def main():
         messagebox.showerror("Error", f"An error occurred:\n{str(e)}")
         root.destroy()
     finally:
-        for temp_dir in temp_dirs:
-            if temp_dir and os.path.exists(temp_dir):
-                shutil.rmtree(temp_dir, ignore_errors=True)
-                print(f"Cleaned up temporary directory: {temp_dir}")
         print("Process completed. Closing in 3 seconds...")
         import time
         time.sleep(3)